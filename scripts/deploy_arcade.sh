@@ -1,11 +1,13 @@
 #!/bin/bash
 set -e
 
-SRC="./arcade"
+DIST="./dist"
 DEST="/var/www/kidsplay"
 
-rsync -av --delete $SRC/games $DEST/
-rsync -av $SRC/games.json $DEST/
-rsync -av $SRC/common/* $DEST/common/
+# Build di produzione: HTML/CSS/JS minificati, asset con hash nel nome,
+# file non referenziati esclusi (ricostruisce solo i file cambiati)
+python3 src/backend/build_frontend.py --precompress
+
+rsync -av --delete --exclude .build-cache.json $DIST/ $DEST/
 
 echo "Arcade e catalogo deployati"
@@ -0,0 +1,210 @@
+# Non-blocking performance log pipeline for KidsPlay.
+# Request threads only put records on a bounded queue; a background writer
+# drains it in batches (one write per batch instead of one per request, which
+# matters on the Pi's SD card), rotates the file by size and/or time and
+# gzips the rotated files. The pre-fork supervisor runs the same writer without
+# its thread, draining the workers' queue from its own main loop.
+
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROTATE_WHEN = ('never', 'hourly', 'daily')
+
+# Stop marker; None (like logging.handlers.QueueListener) survives a multiprocessing queue
+_STOP = None
+
+# logger.info(..., extra=NEVER_DROP): wait for room in a full queue like a warning
+NEVER_DROP = {'never_drop': True}
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops INFO records instead of blocking when the queue is full.
+
+    Warnings and errors (slow requests, failures) are never dropped, nor are
+    INFO records logged with ``extra=NEVER_DROP`` (error responses).
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, 'never_drop', False):
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class WriterHandler(logging.Handler):
+    """Handler writing each record straight through a BatchLogWriter, without a queue.
+
+    For the pre-fork supervisor's own (rare) records: putting them on the
+    multiprocessing queue would start a feeder thread in the process that
+    forks the workers.
+    """
+
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record):
+        # Workers' records queued earlier go first, keeping the file in order
+        self.writer.write_pending()
+        self.writer.write_records([record])
+
+
+class BatchLogWriter(threading.Thread):
+    """Background thread writing queued records to a rotating, compressed log file"""
+
+    def __init__(self, log_queue, path, formatter, max_bytes=10 * 1024 * 1024, rotate_when='daily',
+                 backup_count=14, compress=True, batch_size=512, flush_interval=1.0):
+        super().__init__(name='kidsplay-log-writer', daemon=True)
+        self.queue = log_queue
+        self.path = path
+        self.formatter = formatter
+        self.max_bytes = max_bytes
+        self.rotate_when = rotate_when
+        self.backup_count = backup_count
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self._stream = None
+        self._size = 0
+        self._next_rollover = self._compute_next_rollover(datetime.now())
+
+    def _compute_next_rollover(self, now):
+        if self.rotate_when == 'hourly':
+            return (now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).timestamp()
+        if self.rotate_when == 'daily':
+            return (now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)).timestamp()
+        return None
+
+    def _open(self):
+        self._stream = open(self.path, 'a', encoding='utf-8')
+        self._size = self._stream.tell()
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    record = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write_batch(batch)
+            if stop:
+                break
+        # Drain whatever is still queued before exiting
+        self.write_pending()
+        self.close()
+
+    def write_pending(self):
+        """Write every record queued right now, in batches; never waits for new ones.
+
+        Lets a process drain the queue from its own loop instead of running
+        the writer thread (the pre-fork supervisor must not run threads).
+        """
+        written = 0
+        batch = []
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is _STOP:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+            written += len(batch)
+        return written
+
+    def write_records(self, records):
+        """Write records that did not go through the queue"""
+        self._write_batch(records)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def _write_batch(self, records):
+        try:
+            text = ''.join(self.formatter.format(record) + '\n' for record in records)
+            if self._stream is None:
+                self._open()
+            if self._should_rollover(len(text.encode('utf-8'))):
+                self._rollover()
+            self._stream.write(text)
+            self._stream.flush()
+            self._size += len(text.encode('utf-8'))
+            self.written += len(records)
+            self.batches += 1
+        except Exception:
+            self.errors += 1
+
+    def _should_rollover(self, incoming):
+        if self.max_bytes and self._size and self._size + incoming > self.max_bytes:
+            return True
+        return self._next_rollover is not None and time.time() >= self._next_rollover
+
+    def _rollover(self):
+        """server_performance.log -> .log.1(.gz), shifting older backups up by one"""
+        self._stream.close()
+        self._stream = None
+        suffix = '.gz' if self.compress else ''
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}{suffix}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}{suffix}")
+            target = f"{self.path}.1{suffix}"
+            if self.compress:
+                with open(self.path, 'rb') as src, gzip.open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, target)
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._next_rollover = self._compute_next_rollover(datetime.now())
+        self._open()
+
+    def stop(self, timeout=5):
+        """Write everything still queued and close the file"""
+        if self.ident is None:
+            # Never started: the owner drains the queue with write_pending()
+            self.write_pending()
+            self.close()
+            return
+        self.queue.put(_STOP)
+        self.join(timeout)
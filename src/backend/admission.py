@@ -0,0 +1,129 @@
+# Admission control for KidsPlay: per-client token buckets and a global cap on
+# requests in flight. One tab stuck in a reload loop (or several debug
+# dashboards polling) gets fast 429s instead of saturating the Pi for everyone.
+
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Answered for loopback clients without consuming tokens or in-flight slots
+HEALTH_PATHS = frozenset({'/debug/performance', '/metrics'})
+
+
+def is_loopback(host):
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_loopback
+
+
+class ClientRateLimiter:
+    """Token bucket per client IP: ``rate`` requests/s sustained, bursts of ``burst``.
+
+    Buckets live in an LRU-ordered table of at most ``max_clients`` entries.
+    A bucket idle for ``idle_ttl`` seconds has refilled completely anyway, so
+    it is dropped; when the table is still full the least recently seen
+    client is evicted.
+    """
+
+    def __init__(self, rate=30.0, burst=120, max_clients=4096, idle_ttl=300.0, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self.idle_ttl = max(idle_ttl, self.burst / self.rate) if self.rate > 0 else idle_ttl
+        self.clock = clock
+        self._buckets = OrderedDict()  # ip -> [tokens, last_seen, throttled]
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def acquire(self, client):
+        """Take a token for ``client``.
+
+        Returns (wait, first_refusal): wait is 0 when the request is allowed,
+        otherwise the seconds until the next token; first_refusal is True only
+        for the first refusal since the client was last admitted, so
+        throttling is logged once rather than per request.
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                self._expire(now)
+                bucket = [self.burst, now, False]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            self._buckets[client] = bucket
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                bucket[2] = False
+                return 0, False
+            first = not bucket[2]
+            bucket[2] = True
+            return (1 - bucket[0]) / self.rate, first
+
+    def _expire(self, now):
+        buckets = self._buckets
+        while buckets:
+            client, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_ttl:
+                break
+            del buckets[client]
+            self.expired += 1
+        while len(buckets) >= self.max_clients:
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def get_stats(self):
+        with self._lock:
+            throttled = sum(1 for bucket in self._buckets.values() if bucket[2])
+            return {
+                'rate_per_client': self.rate,
+                'burst': self.burst,
+                'tracked_clients': len(self._buckets),
+                'max_clients': self.max_clients,
+                'throttled_clients': throttled,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
+
+
+class InFlightLimiter:
+    """Global cap on requests being processed at the same time (0 = unlimited)"""
+
+    def __init__(self, limit=32):
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self):
+        with self._lock:
+            if self.limit and self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'in_flight': self.in_flight, 'peak': self.peak}
+
+
+def retry_after_header(seconds):
+    """Retry-After takes whole seconds; never advertise 0"""
+    return str(max(1, math.ceil(seconds)))
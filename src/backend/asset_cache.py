@@ -0,0 +1,119 @@
+# In-memory LRU cache for static files served by KidsPlay.
+# On the Pi every GET would otherwise re-open and re-read the file from the SD
+# card; with the cache a hit costs a single stat() to check freshness, none when
+# the caller already has one from the path index.
+
+import glob
+import os
+import stat
+import threading
+from collections import OrderedDict, namedtuple
+
+CachedAsset = namedtuple('CachedAsset', ['data', 'size', 'mtime'])
+
+# Files that every game launch asks for, loaded at startup
+WARM_PATTERNS = (
+    'index.html',
+    'games/*/*/index.html',
+    'shared/common/core/*.js',
+    'shared/common/styles/*.css',
+)
+
+
+class AssetCache:
+    """Byte-bounded LRU of file contents, invalidated by mtime/size changes"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_file_size=2 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_size = min(max_file_size, max_bytes)
+        self._entries = OrderedDict()  # path -> (mtime_ns, CachedAsset)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path, st=None):
+        """Return a CachedAsset for path, reading it on a miss.
+
+        ``st`` is a current os.stat() of path, when the caller has one. Returns
+        None when the file does not exist, is not a regular file or is too big
+        to cache; the caller then falls back to the normal disk path.
+        """
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+        if not stat.S_ISREG(st.st_mode) or st.st_size > self.max_file_size:
+            return None
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None:
+                mtime_ns, asset = cached
+                if mtime_ns == st.st_mtime_ns and asset.size == st.st_size:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return asset
+                # File changed on disk: drop the stale copy
+                del self._entries[path]
+                self.current_bytes -= asset.size
+                self.invalidations += 1
+            self.misses += 1
+
+        try:
+            with open(path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                data = f.read()
+        except OSError:
+            return None
+        asset = CachedAsset(data, len(data), st.st_mtime)
+        if asset.size > self.max_file_size:
+            return asset
+        self._store(path, st.st_mtime_ns, asset)
+        return asset
+
+    def _store(self, path, mtime_ns, asset):
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self.current_bytes -= previous[1].size
+            self._entries[path] = (mtime_ns, asset)
+            self.current_bytes += asset.size
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+
+    def warm(self, root, patterns=WARM_PATTERNS):
+        """Preload the files every game launch needs; returns how many were loaded"""
+        loaded = 0
+        for pattern in patterns:
+            for path in sorted(glob.glob(os.path.join(root, pattern))):
+                if self.get(os.path.abspath(path)) is not None:
+                    loaded += 1
+        # Warm-up loads are not real traffic
+        with self._lock:
+            self.hits = self.misses = 0
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0,
+            }
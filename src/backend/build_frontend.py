@@ -0,0 +1,576 @@
+"""
+build_frontend.py - Production build of the KidsPlay frontend into dist/.
+
+Starting from the entry points (the arcade page, the game pages listed in
+data/games.json, profiles, manifest, service worker) it follows every local
+reference in HTML (src/href), CSS (url(), @import) and manifest.json, and:
+
+  - minifies HTML (including inline <script>/<style>), CSS and JS
+  - gives shared assets content-hashed names (base.3f2a9c1d.css) and rewrites
+    the references to them, dropping old ?v= cache-busting queries
+  - leaves out everything nothing refers to (docs, scripts, old pages, empty files)
+  - writes dist/build-manifest.json mapping each source to its output
+  - replaces the development sw.js with the generated precache service
+    worker (see service_worker.py)
+
+Builds are incremental: sources whose mtime/size and dependency names did not
+change are not read again. Serve the result with the normal server:
+
+    python src/backend/build_frontend.py                 # src/frontend -> dist/
+    python src/backend/build_frontend.py --precompress   # also .gz/.br variants
+    python src/backend/server.py --root dist --cache-profile production
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import time
+
+import precompress
+import service_worker
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = os.path.normpath(os.path.join(BACKEND_DIR, '..', 'frontend'))
+DEFAULT_DIST = os.path.normpath(os.path.join(BACKEND_DIR, '..', '..', 'dist'))
+
+MANIFEST_FILE = 'build-manifest.json'
+CACHE_FILE = '.build-cache.json'
+
+# Always built, under their own names: URLs typed, bookmarked or built at runtime
+ENTRY_POINTS = ('index.html', 'manifest.json', 'sw.js', 'favicon.ico', 'debug/performance.html', 'data/games.json')
+ENTRY_GLOBS = ('config/*.json',)
+# Kept under their own names too: game code builds these paths at runtime
+KEEP_GLOBS = ('games/*/*/assets/*', 'games/*/*/assets/*/*', 'games/*/*/assets/*/*/*')
+# Never shipped even if referenced
+NEVER_SHIP_EXTENSIONS = {'.md', '.py', '.gz', '.br'}
+
+# Referenced assets that get content-hashed names
+HASHED_EXTENSIONS = {'.js', '.mjs', '.css', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico',
+                     '.woff', '.woff2', '.ttf', '.mp3', '.ogg', '.wav', '.m4a'}
+HASH_LENGTH = 10
+
+HTML_REF_RE = re.compile(r'''(\b(?:src|href)\s*=\s*)(["'])([^"']*)\2''', re.IGNORECASE)
+CSS_URL_RE = re.compile(r'''(url\(\s*)(["']?)([^"')]+)\2(\s*\))''', re.IGNORECASE)
+CSS_IMPORT_RE = re.compile(r'''(@import\s+)(["'])([^"']+)\2''', re.IGNORECASE)
+EXTERNAL_PREFIXES = ('http:', 'https:', '//', 'data:', 'mailto:', 'tel:', 'javascript:', 'blob:', '#', 'about:')
+VERSION_QUERY_RE = re.compile(r'^(v|ver|version|hash)=[^&]*$')
+
+
+# ---------------------------------------------------------------- minifiers
+
+JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                     'yield', 'await', 'instanceof'}
+
+
+def minify_js(source):
+    """Drop comments, indentation and blank lines; strings, templates and regexes are kept verbatim.
+
+    Line breaks are preserved so automatic semicolon insertion behaves exactly
+    as in the source.
+    """
+    out = []
+    i = 0
+    n = len(source)
+    stack = []          # open template literals: brace depth inside each ${ }
+    line_start = True
+
+    def last_significant():
+        for chunk in reversed(out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    while i < n:
+        c = source[i]
+        if c in ' \t\r':
+            j = i
+            while j < n and source[j] in ' \t\r':
+                j += 1
+            if not line_start and j < n and source[j] != '\n':
+                out.append(' ')
+            i = j
+            continue
+        if c == '\n':
+            while out and out[-1] == ' ':
+                out.pop()
+            if not line_start:
+                out.append('\n')
+            line_start = True
+            i += 1
+            continue
+        if c == '/' and i + 1 < n and source[i + 1] == '/':
+            while i < n and source[i] != '\n':
+                i += 1
+            continue
+        if c == '/' and i + 1 < n and source[i + 1] == '*':
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        line_start = False
+        if c in '"\'':
+            j = i + 1
+            while j < n and source[j] != c and source[j] != '\n':
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        if c == '`' or (c == '}' and stack and stack[-1] == 0):
+            if c == '}':
+                stack.pop()
+            # Inside a template literal: copy up to the closing backtick or the next ${
+            j = i + 1
+            while j < n:
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '`':
+                    break
+                if source[j] == '$' and j + 1 < n and source[j + 1] == '{':
+                    break
+                j += 1
+            if j < n and source[j] == '$':
+                out.append(source[i:j + 2])
+                stack.append(0)
+                i = j + 2
+            else:
+                out.append(source[i:j + 1])
+                i = j + 1
+            continue
+        if c == '{' and stack:
+            stack[-1] += 1
+        elif c == '}' and stack:
+            stack[-1] -= 1
+        if c == '/':
+            previous = last_significant()
+            word = re.search(r'[A-Za-z_$][\w$]*$', previous)
+            if not previous or previous[-1] in JS_REGEX_PRECEDERS or (word and word.group() in JS_REGEX_KEYWORDS):
+                j = i + 1
+                in_class = False
+                while j < n and source[j] != '\n':
+                    ch = source[j]
+                    if ch == '\\':
+                        j += 2
+                        continue
+                    if ch == '[':
+                        in_class = True
+                    elif ch == ']':
+                        in_class = False
+                    elif ch == '/' and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < n and (source[j].isalnum() or source[j] == '_'):
+                    j += 1
+                out.append(source[i:j])
+                i = j
+                continue
+        out.append(c)
+        i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Drop comments and optional whitespace; strings are kept verbatim"""
+    parts = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', source)
+    for k in range(0, len(parts), 2):
+        text = re.sub(r'/\*.*?\*/', '', parts[k], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+        text = re.sub(r':\s+', ':', text)
+        parts[k] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+HTML_BLOCK_RE = re.compile(
+    r'(<!--.*?-->|<script\b[^>]*>.*?</script\s*>|<style\b[^>]*>.*?</style\s*>|'
+    r'<pre\b.*?</pre\s*>|<textarea\b.*?</textarea\s*>)',
+    re.IGNORECASE | re.DOTALL
+)
+SCRIPT_TYPE_RE = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+
+
+def _collapse_whitespace(text):
+    return re.sub(r'\s+', lambda m: '\n' if '\n' in m.group() else ' ', text)
+
+
+def minify_html(source):
+    """Collapse whitespace, drop comments and minify inline scripts and styles"""
+    out = []
+    for k, part in enumerate(HTML_BLOCK_RE.split(source)):
+        if k % 2 == 0:
+            out.append(_collapse_whitespace(part))
+            continue
+        lower = part[:10].lower()
+        if lower.startswith('<!--'):
+            # Conditional comments carry markup for old browsers
+            if part.startswith('<!--[if'):
+                out.append(part)
+            continue
+        if lower.startswith('<script') or lower.startswith('<style'):
+            open_end = part.index('>') + 1
+            close_start = part.lower().rindex('</')
+            tag, body, close = part[:open_end], part[open_end:close_start], part[close_start:]
+            if lower.startswith('<style'):
+                body = minify_css(body)
+            else:
+                script_type = SCRIPT_TYPE_RE.search(tag)
+                if not script_type or script_type.group(1).lower() in ('text/javascript', 'module',
+                                                                      'application/javascript'):
+                    body = minify_js(body).strip()
+            out.append(_collapse_whitespace(tag) + body + close)
+            continue
+        out.append(part)
+    return ''.join(out).strip() + '\n'
+
+
+# ---------------------------------------------------------------- references
+
+def split_url(url):
+    """('path', 'query', 'fragment') of a reference"""
+    path, _, fragment = url.partition('#')
+    path, _, query = path.partition('?')
+    return path, query, fragment
+
+
+def resolve(referrer, url):
+    """Source-relative path a local reference points to, or None"""
+    url = url.strip()
+    if not url or url.lower().startswith(EXTERNAL_PREFIXES) or '${' in url or '{{' in url:
+        return None
+    path = split_url(url)[0]
+    if not path:
+        return None
+    if path.startswith('/'):
+        resolved = posixpath.normpath(path.lstrip('/'))
+    else:
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(referrer), path))
+    if resolved.startswith('..') or resolved == '.':
+        return None
+    return resolved
+
+
+def text_references(rel, text):
+    """Local references of an HTML/CSS/manifest file, as (resolved path, original url)"""
+    ext = posixpath.splitext(rel)[1].lower()
+    urls = []
+    if ext in ('.html', '.htm'):
+        urls += [m.group(3) for m in HTML_REF_RE.finditer(text)]
+        urls += [m.group(3) for m in CSS_URL_RE.finditer(text)]
+    elif ext == '.css':
+        urls += [m.group(3) for m in CSS_URL_RE.finditer(text)]
+        urls += [m.group(3) for m in CSS_IMPORT_RE.finditer(text)]
+    elif rel == 'manifest.json':
+        try:
+            urls += [icon.get('src', '') for icon in json.loads(text).get('icons', [])]
+        except ValueError:
+            pass
+    return [(resolve(rel, url), url) for url in urls if resolve(rel, url)]
+
+
+class Build:
+    def __init__(self, source, dist, verbose=False):
+        self.source = source
+        self.dist = dist
+        self.verbose = verbose
+        self.cache = self._load_json(os.path.join(dist, CACHE_FILE)) or {}
+        self.files = {}         # source rel -> manifest entry
+        self.missing = {}       # unresolved reference -> first referrer
+        self.rebuilt = 0
+        self.reused = 0
+
+    @staticmethod
+    def _load_json(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def abspath(self, rel):
+        return os.path.join(self.source, *rel.split('/'))
+
+    def exists(self, rel):
+        return os.path.isfile(self.abspath(rel))
+
+    def entry_points(self):
+        entries = [rel for rel in ENTRY_POINTS if self.exists(rel)]
+        for pattern in ENTRY_GLOBS + KEEP_GLOBS:
+            entries += sorted(self._glob(pattern))
+        catalog = self._load_json(self.abspath('data/games.json')) or {}
+        for game in catalog.get('games', []):
+            page = f"games/{game.get('category')}/{game.get('id')}/index.html"
+            if self.exists(page):
+                entries.append(page)
+        return list(dict.fromkeys(rel for rel in entries if self.shippable(rel)))
+
+    def _glob(self, pattern):
+        directory, _, name_pattern = pattern.rpartition('/')
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.source):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            rel_dir = os.path.relpath(dirpath, self.source).replace(os.sep, '/')
+            if not fnmatch.fnmatch(rel_dir, directory):
+                continue
+            found += [f"{rel_dir}/{name}" for name in filenames if fnmatch.fnmatch(name, name_pattern)]
+        return found
+
+    def shippable(self, rel):
+        name = posixpath.basename(rel)
+        return not name.startswith('.') and posixpath.splitext(name)[1].lower() not in NEVER_SHIP_EXTENSIONS
+
+    def is_hashed(self, rel, entries):
+        return rel not in entries and posixpath.splitext(rel)[1].lower() in HASHED_EXTENSIONS
+
+    def source_state(self, rel):
+        st = os.stat(self.abspath(rel))
+        return [st.st_mtime_ns, st.st_size]
+
+    def references(self, rel):
+        """Resolved local references of rel (cached by mtime/size)"""
+        cached = self.cache.get(rel)
+        if cached and cached.get('source') == self.source_state(rel) and 'refs' in cached:
+            return cached['refs']
+        ext = posixpath.splitext(rel)[1].lower()
+        if ext not in ('.html', '.htm', '.css') and rel != 'manifest.json':
+            return []
+        with open(self.abspath(rel), encoding='utf-8') as f:
+            return sorted({path for path, _ in text_references(rel, f.read())})
+
+    def run(self):
+        started = time.perf_counter()
+        entries = set(self.entry_points())
+
+        # Depth-first from the entry points: dependencies are built before their referrers
+        order = []
+        state = {}
+        refs_of = {}
+
+        def visit(rel, referrer):
+            if state.get(rel) is not None:
+                return
+            if not self.exists(rel):
+                self.missing.setdefault(rel, referrer)
+                return
+            if not self.shippable(rel):
+                return
+            state[rel] = 'visiting'
+            refs_of[rel] = self.references(rel)
+            for dep in refs_of[rel]:
+                visit(dep, rel)
+            state[rel] = 'done'
+            order.append(rel)
+
+        for rel in sorted(entries):
+            visit(rel, None)
+
+        outputs = {}
+        for rel in order:
+            deps = {dep: outputs[dep] for dep in refs_of[rel] if dep in outputs}
+            entry = self.build_file(rel, refs_of[rel], deps, self.is_hashed(rel, entries))
+            outputs[rel] = entry['output']
+            self.files[rel] = entry
+
+        removed = self.remove_stale(set(outputs.values()))
+        dropped = sorted(rel for rel in self.all_sources() if rel not in self.files)
+        self.write_manifest(dropped)
+        with open(os.path.join(self.dist, CACHE_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f)
+        return {
+            'files': len(self.files),
+            'rebuilt': self.rebuilt,
+            'reused': self.reused,
+            'removed': removed,
+            'dropped': dropped,
+            'missing': self.missing,
+            'source_bytes': sum(e['source_size'] for e in self.files.values()),
+            'output_bytes': sum(e['size'] for e in self.files.values()),
+            'seconds': time.perf_counter() - started,
+        }
+
+    def build_file(self, rel, refs, deps, hashed):
+        source_state = self.source_state(rel)
+        cached = self.cache.get(rel)
+        if (cached and cached.get('source') == source_state and cached.get('deps') == deps
+                and cached.get('hashed') == hashed
+                and os.path.isfile(os.path.join(self.dist, *cached['output'].split('/')))):
+            self.reused += 1
+            return {key: cached[key] for key in ('output', 'hash', 'size', 'source_size')}
+
+        with open(self.abspath(rel), 'rb') as f:
+            data = f.read()
+        data = self.transform(rel, data, deps)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        output = rel
+        if hashed:
+            stem, ext = posixpath.splitext(rel)
+            output = f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+        target = os.path.join(self.dist, *output.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+        self.rebuilt += 1
+        if self.verbose:
+            print(f"  {rel} -> {output} ({source_state[1]:,} -> {len(data):,} bytes)")
+
+        entry = {'output': output, 'hash': digest, 'size': len(data), 'source_size': source_state[1]}
+        self.cache[rel] = dict(entry, source=source_state, deps=deps, refs=refs, hashed=hashed)
+        return entry
+
+    def transform(self, rel, data, deps):
+        ext = posixpath.splitext(rel)[1].lower()
+        if ext not in ('.html', '.htm', '.css', '.js', '.mjs', '.json'):
+            return data
+        text = data.decode('utf-8')
+        if ext in ('.html', '.htm'):
+            text = self.rewrite(rel, text, deps, (HTML_REF_RE, CSS_URL_RE))
+            text = minify_html(text)
+        elif ext == '.css':
+            text = self.rewrite(rel, text, deps, (CSS_URL_RE, CSS_IMPORT_RE))
+            text = minify_css(text)
+        elif ext in ('.js', '.mjs'):
+            text = minify_js(text)
+        else:
+            try:
+                document = json.loads(text)
+            except ValueError:
+                return data
+            if rel == 'manifest.json':
+                for icon in document.get('icons', []):
+                    icon['src'] = self.rewrite_url(rel, icon.get('src', ''), deps)
+            text = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+        return text.encode('utf-8')
+
+    def rewrite(self, rel, text, deps, patterns):
+        for pattern in patterns:
+            text = pattern.sub(
+                lambda m: m.group(1) + m.group(2) + self.rewrite_url(rel, m.group(3), deps) + m.group(2)
+                + (m.group(4) if pattern is CSS_URL_RE else ''),
+                text
+            )
+        return text
+
+    def rewrite_url(self, rel, url, deps):
+        """Point a reference at the dependency's output name (relative like the original)"""
+        target = resolve(rel, url)
+        if target is None or target not in deps or deps[target] == target:
+            return url
+        path, query, fragment = split_url(url.strip())
+        output = deps[target]
+        if path.startswith('/'):
+            new = '/' + output
+        else:
+            new = posixpath.relpath(output, posixpath.dirname(rel) or '.')
+        # The content hash replaces cache-busting queries
+        params = [p for p in query.split('&') if p and not VERSION_QUERY_RE.match(p)]
+        if params:
+            new += '?' + '&'.join(params)
+        if fragment:
+            new += '#' + fragment
+        return new
+
+    def all_sources(self):
+        for dirpath, dirnames, filenames in os.walk(self.source):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.endswith(precompress.VARIANT_SUFFIXES):
+                    continue
+                yield os.path.relpath(os.path.join(dirpath, name), self.source).replace(os.sep, '/')
+
+    def remove_stale(self, outputs):
+        """Delete dist files no longer produced (and their .gz/.br variants)"""
+        keep = set(outputs) | {MANIFEST_FILE, CACHE_FILE, service_worker.VERSION_FILE}
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.dist, topdown=False):
+            for name in filenames:
+                rel = os.path.relpath(os.path.join(dirpath, name), self.dist).replace(os.sep, '/')
+                base = rel[:-len(posixpath.splitext(rel)[1])] if rel.endswith(precompress.VARIANT_SUFFIXES) else rel
+                if rel not in keep and base not in keep:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+            if dirpath != self.dist and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        for rel in list(self.cache):
+            if rel not in self.files:
+                del self.cache[rel]
+        return removed
+
+    def write_manifest(self, dropped):
+        version = hashlib.blake2b(
+            ''.join(f"{rel}:{entry['hash']}" for rel, entry in sorted(self.files.items())).encode(),
+            digest_size=8
+        ).hexdigest()
+        manifest = {
+            'version': version,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'files': dict(sorted(self.files.items())),
+            'dropped': dropped,
+        }
+        with open(os.path.join(self.dist, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+            f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help="frontend sources (default: src/frontend)")
+    parser.add_argument('--dist', default=DEFAULT_DIST, help="output directory (default: dist/)")
+    parser.add_argument('--force', action='store_true', help="rebuild everything, ignoring the build cache")
+    parser.add_argument('--precompress', action='store_true', help="also write .gz/.br variants of the output")
+    parser.add_argument('--no-service-worker', dest='service_worker', action='store_false',
+                        help="keep the development sw.js (kill switch) instead of the precache worker")
+    parser.add_argument('-v', '--verbose', action='store_true', help="list every rebuilt file")
+    args = parser.parse_args(argv)
+
+    source = os.path.abspath(args.source)
+    dist = os.path.abspath(args.dist)
+    if not os.path.isdir(source):
+        print(f"❌ Not a directory: {source}")
+        return 1
+    if dist == source or dist.startswith(source + os.sep):
+        print("❌ --dist must be outside the source tree")
+        return 1
+    os.makedirs(dist, exist_ok=True)
+    if args.force:
+        cache = os.path.join(dist, CACHE_FILE)
+        if os.path.exists(cache):
+            os.remove(cache)
+
+    generated = os.path.join(dist, service_worker.VERSION_FILE)
+    if not args.service_worker and os.path.exists(generated):
+        # dist/sw.js is the generated worker: drop it so the kill switch is built again
+        os.remove(generated)
+        if os.path.exists(os.path.join(dist, service_worker.SW_FILE)):
+            os.remove(os.path.join(dist, service_worker.SW_FILE))
+
+    result = Build(source, dist, verbose=args.verbose).run()
+    saved = result['source_bytes'] - result['output_bytes']
+    print(f"📦 {result['files']} files in {os.path.relpath(dist)} ({result['rebuilt']} rebuilt, "
+          f"{result['reused']} unchanged, {result['removed']} stale removed) in {result['seconds']:.2f}s")
+    print(f"   {result['source_bytes'] / 1024:.0f}KB -> {result['output_bytes'] / 1024:.0f}KB "
+          f"({saved / max(1, result['source_bytes']):.0%} smaller)")
+    if result['dropped']:
+        print(f"🗑️  {len(result['dropped'])} unreferenced files left out: " + ', '.join(result['dropped'][:8])
+              + (' ...' if len(result['dropped']) > 8 else ''))
+    for rel, referrer in sorted(result['missing'].items()):
+        print(f"⚠️  {referrer} refers to missing {rel}")
+
+    if args.service_worker:
+        info = service_worker.generate(dist)
+        print(f"🧰 Service worker {info['version']}: {info['shell_files']} shell files, "
+              f"{len(info['games'])} games cached on first play")
+    if args.precompress:
+        files, original, compressed = precompress.precompress_tree(dist)
+        print(f"🗜️  {files} precompressed variants ({original / 1024:.0f}KB -> {compressed / 1024:.0f}KB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
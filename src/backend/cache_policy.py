@@ -0,0 +1,113 @@
+# Browser cache policy for KidsPlay: Cache-Control profiles, strong ETags and
+# conditional request (If-None-Match / If-Modified-Since) evaluation.
+
+import email.utils
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheProfile = namedtuple('CacheProfile', ['name', 'default', 'revalidate', 'versioned', 'legacy_no_cache'])
+
+CACHE_PROFILES = {
+    # Development: never cache anything (the original behaviour)
+    'dev': CacheProfile(
+        name='dev',
+        default='no-cache, no-store, must-revalidate',
+        revalidate='no-cache, no-store, must-revalidate',
+        versioned='no-cache, no-store, must-revalidate',
+        legacy_no_cache=True,
+    ),
+    # Production: revalidate plain files with their ETag (cheap 304s) and let
+    # browsers keep versioned/content-hashed assets for a year
+    'production': CacheProfile(
+        name='production',
+        default='no-cache',
+        revalidate='no-cache',
+        versioned='public, max-age=31536000, immutable',
+        legacy_no_cache=False,
+    ),
+}
+
+# name.3f2a9c1b.js / name-3f2a9c1b.css style content-hashed filenames
+HASHED_NAME_RE = re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$')
+VERSION_QUERY_RE = re.compile(r'(^|&)(v|ver|version|hash)=[^&]+')
+
+# Never cached for long even if they look versioned
+ALWAYS_REVALIDATE = ('/sw.js', '/manifest.json')
+
+
+def is_versioned(url_path, query=''):
+    """True for URLs whose content can never change (hashed name or ?v= query)"""
+    if url_path in ALWAYS_REVALIDATE:
+        return False
+    return bool(HASHED_NAME_RE.search(url_path) or VERSION_QUERY_RE.search(query))
+
+
+def cache_control_for(profile, url_path, query=''):
+    return profile.versioned if is_versioned(url_path, query) else profile.revalidate
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified_since(if_modified_since, mtime):
+    """True when the file has not changed since the If-Modified-Since date"""
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return False
+    if since is None or since.tzinfo is None:
+        return False
+    return int(mtime) <= since.timestamp()
+
+
+class ETagStore:
+    """Strong content-hash ETags, computed once per file version.
+
+    Entries are keyed by path and reused while (size, mtime) stay the same, so
+    a file is hashed again only after it changes on disk.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> (size, mtime, etag)
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    def get(self, path, size, mtime, source):
+        """Return the ETag for source (a file object positioned at 0)"""
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == size and cached[1] == mtime:
+                self._entries.move_to_end(path)
+                return cached[2]
+
+        digest = hashlib.blake2b(digest_size=16)
+        if hasattr(source, 'getbuffer'):
+            with source.getbuffer() as view:
+                digest.update(view)
+        else:
+            for chunk in iter(lambda: source.read(256 * 1024), b''):
+                digest.update(chunk)
+            source.seek(0)
+        etag = f'"{digest.hexdigest()}"'
+
+        with self._lock:
+            self._entries[path] = (size, mtime, etag)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.computed += 1
+        return etag
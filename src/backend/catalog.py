@@ -0,0 +1,105 @@
+# Per-profile game catalog for KidsPlay (/api/catalog?profile=...).
+# Clients used to download data/games.json and their config/<profile>.json and
+# filter in the browser. The index below builds the finished response for
+# every profile (JSON body, gzip body, ETag) from the config store's parsed
+# snapshot, once per config version, so serving a catalog is a dict lookup.
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_PROFILE = 'default'
+
+CatalogResponse = namedtuple('CatalogResponse', ['body', 'gzip_body', 'etag'])
+
+
+def game_matches(game, profile):
+    """Age range and difficulty checks (the enabled_games list is applied separately)"""
+    age = profile.get('age')
+    if age is not None:
+        if game.get('min_age') is not None and age < game['min_age']:
+            return False
+        if game.get('max_age') is not None and age > game['max_age']:
+            return False
+    levels = game.get('difficulty_levels')
+    return not levels or profile.get('difficulty_level') in levels
+
+
+def profile_catalog(name, profile, catalog, strict=False):
+    """The catalog as one profile sees it: enabled games, in catalog order.
+
+    Every game gets the difficulty to launch it with: the profile's level if
+    the game has it, otherwise the game's first level. ``strict`` also drops
+    games outside the child's age range or without the profile's difficulty.
+    """
+    enabled = set(profile.get('enabled_games') or ())
+    level = profile.get('difficulty_level')
+    games = []
+    for game in catalog.get('games', []):
+        if game.get('id') not in enabled or (strict and not game_matches(game, profile)):
+            continue
+        levels = game.get('difficulty_levels') or []
+        games.append(dict(game, difficulty=level if not levels or level in levels else levels[0]))
+    return {
+        'profile': name,
+        'catalog_version': catalog.get('version'),
+        'strict': strict,
+        'config': profile,
+        'games': games,
+    }
+
+
+def build_response(document):
+    body = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    return CatalogResponse(body, gzip.compress(body, compresslevel=9, mtime=0), etag)
+
+
+class CatalogIndex:
+    """Precomputed /api/catalog responses for every profile in a ConfigStore.
+
+    The table is rebuilt the first time it is used after the store swapped
+    in a new snapshot; invalid edits never reach the store, so they never
+    reach the catalog either.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._responses = {}
+        self._built_from = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.built_at = None
+
+    def get(self, profile=DEFAULT_PROFILE, strict=False):
+        """CatalogResponse for ``profile``, or None if there is no such profile"""
+        snapshot = self.store.snapshot
+        if snapshot is not self._built_from:
+            with self._lock:
+                if snapshot is not self._built_from:
+                    self._rebuild(snapshot)
+        return self._responses.get((profile, strict))
+
+    def _rebuild(self, snapshot):
+        responses = {}
+        if snapshot is not None:
+            for name, profile in snapshot.profiles.items():
+                for strict in (False, True):
+                    document = profile_catalog(name, profile, snapshot.catalog, strict)
+                    document['config_version'] = snapshot.version
+                    responses[name, strict] = build_response(document)
+        # Readers see either the old table or the new one, never a mix
+        self._responses = responses
+        self._built_from = snapshot
+        self.builds += 1
+        self.built_at = time.time()
+
+    def get_stats(self):
+        return {
+            'profiles': sorted({name for name, _ in self._responses}),
+            'builds': self.builds,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.built_at)) if self.built_at else None,
+        }
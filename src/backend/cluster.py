@@ -0,0 +1,290 @@
+# Pre-fork multi-process serving for KidsPlay.
+# The GIL keeps one server process on one core; on the Pi the supervisor forks
+# N workers that each bind the port with SO_REUSEPORT (the kernel spreads
+# connections between them) and restarts any worker that dies. Workers write
+# their request counters and latency buckets to their own slot of a shared
+# memory segment, so any worker can report cluster-wide stats.
+
+import mmap
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from array import array
+
+from histograms import BUCKET_COUNT, LatencyHistogram, bucket_index
+
+# Per-worker slot header (unsigned 64-bit integers). pid/restarts/started are
+# written by the supervisor, the rest by the worker.
+HEADER = ('pid', 'restarts', 'started', 'requests', 'errors', 'slow', 'bytes', 'total_us', 'max_us', 'heartbeat')
+_FIELD = {name: i for i, name in enumerate(HEADER)}
+RING_SECONDS = 60
+_RING_SECS = len(HEADER)
+_RING_COUNTS = _RING_SECS + RING_SECONDS
+_BUCKETS = _RING_COUNTS + RING_SECONDS
+SLOT_WORDS = _BUCKETS + BUCKET_COUNT
+
+SLOW_REQUEST_SECONDS = 0.5
+
+
+def prefork_supported():
+    return hasattr(os, 'fork') and hasattr(socket, 'SO_REUSEPORT')
+
+
+class WorkerSlot:
+    """One worker's counters inside the shared segment (single writer: that worker)"""
+
+    def __init__(self, words, index):
+        self.index = index
+        self.words = words
+
+    def __getitem__(self, name):
+        return self.words[_FIELD[name]]
+
+    def __setitem__(self, name, value):
+        self.words[_FIELD[name]] = value
+
+    def record(self, duration, size, is_error, now=None):
+        words = self.words
+        words[_FIELD['requests']] += 1
+        if is_error:
+            words[_FIELD['errors']] += 1
+        if duration > SLOW_REQUEST_SECONDS:
+            words[_FIELD['slow']] += 1
+        words[_FIELD['bytes']] += size
+        micros = int(duration * 1_000_000)
+        words[_FIELD['total_us']] += micros
+        if micros > words[_FIELD['max_us']]:
+            words[_FIELD['max_us']] = micros
+        words[_BUCKETS + bucket_index(duration)] += 1
+
+        second = int(now if now is not None else time.time())
+        ring = second % RING_SECONDS
+        if words[_RING_SECS + ring] != second:
+            words[_RING_SECS + ring] = second
+            words[_RING_COUNTS + ring] = 0
+        words[_RING_COUNTS + ring] += 1
+        words[_FIELD['heartbeat']] = second
+
+    def requests_in_last(self, seconds, now):
+        """Requests recorded during the last ``seconds`` (at most RING_SECONDS)"""
+        words = self.words
+        oldest = now - min(seconds, RING_SECONDS)
+        return sum(
+            words[_RING_COUNTS + i] for i in range(RING_SECONDS)
+            if oldest < words[_RING_SECS + i] <= now
+        )
+
+    def histogram(self):
+        hist = LatencyHistogram()
+        hist.counts = array('Q', self.words[_BUCKETS:_BUCKETS + BUCKET_COUNT].tobytes())
+        hist.count = sum(hist.counts)
+        hist.total = self.words[_FIELD['total_us']] / 1_000_000
+        hist.max = self.words[_FIELD['max_us']] / 1_000_000
+        return hist
+
+
+class SharedStats:
+    """Anonymous shared mapping with one WorkerSlot per worker process.
+
+    Created by the supervisor before forking, so every worker (including
+    restarted ones) inherits the same mapping. Readers do not lock: each
+    word is written by one process only and aligned 64-bit reads do not tear.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._map = mmap.mmap(-1, workers * SLOT_WORDS * 8)
+        words = memoryview(self._map).cast('Q')
+        self.slots = [WorkerSlot(words[i * SLOT_WORDS:(i + 1) * SLOT_WORDS], i) for i in range(workers)]
+
+    def aggregate(self, now=None):
+        now = int(now if now is not None else time.time())
+        latency = LatencyHistogram()
+        totals = dict.fromkeys(('requests', 'errors', 'slow', 'bytes'), 0)
+        per_minute = 0
+        workers = []
+        for slot in self.slots:
+            hist = slot.histogram()
+            latency.merge(hist)
+            for name in totals:
+                totals[name] += slot[name]
+            recent = slot.requests_in_last(60, now)
+            per_minute += recent
+            workers.append({
+                'worker': slot.index,
+                'pid': slot['pid'],
+                'alive': bool(slot['pid']),
+                'restarts': slot['restarts'],
+                'uptime_seconds': now - slot['started'] if slot['started'] else 0,
+                'requests': slot['requests'],
+                'errors': slot['errors'],
+                'requests_per_minute': recent,
+                'p90_ms': hist.quantile(0.9) * 1000,
+            })
+        return dict(totals, workers=workers, requests_per_minute=per_minute, latency=latency)
+
+
+def _exit_on_sigterm(signum, frame):
+    # Until run_worker installs its graceful handler: unwind and flush the logs
+    sys.exit(0)
+
+
+class Supervisor:
+    """Forks ``workers`` processes running ``run_worker(slot)`` and keeps them alive.
+
+    A worker that exits unexpectedly is restarted after a delay that doubles
+    while it keeps crashing quickly (capped at ``max_backoff`` seconds).
+    SIGINT/SIGTERM stop the supervisor, which then sends SIGTERM to the
+    workers and gives them ``stop_timeout`` seconds to drain before SIGKILL.
+    SIGHUP calls ``on_reload()`` (which starts the replacing server and
+    returns its Popen); ``on_started()`` runs once the first workers exist.
+
+    The supervisor keeps forking for as long as it runs, so it must stay
+    single-threaded: a thread holding a lock (logging, a queue) at fork time
+    leaves that lock held forever in the child. Periodic work goes in
+    ``on_tick()``, called from the main loop every 0.2 seconds.
+    """
+
+    def __init__(self, workers, run_worker, shared, logger, max_backoff=30.0, stop_timeout=10.0,
+                 on_reload=None, on_started=None, on_tick=None):
+        self.workers = workers
+        self.run_worker = run_worker
+        self.shared = shared
+        self.logger = logger
+        self.max_backoff = max_backoff
+        self.stop_timeout = stop_timeout
+        self.on_reload = on_reload
+        self.on_started = on_started
+        self.on_tick = on_tick
+        self.children = {}                  # pid -> slot index
+        self.backoff = [1.0] * workers
+        self.pending = {}                   # slot index -> restart time
+        self.stopping = False
+        self.reload_requested = False
+        self.successor = None
+
+    def spawn(self, index):
+        slot = self.shared.slots[index]
+        if threading.active_count() > 1:
+            names = ', '.join(t.name for t in threading.enumerate() if t is not threading.current_thread())
+            self.logger.warning(f"FORK WITH THREADS RUNNING: worker {index} may inherit held locks ({names})")
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, _exit_on_sigterm)
+                self.run_worker(slot)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 0
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        slot['pid'] = pid
+        slot['started'] = int(time.time())
+        self.children[pid] = index
+        return pid
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _request_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def run(self):
+        previous = {sig: signal.signal(sig, self._stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        if self.on_reload is not None:
+            previous[signal.SIGHUP] = signal.signal(signal.SIGHUP, self._request_reload)
+        try:
+            for index in range(self.workers):
+                self.spawn(index)
+            self.logger.info(f"Pre-fork supervisor: {self.workers} workers started")
+            if self.on_started is not None:
+                self.on_started()
+            while not self.stopping:
+                self._reap()
+                self._restart_due()
+                if self.reload_requested:
+                    self._reload()
+                if self.on_tick is not None:
+                    self.on_tick()
+                time.sleep(0.2)
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            self.terminate(self.stop_timeout)
+
+    def _reload(self):
+        self.reload_requested = False
+        if self.successor is not None and self.successor.poll() is None:
+            return
+        try:
+            self.successor = self.on_reload()
+        except OSError as e:
+            self.logger.error(f"RELOAD FAILED: cannot start the new server: {e}")
+            return
+        self.logger.info(f"Reload: new server started (pid {self.successor.pid}), "
+                         f"workers drain once it serves")
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            slot = self.shared.slots[index]
+            lifetime = time.time() - slot['started']
+            slot['pid'] = 0
+            if self.stopping:
+                continue
+            # Crashing right after start: back off; a worker that ran for a while restarts quickly
+            self.backoff[index] = min(self.max_backoff, self.backoff[index] * 2) if lifetime < 10 else 1.0
+            self.pending[index] = time.time() + self.backoff[index]
+            self.logger.warning(
+                f"WORKER EXITED: worker {index} (pid {pid}, status {os.waitstatus_to_exitcode(status)}) "
+                f"after {lifetime:.0f}s, restarting in {self.backoff[index]:.0f}s"
+            )
+
+    def _restart_due(self):
+        now = time.time()
+        for index, due in list(self.pending.items()):
+            if now >= due:
+                del self.pending[index]
+                self.shared.slots[index]['restarts'] += 1
+                self.spawn(index)
+
+    def terminate(self, timeout=10.0):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + timeout
+        while self.children and time.time() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            index = self.children.pop(pid, None)
+            if index is not None:
+                self.shared.slots[index]['pid'] = 0
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
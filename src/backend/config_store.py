@@ -0,0 +1,247 @@
+# In-memory profile and catalog configuration for KidsPlay.
+# data/games.json and the profiles in config/ are parsed once, validated and
+# kept as an immutable snapshot; the server answers those URLs from it. The
+# source files are watched (inotify on Linux, mtime polling elsewhere): an
+# edit that parses and validates replaces the snapshot in one assignment and
+# bumps the version clients poll at /api/config/version, while a broken or
+# half-written file is reported and ignored, so no request ever sees it.
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from fs_watch import InotifyWatcher
+
+CATALOG_FILE = 'data/games.json'
+PROFILE_DIR = 'config'
+
+# Body served for one config URL
+ConfigFile = namedtuple('ConfigFile', ['body', 'gzip_body', 'etag'])
+ConfigSnapshot = namedtuple('ConfigSnapshot', ['version', 'generation', 'loaded_at', 'catalog', 'profiles', 'files'])
+
+
+class ConfigError(ValueError):
+    """A config file that does not parse or does not validate"""
+
+
+def validate_catalog(catalog):
+    games = catalog.get('games') if isinstance(catalog, dict) else None
+    if not isinstance(games, list):
+        raise ConfigError(f"{CATALOG_FILE}: no 'games' list")
+    seen = set()
+    for i, game in enumerate(games):
+        if not isinstance(game, dict):
+            raise ConfigError(f"{CATALOG_FILE}: game #{i} is not an object")
+        for key in ('id', 'category', 'title'):
+            if not isinstance(game.get(key), str) or not game[key]:
+                raise ConfigError(f"{CATALOG_FILE}: game #{i} has no '{key}'")
+        if game['id'] in seen:
+            raise ConfigError(f"{CATALOG_FILE}: duplicate game id '{game['id']}'")
+        seen.add(game['id'])
+        for key in ('min_age', 'max_age'):
+            if key in game and not isinstance(game[key], (int, float)):
+                raise ConfigError(f"{CATALOG_FILE}: {game['id']}.{key} is not a number")
+    return seen
+
+
+def validate_profile(name, profile, game_ids):
+    where = f"{PROFILE_DIR}/{name}.json"
+    if not isinstance(profile, dict):
+        raise ConfigError(f"{where}: not an object")
+    enabled = profile.get('enabled_games', [])
+    if not isinstance(enabled, list) or not all(isinstance(g, str) for g in enabled):
+        raise ConfigError(f"{where}: 'enabled_games' must be a list of game ids")
+    unknown = sorted(set(enabled) - game_ids)
+    if unknown:
+        raise ConfigError(f"{where}: unknown games in 'enabled_games': {', '.join(unknown)}")
+    if 'age' in profile and not isinstance(profile['age'], (int, float)):
+        raise ConfigError(f"{where}: 'age' is not a number")
+    controls = profile.get('parental_controls', {})
+    if not isinstance(controls, dict):
+        raise ConfigError(f"{where}: 'parental_controls' is not an object")
+    for key in ('max_session_time', 'volume_limit'):
+        if key in controls and not isinstance(controls[key], (int, float)):
+            raise ConfigError(f"{where}: parental_controls.{key} is not a number")
+
+
+def _parse(path, where):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        raise ConfigError(f"{where}: {e.strerror}") from None
+    try:
+        return data, json.loads(data)
+    except ValueError as e:
+        raise ConfigError(f"{where}: {e}") from None
+
+
+def _config_file(data):
+    etag = '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+    return ConfigFile(data, gzip.compress(data, compresslevel=9, mtime=0), etag)
+
+
+class ConfigStore:
+    """Validated, atomically swapped snapshot of the catalog and the profiles.
+
+    ``root`` is the served tree; profiles come from its config/ directory,
+    overridden by name by the files in ``profile_dir`` when given (a place
+    to edit profiles that a rebuild of dist/ does not overwrite). Readers
+    take ``store.snapshot`` once and use it for the whole request.
+    """
+
+    def __init__(self, root, profile_dir=None, poll_interval=1.0, debounce=0.2, logger=None):
+        self.root = root
+        self.profile_dir = profile_dir
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.logger = logger
+        self.snapshot = None
+        self.watch_mode = None
+        self.reloads = 0
+        self.rejected = 0
+        self.last_error = None
+        self._changed = threading.Condition()
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def version(self):
+        snapshot = self.snapshot
+        return snapshot.version if snapshot else None
+
+    def directories(self):
+        dirs = [os.path.join(self.root, os.path.dirname(CATALOG_FILE)), os.path.join(self.root, PROFILE_DIR)]
+        if self.profile_dir:
+            dirs.append(self.profile_dir)
+        return [d for d in dirs if os.path.isdir(d)]
+
+    def profile_paths(self):
+        paths = {}
+        for directory in (os.path.join(self.root, PROFILE_DIR), self.profile_dir):
+            if directory:
+                for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+                    paths[os.path.splitext(os.path.basename(path))[0]] = path
+        return paths
+
+    def load(self):
+        """Parse and validate every source; returns a new snapshot or raises ConfigError"""
+        files = {}
+        data, catalog = _parse(os.path.join(self.root, CATALOG_FILE), CATALOG_FILE)
+        game_ids = validate_catalog(catalog)
+        files['/' + CATALOG_FILE] = _config_file(data)
+        profiles = {}
+        for name, path in self.profile_paths().items():
+            data, profile = _parse(path, f"{PROFILE_DIR}/{name}.json")
+            validate_profile(name, profile, game_ids)
+            profiles[name] = profile
+            files[f"/{PROFILE_DIR}/{name}.json"] = _config_file(data)
+        digest = hashlib.blake2b(digest_size=8)
+        for url in sorted(files):
+            digest.update(url.encode() + files[url].etag.encode())
+        generation = self.snapshot.generation + 1 if self.snapshot else 1
+        return ConfigSnapshot(digest.hexdigest(), generation, time.time(), catalog, profiles, files)
+
+    def reload(self):
+        """Swap in the current files if they are valid; returns True when the version changed"""
+        with self._reload_lock:
+            try:
+                snapshot = self.load()
+            except ConfigError as e:
+                self.rejected += 1
+                self.last_error = str(e)
+                if self.logger:
+                    self.logger.warning(f"CONFIG REJECTED, keeping version {self.version}: {e}")
+                return False
+            self.last_error = None
+            if self.snapshot is not None and snapshot.version == self.snapshot.version:
+                return False
+            self.snapshot = snapshot
+            self.reloads += 1
+        if self.logger:
+            self.logger.info(f"Config version {snapshot.version}: {len(snapshot.profiles)} profiles, "
+                             f"{len(snapshot.catalog['games'])} games")
+        with self._changed:
+            self._changed.notify_all()
+        return True
+
+    def wait_for_change(self, version, timeout):
+        """Block until the version differs from ``version`` (or timeout); returns the current version"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self._stop.is_set(), timeout)
+        return self.version
+
+    def start(self):
+        """Initial load, then watch the sources in a daemon thread"""
+        self._stop.clear()
+        self.reload()
+        # The watcher is set up in the thread: loading ctypes for inotify takes longer than the load itself
+        self._thread = threading.Thread(target=self._watch, name='kidsplay-config', daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        try:
+            watcher = InotifyWatcher(self.directories()) if InotifyWatcher.available() else None
+        except OSError:
+            watcher = None
+        self.watch_mode = 'inotify' if watcher else 'polling'
+        if watcher:
+            self._watch_inotify(watcher)
+        else:
+            self._watch_polling()
+
+    def stop(self):
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _watch_inotify(self, watcher):
+        try:
+            while not self._stop.is_set():
+                if watcher.wait(0.5, '.json'):
+                    # Let a burst of events (write + rename, several files) settle first
+                    while watcher.wait(self.debounce, '.json'):
+                        pass
+                    self.reload()
+        finally:
+            watcher.close()
+
+    def _signature(self):
+        signature = []
+        for path in [os.path.join(self.root, CATALOG_FILE)] + sorted(self.profile_paths().values()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        return signature
+
+    def _watch_polling(self):
+        signature = self._signature()
+        while not self._stop.wait(self.poll_interval):
+            current = self._signature()
+            if current != signature:
+                signature = current
+                self.reload()
+
+    def get_stats(self):
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'generation': snapshot.generation if snapshot else 0,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(snapshot.loaded_at)) if snapshot else None,
+            'profiles': sorted(snapshot.profiles) if snapshot else [],
+            'watch_mode': self.watch_mode,
+            'reloads': self.reloads,
+            'rejected': self.rejected,
+            'last_error': self.last_error,
+        }
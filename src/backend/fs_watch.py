@@ -0,0 +1,89 @@
+# Filesystem change notifications for KidsPlay (inotify through ctypes, Linux only).
+# Used by the config store (profiles, catalog) and by the path index (the whole
+# served tree); both fall back to polling where inotify is not available.
+
+import os
+import select
+import struct
+
+
+class InotifyWatcher:
+    """Minimal inotify binding: reports changes to files in the watched directories.
+
+    Watches directories rather than files, so editors that save by writing a
+    temporary file and renaming it over the original are seen too.
+    """
+
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, directories=(), mask=MASK):
+        # Imported here: ctypes is only needed when a watcher starts
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.mask = mask
+        self.watches = {}  # watch descriptor -> directory
+        self.fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        try:
+            for directory in directories:
+                self.add_watch(directory)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    @staticmethod
+    def available():
+        return hasattr(os, 'uname') and os.uname().sysname == 'Linux'
+
+    def add_watch(self, directory):
+        """Watch one more directory (not its subdirectories)"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+        if wd < 0:
+            raise OSError(self._ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+        # Adding a directory watched already returns its descriptor: the latest path wins
+        self.watches[wd] = directory
+        return wd
+
+    def read_events(self, timeout):
+        """Events of the next ``timeout`` seconds as [(directory, name, mask)], [] if none.
+
+        A dropped event queue is reported as (None, '', IN_Q_OVERFLOW): the
+        caller has to rescan whatever it watches.
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            name = data[offset + self._EVENT.size:offset + self._EVENT.size + length].rstrip(b'\0')
+            offset += self._EVENT.size + length
+            if mask & self.IN_IGNORED:
+                # The directory is gone (or unwatched): its descriptor may be reused
+                self.watches.pop(wd, None)
+                continue
+            events.append((self.watches.get(wd), os.fsdecode(name), mask))
+        return events
+
+    def wait(self, timeout, suffix=''):
+        """True if a file whose name ends with ``suffix`` changed within ``timeout`` seconds"""
+        return any(name.endswith(suffix) for _, name, _ in self.read_events(timeout))
+
+    def close(self):
+        os.close(self.fd)
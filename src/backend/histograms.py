@@ -0,0 +1,108 @@
+# Fixed-size latency histograms for KidsPlay's PerformanceMonitor.
+# HDR-style logarithmic buckets: every bucket is GROWTH times wider than the
+# previous one, so any percentile is reported within ~2.5% relative error and
+# memory per histogram is constant no matter how many requests it has seen.
+
+import math
+from array import array
+
+MIN_VALUE = 0.00001   # 10 microseconds
+MAX_VALUE = 120.0     # anything slower lands in the last bucket
+GROWTH = 1.05         # bucket width ratio -> ~2.5% error around the midpoint
+
+_LOG_GROWTH = math.log(GROWTH)
+BUCKET_COUNT = int(math.ceil(math.log(MAX_VALUE / MIN_VALUE) / _LOG_GROWTH)) + 1
+
+
+def bucket_index(value):
+    if value <= MIN_VALUE:
+        return 0
+    index = int(math.log(value / MIN_VALUE) / _LOG_GROWTH) + 1
+    return index if index < BUCKET_COUNT else BUCKET_COUNT - 1
+
+
+def bucket_upper_bound(index):
+    return MIN_VALUE * GROWTH ** index
+
+
+def bucket_value(index):
+    """Representative value of a bucket (geometric midpoint of its bounds)"""
+    if index == 0:
+        return MIN_VALUE
+    return MIN_VALUE * GROWTH ** (index - 0.5)
+
+
+class LatencyHistogram:
+    """Streaming histogram of durations in seconds with bounded memory"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Value below which a fraction q of the recorded durations fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(q * self.count)))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                # Never report more than the exact maximum we saw
+                return min(bucket_value(i), self.max)
+        return self.max
+
+    def quantiles(self, qs):
+        """Several quantiles in a single pass over the buckets"""
+        result = [0.0] * len(qs)
+        if not self.count:
+            return result
+        order = sorted(range(len(qs)), key=lambda k: qs[k])
+        ranks = [max(1, int(math.ceil(qs[k] * self.count))) for k in order]
+        seen = 0
+        pos = 0
+        for i, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            while pos < len(order) and seen >= ranks[pos]:
+                result[order[pos]] = min(bucket_value(i), self.max)
+                pos += 1
+            if pos == len(order):
+                break
+        return result
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary_ms(self):
+        """count, mean and p50/p90/p99/max in milliseconds"""
+        p50, p90, p99 = self.quantiles((0.5, 0.9, 0.99))
+        return {
+            'count': self.count,
+            'mean_ms': self.mean * 1000,
+            'p50_ms': p50 * 1000,
+            'p90_ms': p90 * 1000,
+            'p99_ms': p99 * 1000,
+            'max_ms': self.max * 1000,
+        }
@@ -0,0 +1,188 @@
+# Graceful shutdown and zero-downtime reload for KidsPlay.
+# SIGTERM/SIGINT stop accepting, let the requests in flight finish (up to a
+# deadline) and only then flush the stores and the logs. SIGHUP starts a new
+# server process that inherits the listening socket; once it serves, it sends
+# SIGTERM to the old one, which drains and exits. The listening socket can
+# also come from systemd socket activation (LISTEN_FDS), so a restart never
+# refuses a connection: they wait in the kernel backlog meanwhile.
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# First descriptor passed by systemd socket activation (SD_LISTEN_FDS_START)
+LISTEN_FDS_START = 3
+HANDOFF_FD_ENV = 'KIDSPLAY_LISTEN_FD'
+HANDOFF_PARENT_ENV = 'KIDSPLAY_HANDOFF_PARENT'
+
+# The server chdirs into the served tree: a successor must start from here
+LAUNCH_CWD = os.getcwd()
+
+# Old process to stop once this one serves (set when started by a reload)
+_handoff_parent = None
+
+
+def inherited_listener():
+    """The listening socket handed to this process, as (socket, source), or (None, None).
+
+    ``source`` is 'systemd' (socket activation) or 'reload' (handed over by
+    the process this one replaces). The environment variables are cleared,
+    so processes started later do not claim the same descriptor.
+    """
+    global _handoff_parent
+    parent = os.environ.pop(HANDOFF_PARENT_ENV, None)
+    if parent:
+        _handoff_parent = int(parent)
+    fd = os.environ.pop(HANDOFF_FD_ENV, None)
+    if fd is not None:
+        return _listener_from_fd(int(fd)), 'reload'
+    listen_pid = os.environ.pop('LISTEN_PID', None)
+    listen_fds = os.environ.pop('LISTEN_FDS', None)
+    os.environ.pop('LISTEN_FDNAMES', None)
+    if listen_fds and listen_pid == str(os.getpid()):
+        return _listener_from_fd(LISTEN_FDS_START), 'systemd'
+    return None, None
+
+
+def _listener_from_fd(fd):
+    sock = socket.socket(fileno=fd)
+    if sock.type != socket.SOCK_STREAM:
+        raise OSError(f"inherited descriptor {fd} is not a stream socket")
+    os.set_inheritable(fd, False)
+    return sock
+
+
+def spawn_successor(listener=None):
+    """Start a new server with the same command line, handing it ``listener``; returns the Popen.
+
+    Without a listener (pre-fork workers binding with SO_REUSEPORT) the new
+    server binds the port itself, next to the old one.
+    """
+    env = dict(os.environ, **{HANDOFF_PARENT_ENV: str(os.getpid())})
+    pass_fds = ()
+    if listener is not None:
+        env[HANDOFF_FD_ENV] = str(listener.fileno())
+        pass_fds = (listener.fileno(),)
+    args = [sys.executable] + (sys.orig_argv[1:] if hasattr(sys, 'orig_argv') else sys.argv)
+    return subprocess.Popen(args, cwd=LAUNCH_CWD, env=env, pass_fds=pass_fds)
+
+
+def notify_ready(main_pid=None):
+    """Tell systemd (Type=notify) and the replaced process, if any, that this server is serving"""
+    global _handoff_parent
+    parent, _handoff_parent = _handoff_parent, None
+    if parent:
+        # The new main process for systemd, then the old one can drain and exit
+        sd_notify(f"MAINPID={main_pid or os.getpid()}\nREADY=1")
+        try:
+            os.kill(parent, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        sd_notify("READY=1")
+
+
+def forget_parent():
+    """Processes forked from now on must not signal the replaced process"""
+    global _handoff_parent
+    _handoff_parent = None
+
+
+def sd_notify(state):
+    """Send a state line to the systemd notification socket (no-op outside systemd)"""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(state.encode(), address)
+    except OSError:
+        return False
+    return True
+
+
+class GracefulShutdown:
+    """Signal handling for one running server.
+
+    SIGTERM/SIGINT mark the server as draining and stop its accept loop from
+    another thread (shutdown() waits for serve_forever, which runs in the
+    thread taking the signal). SIGHUP calls ``on_reload``. The caller then
+    runs ``drain()`` once serve_forever has returned. If serve_forever is
+    still stuck in a request at the deadline (the single engine serves on
+    the accepting thread), ``on_abort`` flushes what it can and the process
+    exits.
+    """
+
+    def __init__(self, httpd, drain_timeout, close_idle=None, on_reload=None, on_abort=None, logger=None):
+        self.httpd = httpd
+        self.drain_timeout = drain_timeout
+        self.close_idle = close_idle
+        self.on_reload = on_reload
+        self.on_abort = on_abort
+        self.logger = logger
+        self.stop_signal = None
+        self.successor = None
+        self.deadline = None
+        # The asyncio engine waits for connections in flight inside shutdown()
+        httpd.drain_timeout = drain_timeout
+
+    def install(self, signals=(signal.SIGTERM, signal.SIGINT)):
+        for sig in signals:
+            signal.signal(sig, self._stop)
+        if self.on_reload is not None and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._reload)
+        return self
+
+    def _stop(self, signum, frame):
+        if self.stop_signal is not None:
+            return
+        self.stop_signal = signal.Signals(signum).name
+        self.deadline = time.monotonic() + self.drain_timeout
+        self.httpd.draining = True
+        # Only the process systemd tracks, and not once a successor took over as main process
+        if self.on_reload is not None and self.successor is None:
+            sd_notify("STOPPING=1")
+        if self.close_idle is not None:
+            self.close_idle()
+        threading.Thread(target=self._stop_serving, name='kidsplay-shutdown', daemon=True).start()
+
+    def _stop_serving(self):
+        stopper = threading.Thread(target=self.httpd.shutdown, daemon=True)
+        stopper.start()
+        stopper.join(max(0.0, self.deadline - time.monotonic()) + 1.0)
+        if stopper.is_alive():
+            if self.on_abort is not None:
+                self.on_abort()
+            os._exit(1)
+
+    def _reload(self, signum, frame):
+        if self.stop_signal is not None or (self.successor is not None and self.successor.poll() is None):
+            return
+        try:
+            self.successor = self.on_reload()
+        except OSError as e:
+            if self.logger:
+                self.logger.error(f"RELOAD FAILED: cannot start the new server: {e}")
+            return
+        if self.logger:
+            self.logger.info(f"Reload: new server started (pid {self.successor.pid}), "
+                             f"draining once it serves")
+
+    def drain(self):
+        """Wait for the requests in flight; returns the seconds since the signal, or None on timeout"""
+        deadline = self.deadline or time.monotonic() + self.drain_timeout
+        started = deadline - self.drain_timeout
+        while True:
+            # A keep-alive connection that went idle during the drain is closed as well
+            if self.close_idle is not None:
+                self.close_idle()
+            if self.httpd.drain(min(0.5, max(0.0, deadline - time.monotonic()))):
+                return time.monotonic() - started
+            if time.monotonic() >= deadline:
+                return None
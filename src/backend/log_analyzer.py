@@ -0,0 +1,341 @@
+"""
+log_analyzer.py - Offline analysis of logs/server_performance.log.
+
+Streams the performance logs written by PerformanceMonitor (including rotated
+and gzipped ones) in constant memory per file and reports per-route latency
+percentiles, per-hour throughput, error rates and slow-transfer hotspots.
+
+    python src/backend/log_analyzer.py                     # logs/server_performance.log*
+    python src/backend/log_analyzer.py logs/ --jobs 4      # one process per file
+    python src/backend/log_analyzer.py old.log.3.gz --json > report.json
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+from collections import defaultdict
+from multiprocessing import Pool
+
+from histograms import LatencyHistogram
+from routes import RouteNormalizer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+DEFAULT_LOG_DIR = os.path.join(ROOT, 'logs')
+DEFAULT_FRONTEND = os.path.join(ROOT, 'src', 'frontend')
+LOG_PATTERN = 'server_performance.log*'
+
+
+class RouteStats:
+    __slots__ = ('requests', 'errors', 'bytes', 'slow', 'latency')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.slow = 0
+        self.latency = LatencyHistogram()
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.bytes += other.bytes
+        self.slow += other.slow
+        self.latency.merge(other.latency)
+
+
+class TransferStats:
+    __slots__ = ('count', 'kilobytes', 'seconds', 'worst_kbps')
+
+    def __init__(self):
+        self.count = 0
+        self.kilobytes = 0.0
+        self.seconds = 0.0
+        self.worst_kbps = None
+
+    def merge(self, other):
+        self.count += other.count
+        self.kilobytes += other.kilobytes
+        self.seconds += other.seconds
+        if other.worst_kbps is not None:
+            self.worst_kbps = other.worst_kbps if self.worst_kbps is None else min(self.worst_kbps, other.worst_kbps)
+
+
+class HourStats:
+    __slots__ = ('requests', 'bytes', 'errors', 'slow', 'max_cpu', 'max_ram')
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.errors = 0
+        self.slow = 0
+        self.max_cpu = None
+        self.max_ram = None
+
+    def merge(self, other):
+        self.requests += other.requests
+        self.bytes += other.bytes
+        self.errors += other.errors
+        self.slow += other.slow
+        for attr in ('max_cpu', 'max_ram'):
+            value = getattr(other, attr)
+            if value is not None:
+                current = getattr(self, attr)
+                setattr(self, attr, value if current is None else max(current, value))
+
+
+class LogSummary:
+    """Aggregates for one or more log files; summaries from several processes merge"""
+
+    def __init__(self):
+        self.routes = defaultdict(RouteStats)
+        self.hours = defaultdict(HourStats)
+        self.transfers = defaultdict(TransferStats)
+        self.status = defaultdict(int)
+        self.lines = 0
+        self.unparsed = 0
+        self.files = 0
+
+    def merge(self, other):
+        for key, value in other.routes.items():
+            self.routes[key].merge(value)
+        for key, value in other.hours.items():
+            self.hours[key].merge(value)
+        for key, value in other.transfers.items():
+            self.transfers[key].merge(value)
+        for key, value in other.status.items():
+            self.status[key] += value
+        self.lines += other.lines
+        self.unparsed += other.unparsed
+        self.files += other.files
+
+
+def open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+
+def _parse_stats_value(message, label):
+    start = message.find(label)
+    if start < 0:
+        return None
+    start += len(label)
+    end = start
+    while end < len(message) and (message[end].isdigit() or message[end] == '.'):
+        end += 1
+    try:
+        return float(message[start:end])
+    except ValueError:
+        return None
+
+
+def analyze_file(path, frontend_root=DEFAULT_FRONTEND):
+    """Stream one log file into a LogSummary"""
+    normalize = RouteNormalizer(frontend_root).normalize
+    summary = LogSummary()
+    summary.files = 1
+    routes, hours, transfers, status = summary.routes, summary.hours, summary.transfers, summary.status
+    route_cache = {}
+
+    with open_log(path) as f:
+        for line in f:
+            summary.lines += 1
+            parts = line.rstrip('\n').split(' - ')
+            if len(parts) < 3:
+                summary.unparsed += 1
+                continue
+            hour = parts[0][:13]
+            message = parts[2]
+
+            if len(parts) == 6 and parts[3].endswith('s') and parts[5].endswith('B'):
+                # "GET /path - 0.123s - 200 - 456B"
+                method, _, raw_path = message.partition(' ')
+                try:
+                    duration = float(parts[3][:-1])
+                    code = int(parts[4])
+                    size = int(parts[5][:-1])
+                except ValueError:
+                    summary.unparsed += 1
+                    continue
+                route = route_cache.get(raw_path)
+                if route is None:
+                    route = normalize(raw_path)
+                    if len(route_cache) < 100000:
+                        route_cache[raw_path] = route
+                stats = routes[f"{method} {route}"]
+                stats.requests += 1
+                stats.bytes += size
+                stats.latency.record(duration)
+                hour_stats = hours[hour]
+                hour_stats.requests += 1
+                hour_stats.bytes += size
+                status[code] += 1
+                if code >= 400:
+                    stats.errors += 1
+                    hour_stats.errors += 1
+            elif message.startswith('SLOW REQUEST: '):
+                # "SLOW REQUEST: GET /path took 0.612s (size: 1234 bytes)"
+                fields = message[len('SLOW REQUEST: '):].split(' ')
+                if len(fields) >= 2:
+                    routes[f"{fields[0]} {normalize(fields[1])}"].slow += 1
+                hours[hour].slow += 1
+            elif message.startswith('SLOW TRANSFER: '):
+                # "SLOW TRANSFER: /path" then "12.3KB in 1.2s (4.5KB/s)" as the next field
+                raw_path = message[len('SLOW TRANSFER: '):]
+                detail = parts[3] if len(parts) > 3 else ''
+                try:
+                    kilobytes, _, rest = detail.partition('KB in ')
+                    seconds, _, rate = rest.partition('s (')
+                    kilobytes, seconds = float(kilobytes), float(seconds)
+                    kbps = float(rate.rstrip(')').rstrip('KB/s'))
+                except ValueError:
+                    summary.unparsed += 1
+                    continue
+                stats = transfers[normalize(raw_path)]
+                stats.count += 1
+                stats.kilobytes += kilobytes
+                stats.seconds += seconds
+                stats.worst_kbps = kbps if stats.worst_kbps is None else min(stats.worst_kbps, kbps)
+            elif message == 'STATS' or message == 'FINAL STATS':
+                # "STATS - Uptime: 1.0h | Requests: 12 | ... | CPU: 3.0% | RAM: 41.2% | ..."
+                text = ' - '.join(parts[3:])
+                hour_stats = hours[hour]
+                for attr, label in (('max_cpu', 'CPU: '), ('max_ram', 'RAM: ')):
+                    value = _parse_stats_value(text, label)
+                    if value is not None:
+                        current = getattr(hour_stats, attr)
+                        setattr(hour_stats, attr, value if current is None else max(current, value))
+    return summary
+
+
+def _analyze_job(args):
+    return analyze_file(*args)
+
+
+def find_logs(paths):
+    """Expand directories to their server_performance.log* files, oldest rotation first"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, LOG_PATTERN))
+            found.sort(key=lambda p: os.path.getmtime(p))
+            files.extend(found)
+        else:
+            files.append(path)
+    return files
+
+
+def analyze(paths, jobs=1, frontend_root=DEFAULT_FRONTEND):
+    files = find_logs(paths)
+    total = LogSummary()
+    if jobs > 1 and len(files) > 1:
+        with Pool(min(jobs, len(files))) as pool:
+            for summary in pool.imap_unordered(_analyze_job, [(f, frontend_root) for f in files]):
+                total.merge(summary)
+    else:
+        for path in files:
+            total.merge(analyze_file(path, frontend_root))
+    return total
+
+
+def build_report(summary, top=20):
+    requests = sum(s.requests for s in summary.routes.values())
+    errors = sum(s.errors for s in summary.routes.values())
+    routes = []
+    for route, stats in summary.routes.items():
+        if not stats.requests and not stats.slow:
+            continue
+        entry = {'route': route, 'requests': stats.requests, 'errors': stats.errors,
+                 'error_rate': stats.errors / stats.requests if stats.requests else 0,
+                 'bytes': stats.bytes, 'slow': stats.slow}
+        entry.update({k: v for k, v in stats.latency.summary_ms().items() if k != 'count'})
+        routes.append(entry)
+    routes.sort(key=lambda e: e['requests'], reverse=True)
+
+    hours = []
+    for hour in sorted(summary.hours):
+        stats = summary.hours[hour]
+        hours.append({'hour': hour, 'requests': stats.requests, 'requests_per_sec': stats.requests / 3600,
+                      'bytes': stats.bytes, 'errors': stats.errors,
+                      'error_rate': stats.errors / stats.requests if stats.requests else 0,
+                      'slow': stats.slow, 'max_cpu_percent': stats.max_cpu, 'max_ram_percent': stats.max_ram})
+
+    transfers = []
+    for route, stats in summary.transfers.items():
+        transfers.append({'route': route, 'count': stats.count,
+                          'avg_kbps': stats.kilobytes / stats.seconds if stats.seconds else 0,
+                          'worst_kbps': stats.worst_kbps, 'kilobytes': stats.kilobytes})
+    transfers.sort(key=lambda e: e['count'], reverse=True)
+
+    return {
+        'files': summary.files,
+        'lines': summary.lines,
+        'unparsed_lines': summary.unparsed,
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests if requests else 0,
+        'status_codes': {str(code): n for code, n in sorted(summary.status.items())},
+        'routes': routes[:top],
+        'slowest_routes': sorted((r for r in routes if r['requests'] >= 3),
+                                 key=lambda e: e['p90_ms'], reverse=True)[:top],
+        'hours': hours,
+        'slow_transfer_hotspots': transfers[:top],
+    }
+
+
+def print_report(report):
+    print(f"📋 {report['files']} file(s), {report['lines']:,} lines "
+          f"({report['unparsed_lines']:,} unparsed), {report['requests']:,} requests, "
+          f"error rate {report['error_rate']:.2%}")
+    print(f"   Status codes: {report['status_codes']}")
+
+    print("\n🔥 Busiest routes")
+    print(f"   {'route':<50}{'reqs':>9}{'err%':>7}{'p50ms':>9}{'p90ms':>9}{'p99ms':>9}{'maxms':>10}")
+    for r in report['routes']:
+        print(f"   {r['route'][:49]:<50}{r['requests']:>9}{r['error_rate']:>7.1%}"
+              f"{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>10.1f}")
+
+    print("\n🐢 Slowest routes (p90)")
+    for r in report['slowest_routes'][:10]:
+        print(f"   {r['route'][:49]:<50} p90 {r['p90_ms']:.1f}ms, p99 {r['p99_ms']:.1f}ms, slow {r['slow']}")
+
+    print("\n🕐 Per hour")
+    print(f"   {'hour':<15}{'reqs':>9}{'req/s':>8}{'MB':>9}{'err%':>7}{'slow':>6}{'cpu%':>7}")
+    for h in report['hours']:
+        cpu = f"{h['max_cpu_percent']:.0f}" if h['max_cpu_percent'] is not None else '-'
+        print(f"   {h['hour']:<15}{h['requests']:>9}{h['requests_per_sec']:>8.2f}"
+              f"{h['bytes'] / 1048576:>9.1f}{h['error_rate']:>7.1%}{h['slow']:>6}{cpu:>7}")
+
+    if report['slow_transfer_hotspots']:
+        print("\n📶 Slow-transfer hotspots")
+        for t in report['slow_transfer_hotspots']:
+            print(f"   {t['route'][:49]:<50}{t['count']:>6}x  avg {t['avg_kbps']:.1f}KB/s, "
+                  f"worst {t['worst_kbps']:.1f}KB/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[DEFAULT_LOG_DIR],
+                        help="log files or directories (default: logs/)")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="analyze files in parallel on this many processes (0 = all cores)")
+    parser.add_argument('--frontend', default=DEFAULT_FRONTEND,
+                        help="frontend directory used to recognise real files and games")
+    parser.add_argument('--top', type=int, default=20, help="rows per table")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    jobs = args.jobs or os.cpu_count() or 1
+    report = build_report(analyze(args.paths, jobs, args.frontend), args.top)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# OpenMetrics exposition for KidsPlay (/metrics).
+# Counters are aggregated as requests are recorded; label sets are escaped once
+# when a series is created, and the rendered text is reused until something
+# changes, so frequent scrapes cost next to nothing on the request path.
+
+import bisect
+import threading
+
+from histograms import bucket_value
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Prometheus-style latency buckets (seconds)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(**labels):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items())
+
+
+def duration_bucket_counts(histogram):
+    """A LatencyHistogram's counts regrouped into DURATION_BUCKETS (+Inf last), not cumulative"""
+    counts = [0] * (len(DURATION_BUCKETS) + 1)
+    for index, n in enumerate(histogram.counts):
+        if n:
+            counts[bisect.bisect_left(DURATION_BUCKETS, bucket_value(index))] += n
+    return counts
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+
+class _RouteSeries:
+    __slots__ = ('labels', 'bucket_labels', 'buckets', 'count', 'total', 'bytes')
+
+    def __init__(self, route, const_labels):
+        self.labels = format_labels(**const_labels, route=route)
+        self.bucket_labels = [format_labels(**const_labels, route=route, le=repr(bound))
+                              for bound in DURATION_BUCKETS]
+        self.bucket_labels.append(format_labels(**const_labels, route=route, le='+Inf'))
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+
+
+class MetricsRegistry:
+    """Pre-aggregated request metrics rendered in OpenMetrics text format.
+
+    ``const_labels`` are added to every series this registry owns (the worker
+    index in pre-fork mode, where each worker keeps its own registry).
+    """
+
+    def __init__(self, prefix='kidsplay', const_labels=None):
+        self.prefix = prefix
+        self.const_labels = dict(const_labels or {})
+        self._lock = threading.Lock()
+        self._requests = {}     # (method, route, status) -> [label string, count]
+        self._routes = {}       # route -> _RouteSeries
+        self._version = 0
+        self._rendered_version = -1
+        self._rendered_requests = ''
+
+    def record_request(self, method, route, status_code, duration, size):
+        with self._lock:
+            key = (method, route, status_code)
+            series = self._requests.get(key)
+            if series is None:
+                series = self._requests[key] = [
+                    format_labels(**self.const_labels, method=method, route=route, status=status_code), 0
+                ]
+            series[1] += 1
+
+            route_series = self._routes.get(route)
+            if route_series is None:
+                route_series = self._routes[route] = _RouteSeries(route, self.const_labels)
+            route_series.buckets[bisect.bisect_left(DURATION_BUCKETS, duration)] += 1
+            route_series.count += 1
+            route_series.total += duration
+            route_series.bytes += size
+            self._version += 1
+
+    def _render_requests(self):
+        """Request families; re-rendered only after new requests were recorded"""
+        if self._rendered_version == self._version:
+            return self._rendered_requests
+        p = self.prefix
+        lines = [
+            f"# TYPE {p}_http_requests counter",
+            f"# HELP {p}_http_requests HTTP requests by method, route and status.",
+        ]
+        for labels, count in self._requests.values():
+            lines.append(f"{p}_http_requests_total{{{labels}}} {count}")
+
+        lines.append(f"# TYPE {p}_http_request_duration_seconds histogram")
+        lines.append(f"# HELP {p}_http_request_duration_seconds Time to serve a request.")
+        lines.append(f"# UNIT {p}_http_request_duration_seconds seconds")
+        for series in self._routes.values():
+            cumulative = 0
+            for labels, n in zip(series.bucket_labels, series.buckets):
+                cumulative += n
+                lines.append(f"{p}_http_request_duration_seconds_bucket{{{labels}}} {cumulative}")
+            lines.append(f"{p}_http_request_duration_seconds_count{{{series.labels}}} {series.count}")
+            lines.append(f"{p}_http_request_duration_seconds_sum{{{series.labels}}} {format_value(series.total)}")
+
+        lines.append(f"# TYPE {p}_http_response_bytes counter")
+        lines.append(f"# HELP {p}_http_response_bytes Response body bytes sent.")
+        lines.append(f"# UNIT {p}_http_response_bytes bytes")
+        for series in self._routes.values():
+            lines.append(f"{p}_http_response_bytes_total{{{series.labels}}} {series.bytes}")
+
+        self._rendered_requests = '\n'.join(lines) + '\n'
+        self._rendered_version = self._version
+        return self._rendered_requests
+
+    def render(self, gauges, counters=(), histograms=()):
+        """Full exposition; everything but the request families is sampled by the caller.
+
+        ``gauges`` is [(name, help, unit, value)] and gets the const labels;
+        ``counters`` is [(name, help, unit, [(labels dict, value)])] and
+        ``histograms`` [(name, help, unit, bucket counts, count, sum)] with
+        counts per DURATION_BUCKETS (+Inf last); both are rendered as given.
+        """
+        with self._lock:
+            text = self._render_requests()
+        p = self.prefix
+        const = format_labels(**self.const_labels)
+        const = f"{{{const}}}" if const else ''
+        lines = []
+
+        def family(name, kind, help_text, unit):
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            if unit:
+                lines.append(f"# UNIT {p}_{name} {unit}")
+
+        for name, help_text, unit, value in gauges:
+            family(name, 'gauge', help_text, unit)
+            lines.append(f"{p}_{name}{const} {format_value(value)}")
+        for name, help_text, unit, samples in counters:
+            family(name, 'counter', help_text, unit)
+            for labels, value in samples:
+                labels = format_labels(**labels)
+                lines.append(f"{p}_{name}_total{{{labels}}} {format_value(value)}" if labels
+                             else f"{p}_{name}_total {format_value(value)}")
+        for name, help_text, unit, counts, count, total in histograms:
+            family(name, 'histogram', help_text, unit)
+            cumulative = 0
+            for bound, n in zip(DURATION_BUCKETS + ('+Inf',), counts):
+                cumulative += n
+                le = bound if isinstance(bound, str) else repr(bound)
+                lines.append(f'{p}_{name}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{p}_{name}_count {count}")
+            lines.append(f"{p}_{name}_sum {format_value(total)}")
+        lines.append("# EOF")
+        return (text + '\n'.join(lines) + '\n').encode('utf-8')
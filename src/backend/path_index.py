@@ -0,0 +1,335 @@
+# In-memory index of the tree served by KidsPlay.
+# Without it every request costs translate_path plus isdir/stat/open calls on
+# the SD card, 404s included (browsers keep probing flutter_service_worker.js
+# and favicons). The index maps each URL path to the file's stat and MIME type
+# and knows every directory, so resolving a URL, picking a precompressed
+# variant, the index.html of a directory and every 404 are dictionary lookups.
+# It is built once at startup and kept in sync file by file with inotify on
+# Linux; elsewhere the directories are polled and the tree is rescanned only
+# when one of them changed.
+
+import os
+import posixpath
+import stat
+import threading
+import time
+import urllib.parse
+from collections import namedtuple
+
+from fs_watch import InotifyWatcher
+from precompress import VARIANT_SUFFIXES, preferred_encodings
+
+# An indexed regular file: filesystem path, index key, os.stat result, Content-Type
+PathEntry = namedtuple('PathEntry', ['path', 'key', 'stat', 'ctype'])
+
+# What a URL resolves to: kind is FILE (entry), REDIRECT (directory without the
+# trailing slash), LISTING (directory without an index file) or MISSING
+Resolution = namedtuple('Resolution', ['kind', 'entry', 'directory'])
+FILE, REDIRECT, LISTING, MISSING = 'file', 'redirect', 'listing', 'missing'
+_MISSING = Resolution(MISSING, None, None)
+_REDIRECT = Resolution(REDIRECT, None, None)
+
+INDEX_FILES = ('index.html', 'index.htm')
+
+WATCH_MASK = (InotifyWatcher.MASK | InotifyWatcher.IN_ATTRIB)
+
+# Polling mode: directory mtimes this close to a scan are not trusted yet
+MTIME_SLACK_NS = 2_000_000_000
+
+
+class IndexTooLarge(Exception):
+    """The served tree has more files than the index is allowed to hold"""
+
+
+def url_key(url):
+    """Return (index key, trailing slash) for a request path.
+
+    Normalizes exactly like SimpleHTTPRequestHandler.translate_path, so a URL
+    resolves to the same file with or without the index.
+    """
+    path = url.split('?', 1)[0].split('#', 1)[0]
+    trailing_slash = path.rstrip().endswith('/')
+    try:
+        path = urllib.parse.unquote(path, errors='surrogatepass')
+    except UnicodeDecodeError:
+        path = urllib.parse.unquote(path)
+    words = [word for word in posixpath.normpath(path).split('/')
+             if word and not os.path.dirname(word) and word not in (os.curdir, os.pardir)]
+    return (os.path.normcase(os.path.join(*words)) if words else ''), trailing_slash
+
+
+class PathIndex:
+    """URL path -> PathEntry for every regular file under ``root``, plus the set of directories.
+
+    ``guess_type`` maps a filename to the Content-Type the handler would
+    send. Lookups are lock-free: only the watcher thread changes the tables,
+    with single dictionary operations or by swapping in a full rescan. Until
+    the first scan is done (``ready``) callers use the filesystem instead.
+
+    Without inotify every ``poll_interval`` seconds costs one stat per
+    directory: adding, removing or renaming a file changes its directory's
+    mtime and triggers a rescan. A file rewritten in place does not, so
+    entry stats are only trusted while ``stats_current`` is true.
+    """
+
+    def __init__(self, root, guess_type, poll_interval=5.0, max_files=100000, logger=None):
+        self.root = os.path.abspath(root)
+        self.guess_type = guess_type
+        self.poll_interval = poll_interval
+        self.max_files = max_files
+        self.logger = logger
+        self.ready = False
+        self.watch_mode = None
+        self.scans = 0
+        self.scan_ms = 0.0
+        self.updates = 0
+        self.polls = 0
+        self.last_error = None
+        # (files, directories): swapped together by a rescan
+        self._tables = ({}, set())
+        # Polling mode: directory path -> st_mtime_ns seen by the last rescan
+        self._dir_mtimes = {}
+        self._scan_started_ns = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def stats_current(self):
+        """True when entry stats follow every change, including files rewritten in place"""
+        return self.watch_mode == 'inotify'
+
+    def _key(self, path):
+        rel = os.path.relpath(path, self.root)
+        return '' if rel == os.curdir else os.path.normcase(rel)
+
+    def _entry(self, path, st):
+        return PathEntry(path, self._key(path), st, self.guess_type(path))
+
+    def resolve(self, url):
+        """Resolve a request path the way SimpleHTTPRequestHandler.send_head would, without a syscall"""
+        key, trailing_slash = url_key(url)
+        files, directories = self._tables
+        entry = files.get(key)
+        if entry is not None:
+            # A file never matches a URL ending in '/'
+            return _MISSING if trailing_slash else Resolution(FILE, entry, None)
+        if key not in directories:
+            return _MISSING
+        if not trailing_slash:
+            return _REDIRECT
+        for name in INDEX_FILES:
+            entry = files.get(os.path.join(key, name) if key else name)
+            if entry is not None:
+                return Resolution(FILE, entry, None)
+        return Resolution(LISTING, None, os.path.join(self.root, key))
+
+    def negotiate(self, accept_encoding, entry):
+        """precompress.negotiate() from the index: (encoding, variant PathEntry) or None
+
+        Unless ``stats_current``, a file rewritten in place still has its old
+        stat here: the file and the variant are stat'ed again before comparing.
+        """
+        files = self._tables[0]
+        source = None
+        for coding, suffix in preferred_encodings(accept_encoding, entry.path):
+            variant = files.get(entry.key + suffix)
+            if variant is None:
+                continue
+            if self.stats_current:
+                source_mtime, variant_mtime = entry.stat.st_mtime_ns, variant.stat.st_mtime_ns
+            else:
+                try:
+                    source = source or os.stat(entry.path)
+                    variant_mtime = os.stat(variant.path).st_mtime_ns
+                except OSError:
+                    continue
+                source_mtime = source.st_mtime_ns
+            # Never a variant older than the file itself
+            if variant_mtime >= source_mtime:
+                return coding, variant
+        return None
+
+    def start(self):
+        """Build the index and keep it in sync, in a daemon thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='kidsplay-path-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        try:
+            watcher = InotifyWatcher(mask=WATCH_MASK) if InotifyWatcher.available() else None
+        except OSError:
+            watcher = None
+        if watcher is not None:
+            self.watch_mode = 'inotify'
+            try:
+                if self.rescan(watcher):
+                    self._log_ready()
+                    self._watch_inotify(watcher)
+                return
+            except OSError as e:
+                # Usually fs.inotify.max_user_watches: polling still works
+                self.last_error = str(e)
+                if self.logger:
+                    self.logger.warning(f"Path index: cannot watch the tree ({e}), polling instead")
+            finally:
+                watcher.close()
+        self.watch_mode = 'polling'
+        was_ready = self.ready
+        if not self.rescan():
+            return
+        if not was_ready:
+            self._log_ready()
+        while not self._stop.wait(self.poll_interval):
+            self.polls += 1
+            if self._directories_changed() and not self.rescan():
+                return
+
+    def _directories_changed(self):
+        # A directory modified just before the last scan may hide a later change
+        # behind the same mtime (coarse timestamps on FAT/HFS+): look again
+        settled_ns = self._scan_started_ns - MTIME_SLACK_NS
+        for path, mtime_ns in self._dir_mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns or mtime_ns >= settled_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _log_ready(self):
+        if self.logger:
+            files, directories = self._tables
+            self.logger.info(f"Path index: {len(files)} files, {len(directories)} directories "
+                             f"in {self.scan_ms:.0f}ms ({self.watch_mode})")
+
+    def rescan(self, watcher=None):
+        """Walk the whole tree and swap in the new tables; returns False if the index had to be disabled"""
+        started = time.perf_counter()
+        self._scan_started_ns = time.time_ns()
+        files = {}
+        directories = set()
+        mtimes = {} if watcher is None else None
+        try:
+            self._walk(self.root, files, directories, watcher, mtimes)
+        except IndexTooLarge as e:
+            self._disable(e)
+            return False
+        self._tables = (files, directories)
+        if mtimes is not None:
+            self._dir_mtimes = mtimes
+        self.scans += 1
+        self.scan_ms = (time.perf_counter() - started) * 1000
+        self.ready = True
+        return True
+
+    def _walk(self, top, files, directories, watcher, mtimes=None):
+        # Every directory is watched before it is listed, so nothing created meanwhile is missed
+        if watcher is not None:
+            watcher.add_watch(top)
+        # Symlinks are followed, as the handler does; a loop is walked only once
+        visited = set()
+        for dirpath, dirnames, filenames in os.walk(top, followlinks=True):
+            real = os.path.realpath(dirpath)
+            if real in visited:
+                dirnames[:] = []
+                continue
+            visited.add(real)
+            directories.add(self._key(dirpath))
+            if mtimes is not None:
+                try:
+                    mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+                except OSError:
+                    pass
+            if watcher is not None:
+                for name in dirnames:
+                    watcher.add_watch(os.path.join(dirpath, name))
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    files[self._key(path)] = self._entry(path, st)
+            if len(files) > self.max_files:
+                raise IndexTooLarge(f"more than {self.max_files} files under {self.root}")
+
+    def _disable(self, error):
+        # The handler goes back to the filesystem for every request
+        self.ready = False
+        self.last_error = str(error)
+        if self.logger:
+            self.logger.warning(f"PATH INDEX DISABLED: {error}")
+
+    def _watch_inotify(self, watcher):
+        while not self._stop.is_set():
+            events = watcher.read_events(0.5)
+            if any(mask & watcher.IN_Q_OVERFLOW for _, _, mask in events):
+                # Events were lost: only a full walk can tell what changed
+                if not self.rescan(watcher):
+                    return
+                continue
+            try:
+                for directory, name, mask in events:
+                    if directory is None:
+                        continue
+                    path = os.path.join(directory, name) if name else directory
+                    if mask & watcher.IN_ISDIR:
+                        self._update_directory(path, watcher)
+                    else:
+                        self._update_file(path)
+            except IndexTooLarge as e:
+                self._disable(e)
+                return
+
+    def _update_file(self, path):
+        files, directories = self._tables
+        key = self._key(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        self.updates += 1
+        if st is not None and stat.S_ISREG(st.st_mode):
+            files[key] = self._entry(path, st)
+            return
+        files.pop(key, None)
+        if st is not None and stat.S_ISDIR(st.st_mode) and key not in directories:
+            # A symlink to a directory
+            self._update_directory(path, None)
+
+    def _update_directory(self, path, watcher):
+        """A directory appeared or disappeared: add its subtree or drop it"""
+        files, directories = self._tables
+        key = self._key(path)
+        self.updates += 1
+        prefix = key + os.sep
+        for stale in [k for k in files if k.startswith(prefix)]:
+            files.pop(stale, None)
+        for stale in [k for k in directories if k == key or k.startswith(prefix)]:
+            directories.discard(stale)
+        if os.path.isdir(path):
+            self._walk(path, files, directories, watcher)
+
+    def get_stats(self):
+        files, directories = self._tables
+        return {
+            'ready': self.ready,
+            'files': len(files),
+            'directories': len(directories),
+            'bytes': sum(entry.stat.st_size for entry in list(files.values())),
+            'precompressed_variants': sum(1 for key in list(files) if key.endswith(VARIANT_SUFFIXES)),
+            'watch_mode': self.watch_mode,
+            'scans': self.scans,
+            'polls': self.polls,
+            'scan_ms': round(self.scan_ms, 1),
+            'updates': self.updates,
+            'last_error': self.last_error,
+        }
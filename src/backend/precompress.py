@@ -0,0 +1,185 @@
+"""
+precompress.py - Precompressed .br/.gz variants of the KidsPlay frontend.
+
+The server never compresses per request: it only picks an existing sibling
+file (index.html.br, index.html.gz) that matches the client's Accept-Encoding.
+Run this after changing the frontend to (re)build those siblings:
+
+    python src/backend/precompress.py            # walks src/frontend
+    python src/backend/precompress.py --clean    # removes generated variants
+
+Brotli variants need the optional 'brotli' package; without it only gzip
+variants are produced.
+"""
+import argparse
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Text formats worth compressing (images/audio are already compressed)
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.xml', '.webmanifest'}
+
+# Preferred order when the client accepts several encodings equally
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+VARIANT_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+
+MIN_SIZE = 512          # smaller files are not worth a variant
+MIN_SAVING = 0.05       # keep a variant only if it is at least 5% smaller
+
+
+def is_compressible(path):
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        coding, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def preferred_encodings(accept_encoding, path):
+    """Return [(coding, suffix)] acceptable to the client for path, most preferred first"""
+    if not accept_encoding or not is_compressible(path):
+        return []
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    candidates = [(accepted.get(coding, wildcard), -i, coding, suffix)
+                  for i, (coding, suffix) in enumerate(ENCODINGS)]
+    return [(coding, suffix) for q, _, coding, suffix in sorted(candidates, reverse=True) if q > 0]
+
+
+def negotiate(accept_encoding, path):
+    """Pick a fresh precompressed sibling of path acceptable to the client.
+
+    Returns (encoding, variant_path, original_size) or None. Variants older
+    than the source file are ignored so a stale .gz is never served.
+    """
+    candidates = preferred_encodings(accept_encoding, path)
+    if not candidates:
+        return None
+    try:
+        source = os.stat(path)
+    except OSError:
+        return None
+    for coding, suffix in candidates:
+        try:
+            variant = os.stat(path + suffix)
+        except OSError:
+            continue
+        if variant.st_mtime_ns >= source.st_mtime_ns:
+            return coding, path + suffix, source.st_size
+    return None
+
+
+def _write_variant(target, data, mtime):
+    tmp = target + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, target)
+    # Same timestamp as the source so the variant counts as fresh
+    os.utime(target, (mtime, mtime))
+
+
+def precompress_file(path, force=False):
+    """Build the variants for one file; returns [(encoding, original, compressed)]"""
+    st = os.stat(path)
+    if st.st_size < MIN_SIZE:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    results = []
+    for coding, suffix in ENCODINGS:
+        if coding == 'br' and brotli is None:
+            continue
+        target = path + suffix
+        try:
+            if not force and os.stat(target).st_mtime_ns >= st.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+        if coding == 'br':
+            compressed = brotli.compress(data, quality=11)
+        else:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) > len(data) * (1 - MIN_SAVING):
+            # Not worth it: make sure no stale variant is left behind
+            if os.path.exists(target):
+                os.remove(target)
+            continue
+        _write_variant(target, compressed, st.st_mtime)
+        results.append((coding, len(data), len(compressed)))
+    return results
+
+
+def precompress_tree(root, force=False):
+    """Walk root and build variants for every compressible file"""
+    files = 0
+    original = compressed = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != 'node_modules']
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(VARIANT_SUFFIXES) or not is_compressible(path):
+                continue
+            for coding, size, packed in precompress_file(path, force):
+                files += 1
+                original += size
+                compressed += packed
+    return files, original, compressed
+
+
+def clean_tree(root):
+    removed = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(VARIANT_SUFFIXES) and is_compressible(name[:name.rfind('.')]):
+                os.remove(os.path.join(dirpath, name))
+                removed += 1
+    return removed
+
+
+def main(argv=None):
+    default_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', nargs='?', default=default_root, help="directory to walk (default: src/frontend)")
+    parser.add_argument('--force', action='store_true', help="rebuild variants even if they are up to date")
+    parser.add_argument('--clean', action='store_true', help="remove generated .br/.gz variants")
+    args = parser.parse_args(argv)
+    root = os.path.normpath(args.root)
+
+    if args.clean:
+        print(f"🧹 Removed {clean_tree(root)} precompressed variants from {root}")
+        return 0
+
+    if brotli is None:
+        print("ℹ️  'brotli' not installed: only gzip variants will be built")
+    files, original, compressed = precompress_tree(root, args.force)
+    if files:
+        print(f"📦 {files} variants written: {original / 1024:.0f}KB -> {compressed / 1024:.0f}KB "
+              f"({compressed / original:.1%} of original)")
+    else:
+        print("✅ All precompressed variants are up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
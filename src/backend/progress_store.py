@@ -0,0 +1,394 @@
+# Shared progress for KidsPlay: users, per-game scores and play time in SQLite.
+# Games post many tiny updates (every level, every few seconds of play), so
+# writes land in an in-memory table of pending deltas, coalesced per key, and
+# a flusher thread commits them in one transaction per batch, on a timer or
+# as soon as enough keys are pending. Reads are answered from an in-memory
+# copy of the database plus the pending deltas, without touching SQLite.
+# The database runs in WAL mode: the flusher never blocks readers, and
+# pre-fork workers can share the file (deltas are added, never overwritten).
+# A read first checks PRAGMA data_version, so what another worker committed
+# is reloaded before it is served.
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+MAX_USERNAME = 20
+GAME_ID_RE = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+# Upper bounds for one update: anything larger is a client bug, not a score
+MAX_SCORE = 10_000_000
+MAX_SESSION_SECONDS = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY COLLATE NOCASE,
+    created_at TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    total_score INTEGER NOT NULL DEFAULT 0,
+    play_seconds INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS scores (
+    username TEXT NOT NULL COLLATE NOCASE,
+    game_id TEXT NOT NULL,
+    plays INTEGER NOT NULL DEFAULT 0,
+    best INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (username, game_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    username TEXT NOT NULL COLLATE NOCASE,
+    game_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    seconds INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (username, game_id, day)
+);
+"""
+
+
+class ProgressError(ValueError):
+    """Invalid input from a client (answered with 400)"""
+
+
+def clean_username(username):
+    if not isinstance(username, str) or not username.strip():
+        raise ProgressError("username required")
+    return username.strip()[:MAX_USERNAME]
+
+
+def clean_game_id(game_id):
+    if not isinstance(game_id, str) or not GAME_ID_RE.match(game_id):
+        raise ProgressError("invalid game_id")
+    return game_id
+
+
+def clean_int(value, name, upper):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= upper:
+        raise ProgressError(f"{name} must be a number between 0 and {upper}")
+    return int(value)
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class ProgressStore:
+    """SQLite-backed users, scores and play time with coalesced, batched writes.
+
+    ``flush_interval`` is the longest a write stays in memory; ``flush_size``
+    pending keys wake the flusher early. Pending deltas are lost only if the
+    process is killed without ``close()`` (at most ``flush_interval`` of play).
+    A flush that fails (e.g. the database stays locked past busy_timeout)
+    keeps its deltas and is retried on the next tick.
+    """
+
+    def __init__(self, path, flush_interval=1.0, flush_size=256, logger=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.logger = logger
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA busy_timeout=5000')
+        self._db.executescript(SCHEMA)
+
+        self._lock = threading.Lock()
+        # Held while the connection commits or reloads, so a reload never sees a
+        # flush committed but not yet cleared from the in-flight deltas
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # Committed state, keyed by lower-cased username
+        self._users = {}
+        self._scores = {}
+        # Pending deltas: key -> list of numbers (coalesced until the next flush)
+        self._pending_users = {}
+        self._pending_scores = {}
+        self._pending_sessions = {}
+        # Deltas being committed: still applied to reads until the reload replaces them
+        self._flushing_users = {}
+        self._flushing_scores = {}
+        self.updates = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_seconds = 0.0
+        self.last_flush_rows = 0
+        self.errors = 0
+        self.last_error = None
+        self.reloads = 0
+        self._load()
+        # Bumped by SQLite whenever another connection commits
+        self._data_version = self._db.execute('PRAGMA data_version').fetchone()[0]
+        self._thread = threading.Thread(target=self._run, name='kidsplay-progress', daemon=True)
+        self._thread.start()
+
+    def _load(self, usernames=None, flushed=False):
+        """Refresh the committed copy (everything, or just ``usernames``).
+
+        After a flush (``flushed``) the in-flight deltas are dropped in the
+        same step, since the rows just read already include them.
+        """
+        where, args = '', ()
+        if usernames:
+            where = f" WHERE username IN ({','.join('?' * len(usernames))})"
+            args = tuple(usernames)
+        users = self._db.execute(
+            'SELECT username, created_at, last_seen, games_played, total_score, play_seconds FROM users' + where,
+            args).fetchall()
+        scores = self._db.execute(
+            'SELECT username, game_id, plays, best, total, updated_at FROM scores' + where, args).fetchall()
+        with self._lock:
+            for row in users:
+                self._users[row[0].lower()] = {
+                    'username': row[0], 'created_at': row[1], 'last_seen': row[2],
+                    'games_played': row[3], 'total_score': row[4], 'play_seconds': row[5],
+                }
+            for row in scores:
+                self._scores.setdefault(row[0].lower(), {})[row[1]] = {
+                    'plays': row[2], 'best': row[3], 'total': row[4], 'updated_at': row[5],
+                }
+            if flushed:
+                self._flushing_users, self._flushing_scores = {}, {}
+
+    # ------------------------------------------------------------ writes
+
+    def login(self, username):
+        """Create the user if needed and mark them as seen; returns the user"""
+        username = clean_username(username)
+        self._add_user_delta(username, 0, 0, 0)
+        return self.get_user(username)
+
+    def record(self, username, game_id, score=0, played=1, seconds=0):
+        """Add one game result and/or play time for ``username`` on ``game_id``"""
+        username = clean_username(username)
+        game_id = clean_game_id(game_id)
+        score = clean_int(score, 'score', MAX_SCORE)
+        played = clean_int(played, 'played', 1000)
+        seconds = clean_int(seconds, 'seconds', MAX_SESSION_SECONDS)
+        self._add_user_delta(username, played, score, seconds, game_id)
+
+    def record_many(self, updates):
+        """Record a batch queued by an offline tablet: (accepted count, [(index, error)]).
+
+        Every update is validated on its own, so an invalid one is reported
+        without losing the valid updates around it.
+        """
+        accepted = 0
+        rejected = []
+        for index, update in enumerate(updates):
+            try:
+                if not isinstance(update, dict):
+                    raise ProgressError("update must be an object")
+                self.record(update.get('username'), update.get('game_id'), update.get('score', 0),
+                            update.get('played', 1), update.get('seconds', 0))
+            except ProgressError as e:
+                rejected.append((index, str(e)))
+            else:
+                accepted += 1
+        return accepted, rejected
+
+    def _add_user_delta(self, username, played, score, seconds, game_id=None):
+        key = username.lower()
+        now = _now()
+        with self._lock:
+            self.updates += 1
+            user = self._pending_users.get(key)
+            if user is None:
+                # [username, first seen, last seen, games played, score, seconds]
+                self._pending_users[key] = [username, now, now, played, score, seconds]
+            else:
+                user[2] = now
+                user[3] += played
+                user[4] += score
+                user[5] += seconds
+            if game_id is not None and (played or score):
+                pending = self._pending_scores.get((key, game_id))
+                if pending is None:
+                    self._pending_scores[key, game_id] = [username, played, score, score, now]
+                else:
+                    pending[1] += played
+                    pending[2] = max(pending[2], score)
+                    pending[3] += score
+                    pending[4] = now
+            if game_id is not None and seconds:
+                day_key = (key, game_id, date.today().isoformat())
+                self._pending_sessions[day_key] = self._pending_sessions.get(day_key, 0) + seconds
+            pending_keys = len(self._pending_users) + len(self._pending_scores) + len(self._pending_sessions)
+        if pending_keys >= self.flush_size:
+            self._wake.set()
+
+    # ------------------------------------------------------------- reads
+
+    def _refresh(self):
+        """Reload the committed copy if another connection (a pre-fork worker) committed since the last read"""
+        # A flush in progress reloads its own users; the next read catches up with the rest
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            version = self._db.execute('PRAGMA data_version').fetchone()[0]
+            if version != self._data_version:
+                self._load()
+                self._data_version = version
+                self.reloads += 1
+        except sqlite3.Error:
+            # Serve the copy we have; the flusher reports database errors
+            pass
+        finally:
+            self._flush_lock.release()
+
+    def get_user(self, username, with_scores=False):
+        """User with in-flight and pending deltas applied, or None"""
+        key = clean_username(username).lower()
+        self._refresh()
+        with self._lock:
+            user = dict(self._users[key]) if key in self._users else None
+            for deltas in (self._flushing_users, self._pending_users):
+                delta = deltas.get(key)
+                if delta is None:
+                    continue
+                if user is None:
+                    user = {'username': delta[0], 'created_at': delta[1], 'last_seen': delta[2],
+                            'games_played': 0, 'total_score': 0, 'play_seconds': 0}
+                user['last_seen'] = delta[2]
+                user['games_played'] += delta[3]
+                user['total_score'] += delta[4]
+                user['play_seconds'] += delta[5]
+            if user is not None and with_scores:
+                scores = {game: dict(entry) for game, entry in self._scores.get(key, {}).items()}
+                for deltas in (self._flushing_scores, self._pending_scores):
+                    for (user_key, game_id), (_, plays, best, total, updated) in deltas.items():
+                        if user_key == key:
+                            entry = scores.setdefault(game_id, {'plays': 0, 'best': 0, 'total': 0})
+                            entry['plays'] += plays
+                            entry['best'] = max(entry['best'], best)
+                            entry['total'] += total
+                            entry['updated_at'] = updated
+                user['scores'] = scores
+        return user
+
+    def list_users(self):
+        self._refresh()
+        with self._lock:
+            keys = set(self._users) | set(self._flushing_users) | set(self._pending_users)
+        users = [self.get_user(key) for key in keys]
+        return sorted(users, key=lambda user: user['last_seen'], reverse=True)
+
+    # ------------------------------------------------------------ flushing
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                # The deltas are back in the pending tables: the next tick retries them
+                if self.logger:
+                    self.logger.error(f"PROGRESS FLUSH FAILED, retrying in {self.flush_interval:g}s: {e}")
+
+    def flush(self):
+        """Commit every pending delta in one transaction; returns the rows written"""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            users, self._pending_users = self._pending_users, {}
+            scores, self._pending_scores = self._pending_scores, {}
+            sessions, self._pending_sessions = self._pending_sessions, {}
+            self._flushing_users, self._flushing_scores = users, scores
+        if not (users or scores or sessions):
+            return 0
+        started = time.perf_counter()
+        try:
+            with self._db:
+                self._db.execute('BEGIN IMMEDIATE')
+                self._db.executemany(
+                    "INSERT INTO users (username, created_at, last_seen, games_played, total_score, play_seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (username) DO UPDATE SET "
+                    "last_seen = excluded.last_seen, games_played = games_played + excluded.games_played, "
+                    "total_score = total_score + excluded.total_score, "
+                    "play_seconds = play_seconds + excluded.play_seconds",
+                    list(users.values()))
+                self._db.executemany(
+                    "INSERT INTO scores (username, game_id, plays, best, total, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (username, game_id) DO UPDATE SET "
+                    "plays = plays + excluded.plays, best = max(best, excluded.best), "
+                    "total = total + excluded.total, updated_at = excluded.updated_at",
+                    [(entry[0], game_id, entry[1], entry[2], entry[3], entry[4])
+                     for (_, game_id), entry in scores.items()])
+                self._db.executemany(
+                    "INSERT INTO sessions (username, game_id, day, seconds) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (username, game_id, day) DO UPDATE SET seconds = seconds + excluded.seconds",
+                    [(users[key][0], game_id, day, seconds) for (key, game_id, day), seconds in sessions.items()])
+        except sqlite3.Error as e:
+            # Put the deltas back so the next flush retries them
+            self.errors += 1
+            self.last_error = str(e)
+            with self._lock:
+                self._flushing_users, self._flushing_scores = {}, {}
+            self._requeue(users, scores, sessions)
+            raise
+        self.last_error = None
+        rows = len(users) + len(scores) + len(sessions)
+        # Re-read the flushed users: also picks up what other worker processes wrote
+        self._load(sorted({entry[0] for entry in users.values()}), flushed=True)
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += rows
+            self.last_flush_rows = rows
+            self.flush_seconds += time.perf_counter() - started
+        return rows
+
+    def _requeue(self, users, scores, sessions):
+        with self._lock:
+            for key, delta in users.items():
+                current = self._pending_users.get(key)
+                if current is None:
+                    self._pending_users[key] = delta
+                else:
+                    current[3:6] = [a + b for a, b in zip(current[3:6], delta[3:6])]
+            for key, delta in scores.items():
+                current = self._pending_scores.get(key)
+                if current is None:
+                    self._pending_scores[key] = delta
+                else:
+                    current[1] += delta[1]
+                    current[2] = max(current[2], delta[2])
+                    current[3] += delta[3]
+            for key, seconds in sessions.items():
+                self._pending_sessions[key] = self._pending_sessions.get(key, 0) + seconds
+
+    def close(self):
+        """Stop the flusher and commit whatever is still pending"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            self._db.close()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'database': self.path,
+                'users': len(set(self._users) | set(self._pending_users)),
+                'updates': self.updates,
+                'pending_keys': len(self._pending_users) + len(self._pending_scores) + len(self._pending_sessions),
+                'flushes': self.flushes,
+                'rows_written': self.rows_written,
+                'coalescing_ratio': self.updates / self.rows_written if self.rows_written else None,
+                'last_flush_rows': self.last_flush_rows,
+                'avg_flush_ms': self.flush_seconds / self.flushes * 1000 if self.flushes else 0,
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'reloads': self.reloads,
+            }
@@ -0,0 +1,89 @@
+# HTTP Range support for KidsPlay: parsing "bytes=" ranges and laying out
+# multipart/byteranges bodies, so audio seeking and resumed downloads of big
+# images only transfer the bytes the browser asked for.
+
+import uuid
+
+# More ranges than this in one request are treated as abuse and ignored
+MAX_RANGES = 16
+
+
+def parse_range_header(header, size):
+    """Parse a Range header against a representation of ``size`` bytes.
+
+    Returns None when the header should be ignored (not bytes, malformed or too
+    many ranges: the client gets the full 200), an empty list when no range is
+    satisfiable (416), or a list of inclusive (start, end) tuples. Overlapping
+    and adjacent ranges are merged (RFC 9110 14.2), so no byte is sent twice.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    specs = [part.strip() for part in spec.split(',') if part.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in specs:
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                if suffix == 0 or size == 0:
+                    continue
+                ranges.append((max(0, size - suffix), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if start < 0 or (last and end < start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    return merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    """Sort inclusive (start, end) ranges and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def content_range(start, end, size):
+    return f"bytes {start}-{end}/{size}"
+
+
+class MultipartRanges:
+    """Layout of a multipart/byteranges body for a list of ranges"""
+
+    def __init__(self, ranges, content_type, size):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/byteranges; boundary={self.boundary}"
+        self.parts = []
+        for start, end in ranges:
+            header = (
+                f"\r\n--{self.boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: {content_range(start, end, size)}\r\n"
+                f"\r\n"
+            ).encode('latin-1')
+            self.parts.append((header, start, end))
+        self.trailer = f"\r\n--{self.boundary}--\r\n".encode('latin-1')
+
+    @property
+    def content_length(self):
+        body = sum(len(header) + end - start + 1 for header, start, end in self.parts)
+        return body + len(self.trailer)
@@ -0,0 +1,173 @@
+# Adaptive resource sampler for KidsPlay's PerformanceMonitor.
+# Samples the server process itself (RSS, CPU time, threads, open fds,
+# sockets) plus system CPU/memory/load. The interval backs off while the
+# server is idle and drops to the minimum when a threshold is crossed, so an
+# idle Pi is woken up every minute instead of every second. History lives in
+# fixed-size arrays.
+
+import os
+import threading
+import time
+from array import array
+
+import psutil
+
+# Per-sample fields kept in the history ring, in this order
+FIELDS = ('timestamp', 'system_cpu_percent', 'system_memory_percent', 'load_1m',
+          'process_cpu_percent', 'rss_bytes', 'threads', 'fds', 'sockets')
+
+
+class ResourceSampler:
+    """Background thread sampling process and system resources at an adaptive interval.
+
+    - the interval starts at ``base_interval``
+    - after a sample with no new requests (``activity()`` unchanged) and usage
+      below the thresholds it doubles, up to ``max_interval``
+    - when CPU or memory is above its threshold it drops to ``min_interval``
+    - with requests flowing and usage normal it returns to ``base_interval``
+
+    ``on_threshold(kind, value)`` is called when a threshold is first crossed.
+    """
+
+    def __init__(self, activity=None, history=120, min_interval=1.0, base_interval=5.0, max_interval=60.0,
+                 cpu_threshold=80.0, memory_threshold=80.0, on_threshold=None):
+        self.activity = activity
+        self.history = history
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.on_threshold = on_threshold
+        self.interval = base_interval
+        self.samples = 0
+        self.errors = 0
+        self._rings = {field: array('d', [0.0] * history) for field in FIELDS}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._process = psutil.Process()
+        self._last_cpu_time = None
+        self._last_wall = None
+        self._last_activity = None
+        self._alerting = set()
+
+    def start(self):
+        # First call only primes psutil's system CPU counter
+        psutil.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, name='kidsplay-resources', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                self.errors += 1
+
+    def _read(self):
+        process = self._process
+        with process.oneshot():
+            cpu = process.cpu_times()
+            rss = process.memory_info().rss
+            threads = process.num_threads()
+            fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+        # net_connections() is psutil >= 6.0; connections() is its older name
+        net_connections = getattr(process, 'net_connections', None) or process.connections
+        try:
+            sockets = len(net_connections(kind='inet'))
+        except psutil.AccessDenied:
+            sockets = 0
+        now = time.monotonic()
+        cpu_time = cpu.user + cpu.system
+        if self._last_wall is not None and now > self._last_wall:
+            process_cpu = (cpu_time - self._last_cpu_time) / (now - self._last_wall) * 100
+        else:
+            process_cpu = 0.0
+        self._last_cpu_time = cpu_time
+        self._last_wall = now
+        load = os.getloadavg()[0] if hasattr(os, 'getloadavg') else 0.0
+        return {
+            'timestamp': time.time(),
+            'system_cpu_percent': psutil.cpu_percent(interval=None),
+            'system_memory_percent': psutil.virtual_memory().percent,
+            'load_1m': load,
+            'process_cpu_percent': process_cpu,
+            'rss_bytes': rss,
+            'threads': threads,
+            'fds': fds,
+            'sockets': sockets,
+        }
+
+    def sample(self):
+        """Take one sample, store it and adapt the interval; returns the sample"""
+        values = self._read()
+        with self._lock:
+            index = self._next % self.history
+            for field in FIELDS:
+                self._rings[field][index] = values[field]
+            self._next += 1
+            self.samples += 1
+
+        hot = []
+        if values['system_cpu_percent'] > self.cpu_threshold:
+            hot.append(('cpu', values['system_cpu_percent']))
+        if values['system_memory_percent'] > self.memory_threshold:
+            hot.append(('memory', values['system_memory_percent']))
+        for kind, value in hot:
+            if kind not in self._alerting and self.on_threshold is not None:
+                self.on_threshold(kind, value)
+        self._alerting = {kind for kind, _ in hot}
+
+        activity = self.activity() if self.activity is not None else None
+        if hot:
+            self.interval = self.min_interval
+        elif activity is not None and activity == self._last_activity:
+            self.interval = min(self.max_interval, max(self.interval, self.base_interval) * 2)
+        else:
+            self.interval = self.base_interval
+        self._last_activity = activity
+        return values
+
+    def recent(self, n=None):
+        """Up to n most recent samples as dicts, oldest first"""
+        with self._lock:
+            count = min(self._next, self.history)
+            if n is not None:
+                count = min(count, n)
+            first = self._next - count
+            return [
+                {field: self._rings[field][i % self.history] for field in FIELDS}
+                for i in range(first, self._next)
+            ]
+
+    def latest(self):
+        recent = self.recent(1)
+        return recent[0] if recent else None
+
+    def average(self, field):
+        with self._lock:
+            count = min(self._next, self.history)
+            return sum(self._rings[field][:count]) / count if count else 0.0
+
+    def get_stats(self):
+        latest = self.latest() or dict.fromkeys(FIELDS, 0.0)
+        return {
+            'enabled': True,
+            'interval_seconds': self.interval,
+            'samples': self.samples,
+            'errors': self.errors,
+            'rss_mb': latest['rss_bytes'] / (1024 * 1024),
+            'cpu_percent': latest['process_cpu_percent'],
+            'threads': int(latest['threads']),
+            'fds': int(latest['fds']),
+            'sockets': int(latest['sockets']),
+            'load_1m': latest['load_1m'],
+            'peak_rss_mb': max(s['rss_bytes'] for s in self.recent()) / (1024 * 1024) if self.samples else 0.0,
+        }
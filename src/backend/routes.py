@@ -0,0 +1,167 @@
+# Route normalization and heavy-hitter tracking for KidsPlay's endpoint stats.
+# Raw paths (cache-busting queries, scanners probing random URLs) would give
+# an unbounded number of keys; requests are first folded into route templates
+# and then counted in a fixed-capacity space-saving table.
+
+import os
+import posixpath
+import threading
+import urllib.parse
+
+from histograms import LatencyHistogram
+
+# Endpoints served by the backend itself
+EXACT_ROUTES = {'/', '/index.html', '/debug/performance', '/metrics', '/sw.js', '/manifest.json',
+                '/api/version', '/api/catalog', '/api/config/version', '/api/users', '/api/progress'}
+# API routes with a path parameter: prefix -> template
+API_TEMPLATES = {'/api/users/': '/api/users/{name}'}
+
+ASSET_CLASSES = {
+    '.html': 'html', '.htm': 'html',
+    '.js': 'js', '.mjs': 'js',
+    '.css': 'css',
+    '.json': 'json', '.webmanifest': 'json',
+    '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.gif': 'image', '.svg': 'image',
+    '.webp': 'image', '.ico': 'image',
+    '.mp3': 'audio', '.ogg': 'audio', '.wav': 'audio', '.m4a': 'audio',
+    '.woff': 'font', '.woff2': 'font', '.ttf': 'font',
+}
+
+
+def asset_class(name):
+    if not name:
+        return 'dir'
+    return ASSET_CLASSES.get(posixpath.splitext(name)[1].lower(), 'other')
+
+
+class RouteNormalizer:
+    """Folds request paths into a bounded set of route templates.
+
+    - the query string is dropped
+    - game pages keep their game id when it is a real game, others become {unknown}
+    - other game files collapse to their asset class: /games/snake/*.js
+    - files that exist under the frontend keep their path (a bounded set),
+      except images/audio which collapse per top-level directory
+    - anything else collapses to /<known dir>/*.<class> or /*.<class>
+    """
+
+    def __init__(self, root=None):
+        self.games = set()
+        self.files = set()
+        self.top_dirs = set()
+        if root:
+            self.scan(root)
+
+    def scan(self, root):
+        games_dir = os.path.join(root, 'games')
+        if os.path.isdir(games_dir):
+            for category in os.listdir(games_dir):
+                category_dir = os.path.join(games_dir, category)
+                if os.path.isdir(category_dir):
+                    self.games.update(
+                        name for name in os.listdir(category_dir)
+                        if os.path.isdir(os.path.join(category_dir, name))
+                    )
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            rel = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            prefix = '' if rel == '.' else '/' + rel
+            if prefix.count('/') == 1:
+                self.top_dirs.add(prefix[1:])
+            for name in filenames:
+                self.files.add(f"{prefix}/{name}")
+
+    def normalize(self, path):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(path).path) or '/'
+        if path in EXACT_ROUTES:
+            return path
+        for prefix, template in API_TEMPLATES.items():
+            if path.startswith(prefix):
+                return template
+        parts = path.strip('/').split('/')
+        kind = asset_class('' if path.endswith('/') else parts[-1])
+
+        if parts[0] == 'games' and len(parts) >= 3:
+            game = parts[2] if parts[2] in self.games else '{unknown}'
+            if len(parts) == 4 and parts[3] == 'index.html':
+                return f"/games/{game}/index.html"
+            return f"/games/{game}/*.{kind}"
+
+        if path in self.files and kind not in ('image', 'audio'):
+            return path
+        if len(parts) > 1 and parts[0] in self.top_dirs:
+            return f"/{parts[0]}/*.{kind}"
+        return f"/*.{kind}"
+
+
+class _RouteEntry:
+    __slots__ = ('count', 'error', 'errors', 'latency')
+
+    def __init__(self, count, error):
+        self.count = count
+        self.error = error
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+
+class TopRoutes:
+    """Space-saving heavy-hitter table with per-route latency histograms.
+
+    At most ``capacity`` routes are tracked. A new route replaces the one with
+    the lowest count and inherits that count as its overestimation ``error``,
+    so every route whose true count is above total/capacity is guaranteed to
+    be in the table and counts are never underestimated.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.total = 0
+        self.evictions = 0
+
+    def record(self, route, response_time, is_error=False):
+        with self._lock:
+            self.total += 1
+            entry = self._entries.get(route)
+            if entry is None:
+                if len(self._entries) < self.capacity:
+                    entry = self._entries[route] = _RouteEntry(0, 0)
+                else:
+                    victim = min(self._entries, key=lambda r: self._entries[r].count)
+                    floor = self._entries.pop(victim).count
+                    entry = self._entries[route] = _RouteEntry(floor, floor)
+                    self.evictions += 1
+            entry.count += 1
+            if is_error:
+                entry.errors += 1
+            entry.latency.record(response_time)
+
+    def _summary(self, route, entry):
+        return dict(
+            route=route,
+            requests=entry.count,
+            count_error=entry.error,
+            errors=entry.errors,
+            **{key: value for key, value in entry.latency.summary_ms().items() if key != 'count'}
+        )
+
+    def hottest(self, n=10):
+        with self._lock:
+            items = sorted(self._entries.items(), key=lambda item: item[1].count, reverse=True)[:n]
+            return [self._summary(route, entry) for route, entry in items]
+
+    def slowest(self, n=5, min_requests=3):
+        """Slowest routes by p90, among routes with enough samples"""
+        with self._lock:
+            summaries = [
+                self._summary(route, entry)
+                for route, entry in self._entries.items()
+                if entry.latency.count >= min_requests
+            ]
+        return sorted(summaries, key=lambda e: e['p90_ms'], reverse=True)[:n]
+
+    def get_stats(self):
+        with self._lock:
+            return {'tracked': len(self._entries), 'capacity': self.capacity,
+                    'total': self.total, 'evictions': self.evictions}
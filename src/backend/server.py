@@ -2,59 +2,214 @@
 # Run with: python -m http.server 8080
 
 import http.server
-import socketserver
-import webbrowser
 import threading
 import time
 import os
 import logging
 import json
-import psutil
 import urllib.parse
 import sys
+import argparse
+import io
+import stat
+import queue
+import random
+import signal
+import socket
+import sqlite3
 from datetime import datetime
 from collections import deque, defaultdict
 
-# Fix Unicode encoding issues on Windows
-if sys.platform == 'win32':
-    import codecs
-    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
-    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+from serving import SERVER_MODES, create_server
+from cluster import SharedStats, Supervisor, prefork_supported
+from lifecycle import GracefulShutdown, forget_parent, inherited_listener, notify_ready, spawn_successor
+from histograms import LatencyHistogram
+from windows import SlidingWindowCounters
+from routes import RouteNormalizer, TopRoutes
+from admission import HEALTH_PATHS, ClientRateLimiter, InFlightLimiter, is_loopback, retry_after_header
+from access_log import NEVER_DROP, ROTATE_WHEN, BatchLogWriter, DroppingQueueHandler, WriterHandler
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, duration_bucket_counts
+from asset_cache import AssetCache
+from path_index import FILE, LISTING, REDIRECT, PathIndex
+from transfer import send_body
+from precompress import is_compressible, negotiate, parse_accept_encoding
+from service_worker import VersionInfo
+from catalog import DEFAULT_PROFILE, CatalogIndex
+from config_store import ConfigStore
+from progress_store import ProgressError, ProgressStore
+from ranges import MultipartRanges, content_range, parse_range_header
+from cache_policy import (CACHE_PROFILES, ETagStore, cache_control_for, etag_matches,
+                          not_modified_since)
 
 PORT = 8080
 
+# Directory served (None = src/frontend; point it at dist/ for a production build)
+FRONTEND_ROOT = os.environ.get('KIDSPLAY_ROOT') or None
+# Extra profile directory overriding the served config/*.json by name (None = none)
+CONFIG_DIR = os.environ.get('KIDSPLAY_CONFIG_DIR') or None
+# SQLite database of users, scores and play time ('' disables the progress API)
+PROGRESS_DB = os.environ.get('KIDSPLAY_PROGRESS_DB',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'progress.db'))
+PROGRESS_FLUSH_SECONDS = float(os.environ.get('KIDSPLAY_PROGRESS_FLUSH_SECONDS', '1'))
+MAX_POST_BYTES = 16 * 1024
+# Clients that may wait at once on /api/config/version?since=... (each holds a worker)
+CONFIG_LONG_POLL_MAX = 2
+CONFIG_LONG_POLL_SECONDS = 25
+
+# Serving engine defaults (overridable from the command line or the environment)
+SERVER_MODE = os.environ.get('KIDSPLAY_SERVER_MODE', 'threads')
+MAX_WORKERS = int(os.environ.get('KIDSPLAY_MAX_WORKERS', '8'))
+QUEUE_DEPTH = int(os.environ.get('KIDSPLAY_QUEUE_DEPTH', '64'))
+# Worker processes in pre-fork mode (1 = a single process)
+PROCESSES = int(os.environ.get('KIDSPLAY_PROCESSES', '1'))
+# Serve first, then start resource sampling, warm the asset cache and scan routes in the background
+FAST_START = os.environ.get('KIDSPLAY_FAST_START', '1').lower() in ('1', 'true', 'yes', 'on')
+# Longest wait for requests in flight on SIGTERM/SIGINT before exiting anyway
+DRAIN_TIMEOUT = float(os.environ.get('KIDSPLAY_DRAIN_TIMEOUT', '20'))
+
+# In-memory static asset cache (0 MB disables it)
+ASSET_CACHE_MB = float(os.environ.get('KIDSPLAY_ASSET_CACHE_MB', '32'))
+ASSET_CACHE_MAX_FILE_KB = int(os.environ.get('KIDSPLAY_ASSET_CACHE_MAX_FILE_KB', '2048'))
+
+# In-memory index of the served tree: URLs and 404s resolved without filesystem calls
+PATH_INDEX = os.environ.get('KIDSPLAY_PATH_INDEX', '1').lower() in ('1', 'true', 'yes', 'on')
+# Without inotify (macOS, Windows): seconds between checks of the directories for changes
+PATH_INDEX_POLL_SECONDS = float(os.environ.get('KIDSPLAY_PATH_INDEX_POLL_SECONDS', '5'))
+# HTML listing of directories without an index.html (off: 404)
+DIRECTORY_LISTING = os.environ.get('KIDSPLAY_DIRECTORY_LISTING', '1').lower() in ('1', 'true', 'yes', 'on')
+
+# HTTP/1.1 persistent connections (off keeps the HTTP/1.0 one-request-per-connection behaviour)
+KEEP_ALIVE = os.environ.get('KIDSPLAY_KEEP_ALIVE', '0').lower() in ('1', 'true', 'yes', 'on')
+KEEP_ALIVE_TIMEOUT = float(os.environ.get('KIDSPLAY_KEEP_ALIVE_TIMEOUT', '5'))
+KEEP_ALIVE_MAX_REQUESTS = int(os.environ.get('KIDSPLAY_KEEP_ALIVE_MAX_REQUESTS', '100'))
+
+# Routes tracked individually in the endpoint stats (least requested ones get replaced)
+TOP_ROUTES_CAPACITY = int(os.environ.get('KIDSPLAY_TOP_ROUTES', '64'))
+
+# Performance log: location, sampling of normal requests, rotation and compression
+LOG_DIR = os.environ.get('KIDSPLAY_LOG_DIR') or os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
+LOG_SAMPLE_RATE = float(os.environ.get('KIDSPLAY_LOG_SAMPLE_RATE', '1.0'))
+LOG_MAX_MB = float(os.environ.get('KIDSPLAY_LOG_MAX_MB', '10'))
+LOG_ROTATE_WHEN = os.environ.get('KIDSPLAY_LOG_ROTATE_WHEN', 'daily')
+LOG_BACKUP_COUNT = int(os.environ.get('KIDSPLAY_LOG_BACKUP_COUNT', '14'))
+LOG_COMPRESS = os.environ.get('KIDSPLAY_LOG_COMPRESS', '1').lower() in ('1', 'true', 'yes', 'on')
+LOG_QUEUE_SIZE = 10000
+STATS_REPORT_SECONDS = 300
+
+# Admission control: token bucket per client IP (opt-in: tablets behind one home
+# NAT share an IP and a first page load fetches dozens of assets) and a global
+# cap on requests in flight (0 = only the engine's own worker/queue limits)
+RATE_LIMIT = float(os.environ.get('KIDSPLAY_RATE_LIMIT', '0'))
+RATE_BURST = int(os.environ.get('KIDSPLAY_RATE_BURST', '100'))
+RATE_LIMIT_CLIENTS = 4096
+MAX_IN_FLIGHT = int(os.environ.get('KIDSPLAY_MAX_IN_FLIGHT', '0'))
+
+# Process/system resource sampling: adaptive interval between the min and max,
+# backing off while idle (off = no sampler thread at all)
+RESOURCE_SAMPLING = os.environ.get('KIDSPLAY_RESOURCE_SAMPLING', '1').lower() in ('1', 'true', 'yes', 'on')
+RESOURCE_INTERVAL = float(os.environ.get('KIDSPLAY_RESOURCE_INTERVAL', '5'))
+RESOURCE_MIN_INTERVAL = 1.0
+RESOURCE_MAX_INTERVAL = float(os.environ.get('KIDSPLAY_RESOURCE_MAX_INTERVAL', '60'))
+
+# Browser cache profile: 'dev' (never cache) or 'production' (ETag revalidation,
+# long max-age for versioned assets)
+CACHE_PROFILE = os.environ.get('KIDSPLAY_CACHE_PROFILE', 'dev')
+
 # Performance monitoring setup
 class PerformanceMonitor:
     def __init__(self):
         self.request_times = deque(maxlen=1000)  # Keep last 1000 requests
         self.slow_requests = deque(maxlen=100)   # Keep last 100 slow requests
-        self.endpoint_stats = defaultdict(list)
+        # Per-route latency histograms in a fixed-capacity heavy-hitter table:
+        # constant memory however long the server runs and whatever URLs it sees
+        self.route_normalizer = RouteNormalizer()
+        self.endpoint_stats = TopRoutes(capacity=TOP_ROUTES_CAPACITY)
+        self.latency = LatencyHistogram()
+        # Requests/bytes/errors/slow per second over the last 1, 5 and 15 minutes
+        self.throughput = SlidingWindowCounters()
+        # Pre-aggregated counters for the /metrics endpoint
+        self.metrics = MetricsRegistry()
         self.start_time = time.time()
+        # Requests may be recorded from several worker threads at once
+        self.lock = threading.Lock()
+        # Pre-fork mode: shared-memory counters of all workers, and this worker's slot
+        self.cluster = None
+        self.worker_slot = None
         
-        # System monitoring
-        self.cpu_history = deque(maxlen=60)      # 1 minute of CPU data
-        self.memory_history = deque(maxlen=60)   # 1 minute of memory data
+        # Precompressed (.br/.gz) responses
+        self.compression_by_encoding = defaultdict(int)
+        self.compression_original_bytes = 0
+        self.compression_sent_bytes = 0
         
-        # Setup logging
-        self.setup_logging()
+        # Static file responses: 304 revalidations vs full 200s
+        self.validation_counts = defaultdict(int)
         
-        # Start background monitoring
-        threading.Thread(target=self.monitor_system, daemon=True).start()
+        # Requests refused by admission control (429/503) or exempted from it
+        self.admission_counts = defaultdict(int)
+        
+        # Connections and how many requests each one carried
+        self.connections_open = 0
+        self.connections_closed = 0
+        self.connection_requests = 0
+        self.requests_per_connection = defaultdict(int)  # bucket label -> connections
+        self.max_requests_per_connection = 0
+        
+        # Log pipeline and resource sampler: nothing touches the disk or starts
+        # a thread until start_server() calls setup_logging()/setup_resources()
+        self.perf_logger = logging.getLogger('performance')
+        self.log_sample_rate = LOG_SAMPLE_RATE
+        self.log_sampled_out = 0
+        self.log_queue = None
+        self.log_handler = None
+        self.log_writer = None
+        self.resources = None
     
-    def setup_logging(self):
+    def setup_logging(self, sample_rate=LOG_SAMPLE_RATE, max_bytes=LOG_MAX_MB * 1024 * 1024,
+                      rotate_when=LOG_ROTATE_WHEN, backup_count=LOG_BACKUP_COUNT, compress=LOG_COMPRESS,
+                      shared=False, log_dir=LOG_DIR):
         # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'logs')
         os.makedirs(log_dir, exist_ok=True)
         
-        # Setup performance logger
+        # Setup performance logger (replacing the handlers of a previous setup)
         self.perf_logger = logging.getLogger('performance')
         self.perf_logger.setLevel(logging.INFO)
+        self.shutdown_logging()
         
-        # File handler for performance logs
-        perf_handler = logging.FileHandler(os.path.join(log_dir, 'server_performance.log'), encoding='utf-8')
+        # Share of normal requests written to the log; slow requests and errors are always logged
+        self.log_sample_rate = sample_rate
+        self.log_sampled_out = 0
+        
+        # File logging goes through a bounded queue to a background batch writer,
+        # so request threads never wait for the SD card. In pre-fork mode the
+        # queue is a multiprocessing one: workers log through it and only the
+        # supervisor writes (and rotates) the file, from its main loop rather
+        # than a thread, so that it never forks while a thread holds a lock.
         perf_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        perf_handler.setFormatter(perf_formatter)
-        self.perf_logger.addHandler(perf_handler)
+        if shared:
+            import multiprocessing
+            self.log_queue = multiprocessing.Queue(maxsize=LOG_QUEUE_SIZE)
+        else:
+            self.log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.log_writer = BatchLogWriter(
+            self.log_queue,
+            os.path.join(log_dir, 'server_performance.log'),
+            perf_formatter,
+            max_bytes=max_bytes,
+            rotate_when=rotate_when,
+            backup_count=backup_count,
+            compress=compress
+        )
+        if shared:
+            # The supervisor writes its own records directly: a put on the shared
+            # queue would start a feeder thread that forked workers inherit mid-use
+            self.add_log_handlers(WriterHandler(self.log_writer))
+        else:
+            self.log_writer.start()
+            self.add_log_handlers()
+    
+    def add_log_handlers(self, file_handler=None):
+        self.log_handler = file_handler or DroppingQueueHandler(self.log_queue)
+        self.perf_logger.addHandler(self.log_handler)
         
         # Console handler for immediate feedback
         console_handler = logging.StreamHandler()
@@ -63,13 +218,55 @@ class PerformanceMonitor:
         console_handler.setFormatter(console_formatter)
         self.perf_logger.addHandler(console_handler)
     
+    def shutdown_logging(self):
+        """Detach the log handlers and flush everything still queued to disk"""
+        for handler in list(self.perf_logger.handlers):
+            self.perf_logger.removeHandler(handler)
+        writer = getattr(self, 'log_writer', None)
+        if writer is not None and (writer.is_alive() or writer.ident is None):
+            writer.stop()
+    
+    def attach_worker(self, slot):
+        """In a freshly forked worker: record into ``slot`` and log through the supervisor"""
+        self.worker_slot = slot
+        # Per-worker /metrics series carry the worker index, so scrapes answered by
+        # different workers do not look like counter resets
+        self.metrics = MetricsRegistry(const_labels={'worker': slot.index})
+        # The writer stayed in the supervisor; keep its queue, replace the handlers.
+        # The supervisor never puts on the queue and runs no threads, so the
+        # inherited queue has no feeder thread and no lock held: the worker
+        # starts its own feeder with its first record.
+        for handler in list(self.perf_logger.handlers):
+            self.perf_logger.removeHandler(handler)
+        self.log_writer = None
+        self.add_log_handlers()
+    
+    def detach_worker(self):
+        """Before a worker exits: push its queued log records to the supervisor"""
+        for handler in list(self.perf_logger.handlers):
+            self.perf_logger.removeHandler(handler)
+        self.log_queue.close()
+        self.log_queue.join_thread()
+    
     def record_request(self, method, path, response_time, status_code, file_size=0):
         timestamp = datetime.now()
         
         # Record basic stats
-        self.request_times.append(response_time)
-        endpoint = f"{method} {path}"
-        self.endpoint_stats[endpoint].append(response_time)
+        route = self.route_normalizer.normalize(path)
+        endpoint = f"{method} {route}"
+        with self.lock:
+            self.request_times.append(response_time)
+            self.latency.record(response_time)
+            self.throughput.add(
+                requests=1,
+                bytes=file_size,
+                errors=1 if status_code >= 400 else 0,
+                slow=1 if response_time > 0.5 else 0
+            )
+            if self.worker_slot is not None:
+                self.worker_slot.record(response_time, file_size, status_code >= 400)
+        self.endpoint_stats.record(endpoint, response_time, status_code >= 400)
+        self.metrics.record_request(method, route, status_code, response_time, file_size)
         
         # Detect slow requests (>500ms)
         if response_time > 0.5:
@@ -86,30 +283,78 @@ class PerformanceMonitor:
             # Log slow request
             self.perf_logger.warning(f"SLOW REQUEST: {method} {path} took {response_time:.3f}s (size: {file_size} bytes)")
         
-        # Log all requests to file
-        self.perf_logger.info(f"{method} {path} - {response_time:.3f}s - {status_code} - {file_size}B")
+        # Log requests to file: errors always, normal requests according to the sampling rate
+        if status_code >= 400:
+            # Kept even when the log queue is full (INFO, so the console is not flooded with 404s)
+            self.perf_logger.info(f"{method} {path} - {response_time:.3f}s - {status_code} - {file_size}B",
+                                  extra=NEVER_DROP)
+        elif self.log_sample_rate >= 1 or random.random() < self.log_sample_rate:
+            self.perf_logger.info(f"{method} {path} - {response_time:.3f}s - {status_code} - {file_size}B")
+        else:
+            self.log_sampled_out += 1
     
-    def monitor_system(self):
-        """Background thread to monitor system resources"""
-        while True:
-            try:
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                
-                self.cpu_history.append(cpu_percent)
-                self.memory_history.append(memory.percent)
-                
-                # Alert on high resource usage
-                if cpu_percent > 80:
-                    self.perf_logger.warning(f"HIGH CPU USAGE: {cpu_percent:.1f}%")
-                
-                if memory.percent > 80:
-                    self.perf_logger.warning(f"HIGH MEMORY USAGE: {memory.percent:.1f}%")
-                
-            except Exception as e:
-                self.perf_logger.error(f"System monitoring error: {e}")
-            
-            time.sleep(1)
+    def record_compression(self, encoding, original_size, sent_size):
+        """Record a response served from a precompressed variant"""
+        with self.lock:
+            self.compression_by_encoding[encoding] += 1
+            self.compression_original_bytes += original_size
+            self.compression_sent_bytes += sent_size
+    
+    def record_validation(self, status_code, conditional):
+        """Record a static file response (200 or 304) and whether the client sent validators"""
+        with self.lock:
+            self.validation_counts[status_code] += 1
+            if conditional:
+                self.validation_counts['conditional'] += 1
+    
+    def record_admission(self, outcome):
+        """Count a throttled (429), rejected (503) or exempt request"""
+        with self.lock:
+            self.admission_counts[outcome] += 1
+    
+    def record_connection_open(self):
+        with self.lock:
+            self.connections_open += 1
+    
+    def record_connection_closed(self, requests):
+        """Record a finished connection and the number of requests it served"""
+        if requests <= 1:
+            bucket = str(requests)
+        elif requests <= 5:
+            bucket = '2-5'
+        elif requests <= 20:
+            bucket = '6-20'
+        else:
+            bucket = '21+'
+        with self.lock:
+            self.connections_open -= 1
+            self.connections_closed += 1
+            self.connection_requests += requests
+            self.requests_per_connection[bucket] += 1
+            self.max_requests_per_connection = max(self.max_requests_per_connection, requests)
+    
+    def setup_resources(self, enabled=RESOURCE_SAMPLING, interval=RESOURCE_INTERVAL,
+                        max_interval=RESOURCE_MAX_INTERVAL):
+        """(Re)start the resource sampler, or leave it off entirely"""
+        if self.resources is not None:
+            self.resources.stop()
+            self.resources = None
+        if not enabled:
+            return
+        # Imported here: psutil is only needed once sampling starts
+        from resources import ResourceSampler
+        self.resources = ResourceSampler(
+            activity=lambda: self.latency.count,
+            min_interval=min(RESOURCE_MIN_INTERVAL, interval),
+            base_interval=interval,
+            max_interval=max(interval, max_interval),
+            on_threshold=self._resource_alert
+        )
+        self.resources.start()
+    
+    def _resource_alert(self, kind, value):
+        """Alert on high resource usage"""
+        self.perf_logger.warning(f"HIGH {kind.upper()} USAGE: {value:.1f}%")
     
     def get_stats(self):
         """Return current performance statistics"""
@@ -117,76 +362,515 @@ class PerformanceMonitor:
         uptime = now - self.start_time
         
         # Calculate request stats
-        avg_response_time = sum(self.request_times) / len(self.request_times) if self.request_times else 0
-        requests_per_minute = len([t for t in self.request_times if now - t < 60]) if self.request_times else 0
+        with self.lock:
+            request_times = list(self.request_times)
+            total_requests = self.latency.count
+            latency = self.latency.summary_ms()
+            throughput = self.throughput.rates()
+        avg_response_time = sum(request_times) / len(request_times) if request_times else 0
+        requests_per_minute = throughput['1m']['requests']
+        
+        # Pre-fork mode: request totals and latency of the whole cluster, not of
+        # whichever worker answers; the other sections stay per worker
+        cluster = None
+        if self.cluster is not None:
+            aggregate = self.cluster.aggregate(now)
+            total_requests = aggregate['requests']
+            latency = aggregate['latency'].summary_ms()
+            avg_response_time = aggregate['latency'].mean
+            requests_per_minute = aggregate['requests_per_minute']
+            cluster = {
+                'processes': self.cluster.workers,
+                'alive': sum(1 for worker in aggregate['workers'] if worker['alive']),
+                'answered_by': self.worker_slot.index if self.worker_slot is not None else 'supervisor',
+                'requests': aggregate['requests'],
+                'errors': aggregate['errors'],
+                'slow': aggregate['slow'],
+                'bytes': aggregate['bytes'],
+                'workers': aggregate['workers']
+            }
         
         # System stats
-        current_cpu = self.cpu_history[-1] if self.cpu_history else 0
-        current_memory = self.memory_history[-1] if self.memory_history else 0
-        avg_cpu = sum(self.cpu_history) / len(self.cpu_history) if self.cpu_history else 0
-        avg_memory = sum(self.memory_history) / len(self.memory_history) if self.memory_history else 0
+        resources = self.resources
+        latest = resources.latest() if resources is not None else None
+        current_cpu = latest['system_cpu_percent'] if latest else 0
+        current_memory = latest['system_memory_percent'] if latest else 0
+        avg_cpu = resources.average('system_cpu_percent') if resources is not None else 0
+        avg_memory = resources.average('system_memory_percent') if resources is not None else 0
         
         return {
             'uptime_seconds': uptime,
-            'total_requests': len(self.request_times),
+            'total_requests': total_requests,
             'avg_response_time_ms': avg_response_time * 1000,
+            'latency': latency,
             'requests_per_minute': requests_per_minute,
+            'throughput': throughput,
             'slow_requests_count': len(self.slow_requests),
             'current_cpu_percent': current_cpu,
             'current_memory_percent': current_memory,
             'avg_cpu_percent': avg_cpu,
             'avg_memory_percent': avg_memory,
-            'slowest_endpoints': self._get_slowest_endpoints()
+            'process': resources.get_stats() if resources is not None else {'enabled': False},
+            'slowest_endpoints': self._get_slowest_endpoints(),
+            'hottest_endpoints': self.endpoint_stats.hottest(10),
+            'route_table': self.endpoint_stats.get_stats(),
+            'compression': self._get_compression_stats(),
+            'conditional': self._get_validation_stats(),
+            'connections': self._get_connection_stats(),
+            'admission': self._get_admission_stats(),
+            'logging': self._get_logging_stats(),
+            'cluster': cluster
         }
     
+    def _get_logging_stats(self):
+        """State of the asynchronous log pipeline"""
+        writer = self.log_writer
+        try:
+            queued = self.log_queue.qsize() if self.log_queue is not None else None
+        except NotImplementedError:  # multiprocessing queue on macOS
+            queued = None
+        stats = {
+            'sample_rate': self.log_sample_rate,
+            'sampled_out': self.log_sampled_out,
+            'dropped': getattr(self.log_handler, 'dropped', 0),
+            'queued': queued
+        }
+        # Pre-fork workers only queue records; the supervisor owns the writer
+        if writer is not None:
+            stats.update(
+                written=writer.written,
+                batches=writer.batches,
+                rotations=writer.rotations,
+                write_errors=writer.errors
+            )
+        return stats
+    
+    def render_metrics(self):
+        """OpenMetrics text for /metrics, from counters kept up to date by record_request"""
+        gauges = [
+            ('uptime_seconds', "Seconds since the server started.", 'seconds', time.time() - self.start_time),
+            ('slow_requests_recent', "Slow requests (>500ms) among the last 100 kept.", '', len(self.slow_requests)),
+        ]
+        latest = self.resources.latest() if self.resources is not None else None
+        if latest:
+            gauges += [
+                ('system_cpu_percent', "System CPU usage at the last resource sample.", '',
+                 latest['system_cpu_percent']),
+                ('system_memory_percent', "System memory usage at the last resource sample.", '',
+                 latest['system_memory_percent']),
+                ('system_load1', "System 1-minute load average.", '', latest['load_1m']),
+                ('process_cpu_percent', "CPU used by the server process since the previous sample.", '',
+                 latest['process_cpu_percent']),
+                ('process_resident_memory_bytes', "Resident memory of the server process.", 'bytes',
+                 latest['rss_bytes']),
+                ('process_threads', "Threads of the server process.", '', latest['threads']),
+                ('process_open_fds', "Open file descriptors of the server process.", '', latest['fds']),
+                ('process_sockets', "Open inet sockets of the server process.", '', latest['sockets']),
+            ]
+        counters = histograms = ()
+        if self.cluster is not None:
+            # Pre-fork mode: totals of every worker from the shared segment, whichever answers
+            aggregate = self.cluster.aggregate()
+            workers = [({'worker': slot.index}, slot) for slot in self.cluster.slots]
+            counters = [
+                ('cluster_http_requests', "HTTP requests served by each pre-fork worker slot.", '',
+                 [(labels, slot['requests']) for labels, slot in workers]),
+                ('cluster_http_errors', "HTTP responses with status >= 400 by worker slot.", '',
+                 [(labels, slot['errors']) for labels, slot in workers]),
+                ('cluster_http_slow_requests', "Requests slower than 500ms by worker slot.", '',
+                 [(labels, slot['slow']) for labels, slot in workers]),
+                ('cluster_http_response_bytes', "Response bytes sent by worker slot.", 'bytes',
+                 [(labels, slot['bytes']) for labels, slot in workers]),
+                ('cluster_worker_restarts', "Restarts of each pre-fork worker slot.", '',
+                 [(labels, slot['restarts']) for labels, slot in workers]),
+            ]
+            latency = aggregate['latency']
+            histograms = [
+                ('cluster_http_request_duration_seconds', "Time to serve a request, all workers.", 'seconds',
+                 duration_bucket_counts(latency), latency.count, latency.total),
+            ]
+        return self.metrics.render(gauges, counters, histograms)
+    
+    def _get_compression_stats(self):
+        """Responses served precompressed, with overall ratio and bytes saved"""
+        with self.lock:
+            original = self.compression_original_bytes
+            sent = self.compression_sent_bytes
+            by_encoding = dict(self.compression_by_encoding)
+        return {
+            'responses': sum(by_encoding.values()),
+            'by_encoding': by_encoding,
+            'original_bytes': original,
+            'sent_bytes': sent,
+            'bytes_saved': original - sent,
+            'ratio': sent / original if original else 0
+        }
+    
+    def _get_validation_stats(self):
+        """304 vs 200 for static files, and how often revalidation saved the body"""
+        with self.lock:
+            not_modified = self.validation_counts[304]
+            full = self.validation_counts[200]
+            partial = self.validation_counts[206]
+            conditional = self.validation_counts['conditional']
+        served = not_modified + full
+        return {
+            'not_modified_304': not_modified,
+            'full_200': full,
+            'partial_206': partial,
+            'conditional_requests': conditional,
+            'hit_rate_304': not_modified / served if served else 0,
+            'revalidation_hit_rate': not_modified / conditional if conditional else 0
+        }
+    
+    def _get_admission_stats(self):
+        """Requests refused before being served; they are not in the request stats"""
+        with self.lock:
+            counts = dict(self.admission_counts)
+        return {
+            'throttled': counts.get('throttled', 0),
+            'rejected': counts.get('rejected', 0),
+            'exempt': counts.get('exempt', 0)
+        }
+    
+    def _get_connection_stats(self):
+        """Requests per connection and how many requests reused an open connection"""
+        with self.lock:
+            closed = self.connections_closed
+            requests = self.connection_requests
+            return {
+                'open': self.connections_open,
+                'closed': closed,
+                'requests_per_connection_avg': requests / closed if closed else 0,
+                'requests_per_connection_max': self.max_requests_per_connection,
+                'requests_per_connection': dict(self.requests_per_connection),
+                'reuse_ratio': (requests - closed) / requests if requests else 0
+            }
+    
     def _get_slowest_endpoints(self):
-        """Get the 5 slowest endpoints by average response time"""
-        endpoint_averages = {}
-        for endpoint, times in self.endpoint_stats.items():
-            if len(times) >= 3:  # Only consider endpoints with at least 3 requests
-                endpoint_averages[endpoint] = sum(times) / len(times)
-        
-        return sorted(endpoint_averages.items(), key=lambda x: x[1], reverse=True)[:5]
+        """Get the 5 slowest routes by p90 response time, with their percentiles"""
+        # Only consider routes with at least 3 requests
+        return self.endpoint_stats.slowest(5, min_requests=3)
 
 # Global performance monitor
 perf_monitor = PerformanceMonitor()
 
+# Global static asset cache, created by start_server() when enabled
+asset_cache = None
+
+# Every file and directory of the served tree, built by each serving process when enabled
+path_index = None
+
+# Active browser cache profile and per-file ETags
+cache_profile = CACHE_PROFILES['dev']
+etag_store = ETagStore()
+
+# Admission control, configured by start_server()
+rate_limiter = ClientRateLimiter(rate=RATE_LIMIT, burst=RATE_BURST, max_clients=RATE_LIMIT_CLIENTS)
+in_flight = InFlightLimiter(MAX_IN_FLIGHT)
+
+# Service worker version of the served tree (sw-version.json), set by start_server()
+VERSION_ENDPOINT = '/api/version'
+sw_version = None
+
+# Per-profile catalog responses, set by start_server()
+CATALOG_ENDPOINT = '/api/catalog'
+catalog_index = None
+
+# Parsed catalog and profiles, watched for changes; set by start_server()
+CONFIG_VERSION_ENDPOINT = '/api/config/version'
+config_store = None
+config_long_polls = InFlightLimiter(CONFIG_LONG_POLL_MAX)
+
+# Users, scores and play time; opened by open_progress_store() in each serving process
+USERS_ENDPOINT = '/api/users'
+PROGRESS_ENDPOINT = '/api/progress'
+progress_store = None
+
+# Keep-alive connections waiting for their next request (closed first on shutdown)
+idle_connections = set()
+
+def release_idle_clients():
+    """While draining: close idle keep-alive connections and answer waiting long polls"""
+    for connection in list(idle_connections):
+        try:
+            # The handler's blocked read returns EOF and the connection ends cleanly
+            connection.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
+    if config_store is not None:
+        config_store.stop()
+
 class KidsPlayHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # Headers and small bodies are separate writes: with Nagle on, a keep-alive
+    # client's delayed ACK would hold every small JSON response for ~40ms
+    disable_nagle_algorithm = True
+    # Body bytes written for the current request (set by copyfile)
+    _bytes_sent = 0
+    # Cache-Control chosen by send_head for the current response
+    _cache_control = None
+    # Byte range(s) copyfile must send for a 206 response
+    _range_plan = None
+    # Keep-alive settings, configured by start_server()
+    keep_alive_timeout = KEEP_ALIVE_TIMEOUT
+    max_requests_per_connection = KEEP_ALIVE_MAX_REQUESTS
+    # Requests parsed on the current connection
+    _connection_requests = 0
+    # Whether the current request holds a slot of the global in-flight cap
+    _in_flight_slot = False
+    # Seconds the current request spent waiting in a long poll (not counted as latency)
+    _long_poll_wait = 0.0
+    # Whether directories without an index.html get an HTML listing, configured by start_server()
+    directory_listing = DIRECTORY_LISTING
+    
+    def handle(self):
+        """Serve every request on this connection and record how many there were"""
+        perf_monitor.record_connection_open()
+        try:
+            super().handle()
+        finally:
+            perf_monitor.record_connection_closed(self._connection_requests)
+    
+    def handle_one_request(self):
+        # Waiting for the next request on a persistent connection is bounded by
+        # the idle timeout; parse_request lifts it once a request line arrives
+        if self._connection_requests:
+            if self.server.draining:
+                self.close_connection = True
+                return
+            self.connection.settimeout(self.keep_alive_timeout)
+            idle_connections.add(self.connection)
+        try:
+            super().handle_one_request()
+        finally:
+            idle_connections.discard(self.connection)
+    
+    def parse_request(self):
+        idle_connections.discard(self.connection)
+        self.connection.settimeout(None)
+        self._connection_requests += 1
+        return super().parse_request()
+    
+    
     def do_GET(self):
         start_time = time.time()
+        self._bytes_sent = 0
+        self._long_poll_wait = 0.0
         
+        if not self.admit():
+            return
+        try:
+            self.serve_GET(start_time)
+        finally:
+            if self._in_flight_slot:
+                self._in_flight_slot = False
+                in_flight.leave()
+    
+    def do_HEAD(self):
+        # Same admission as GET: HEAD must not be a way around the limits
+        if not self.admit():
+            return
+        try:
+            super().do_HEAD()
+        finally:
+            if self._in_flight_slot:
+                self._in_flight_slot = False
+                in_flight.leave()
+    
+    def serve_GET(self, start_time):
         # Special endpoint for performance stats
         if self.path == '/debug/performance':
             self.send_performance_stats()
             return
         
+        # OpenMetrics scrape endpoint
+        if self.path == '/metrics':
+            self.send_metrics()
+            return
+        
         # Call parent method
         try:
-            super().do_GET()
+            route = urllib.parse.urlsplit(self.path).path
+            if route == VERSION_ENDPOINT:
+                self.send_version()
+            elif route == CATALOG_ENDPOINT:
+                self.send_catalog()
+            elif route == CONFIG_VERSION_ENDPOINT:
+                self.send_config_version()
+            elif route == USERS_ENDPOINT or route.startswith(USERS_ENDPOINT + '/'):
+                self.send_users(route)
+            elif not self.send_config_file(route):
+                super().do_GET()
         except Exception as e:
             perf_monitor.perf_logger.error(f"Error handling GET {self.path}: {e}")
+            # The response may be half-written: never reuse this connection
+            self.close_connection = True
             self.send_error(500, "Internal Server Error")
         finally:
             # Record performance metrics
             end_time = time.time()
-            response_time = end_time - start_time
-            
-            # Get file size if available
-            file_size = 0
-            try:
-                if hasattr(self, 'wfile') and hasattr(self.wfile, 'tell'):
-                    file_size = self.wfile.tell()
-            except:
-                pass
+            response_time = end_time - start_time - self._long_poll_wait
             
             perf_monitor.record_request(
                 'GET', 
                 self.path, 
                 response_time, 
                 getattr(self, '_status_code', 200),
-                file_size
+                self._bytes_sent
             )
     
+    def do_POST(self):
+        start_time = time.time()
+        self._bytes_sent = 0
+        
+        if not self.admit():
+            return
+        try:
+            self.serve_POST(start_time)
+        finally:
+            if self._in_flight_slot:
+                self._in_flight_slot = False
+                in_flight.leave()
+    
+    def serve_POST(self, start_time):
+        route = urllib.parse.urlsplit(self.path).path
+        try:
+            if progress_store is None or route not in (USERS_ENDPOINT, PROGRESS_ENDPOINT):
+                self.close_connection = True
+                self.send_error(404, "Not Found")
+                return
+            payload = self.read_json_body()
+            if payload is None:
+                return
+            try:
+                if route == USERS_ENDPOINT:
+                    self.send_json(200, progress_store.login(payload.get('username')))
+                elif 'updates' in payload:
+                    # Queued by an offline tablet: invalid entries are reported one by one
+                    # (retrying them is pointless), the valid ones are recorded anyway
+                    if not isinstance(payload['updates'], list):
+                        raise ProgressError("updates must be a list of objects")
+                    accepted, rejected = progress_store.record_many(payload['updates'])
+                    self.send_json(202, {
+                        'accepted': accepted,
+                        'rejected': [{'index': index, 'error': error} for index, error in rejected]
+                    })
+                else:
+                    progress_store.record(payload.get('username'), payload.get('game_id'),
+                                          payload.get('score', 0), payload.get('played', 1),
+                                          payload.get('seconds', 0))
+                    self.send_json(202, {'accepted': 1})
+            except ProgressError as e:
+                self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            perf_monitor.perf_logger.error(f"Error handling POST {self.path}: {e}")
+            self.close_connection = True
+            self.send_error(500, "Internal Server Error")
+        finally:
+            perf_monitor.record_request(
+                'POST',
+                self.path,
+                time.time() - start_time,
+                getattr(self, '_status_code', 200),
+                self._bytes_sent
+            )
+    
+    def read_json_body(self):
+        """Parsed JSON object from the request body, or None after sending a 4xx"""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.close_connection = True
+            self.send_error(411, "Content-Length required")
+            return None
+        if length > MAX_POST_BYTES:
+            self.close_connection = True
+            self.send_error(413, "Request body too large")
+            return None
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            self.send_json(400, {'error': 'body must be a JSON object'})
+            return None
+        return payload
+    
+    def send_users(self, route):
+        """All users (most recent first), or one user with per-game scores"""
+        if progress_store is None:
+            self.send_error(404, "Progress API disabled")
+            return
+        self._cache_control = 'no-store'
+        if route == USERS_ENDPOINT:
+            self.send_json(200, {'users': progress_store.list_users()})
+            return
+        name = urllib.parse.unquote(route[len(USERS_ENDPOINT) + 1:])
+        try:
+            user = progress_store.get_user(name, with_scores=True)
+        except ProgressError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        if user is None:
+            self.send_json(404, {'error': f"unknown user: {name}"})
+        else:
+            self.send_json(200, user)
+    
+    def send_json(self, code, document):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self._bytes_sent = len(body)
+    
+    def admit(self):
+        """Admission control: per-client token bucket, then the global in-flight cap.
+        
+        Refused requests get a small 429/503 with Retry-After, are counted in
+        the admission stats and skip request logging, so a flood cannot turn
+        into a flood of log writes. Health checks from this machine are exempt.
+        """
+        client = self.client_address[0]
+        if self.path in HEALTH_PATHS and is_loopback(client):
+            perf_monitor.record_admission('exempt')
+            return True
+        
+        if rate_limiter.enabled:
+            wait, first_refusal = rate_limiter.acquire(client)
+            if wait:
+                perf_monitor.record_admission('throttled')
+                if first_refusal:
+                    perf_monitor.perf_logger.warning(
+                        f"RATE LIMITED: {client} exceeded {rate_limiter.rate:g} req/s (burst {rate_limiter.burst:g})"
+                    )
+                self.send_refusal(429, wait)
+                return False
+        
+        if not in_flight.try_enter():
+            perf_monitor.record_admission('rejected')
+            self.send_refusal(503, 1)
+            return False
+        self._in_flight_slot = True
+        return True
+    
+    def send_refusal(self, code, retry_after):
+        """Minimal 429/503 response, written without going through log_request"""
+        body = f"{code} {self.responses[code][0]}\n".encode('utf-8')
+        # The request body (a POST refused before it was read) would otherwise be
+        # parsed as the next request line on a keep-alive connection
+        if code == 503 or self.command not in ('GET', 'HEAD') or 'Content-Length' in self.headers:
+            self.close_connection = True
+        self.send_response_only(code)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Retry-After', retry_after_header(retry_after))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+    
     def send_performance_stats(self):
         """Send performance statistics as JSON"""
         try:
@@ -195,24 +879,313 @@ class KidsPlayHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             # Add recent slow requests
             stats['recent_slow_requests'] = list(perf_monitor.slow_requests)[-10:]  # Last 10
             
-            response = json.dumps(stats, indent=2)
+            # Serving engine state (mode, worker pool, rejected connections)
+            server_stats = getattr(self.server, 'get_stats', None)
+            if server_stats:
+                stats['server'] = server_stats()
+            
+            if asset_cache is not None:
+                stats['asset_cache'] = asset_cache.get_stats()
+            if path_index is not None:
+                stats['path_index'] = path_index.get_stats()
+            if catalog_index is not None:
+                stats['catalog'] = catalog_index.get_stats()
+            if progress_store is not None:
+                stats['progress'] = progress_store.get_stats()
+            if config_store is not None:
+                stats['config'] = dict(config_store.get_stats(), long_polls=config_long_polls.get_stats())
+            
+            stats['admission'].update(in_flight=in_flight.get_stats())
+            if rate_limiter.enabled:
+                stats['admission'].update(clients=rate_limiter.get_stats())
+            
+            response = json.dumps(stats, indent=2).encode('utf-8')
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
-            self.wfile.write(response.encode('utf-8'))
+            self.wfile.write(response)
             
         except Exception as e:
             perf_monitor.perf_logger.error(f"Error generating performance stats: {e}")
             self.send_error(500, "Error generating stats")
     
+    def send_metrics(self):
+        """Send pre-aggregated metrics in OpenMetrics text format"""
+        try:
+            body = perf_monitor.render_metrics()
+            self.send_response(200)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except Exception as e:
+            perf_monitor.perf_logger.error(f"Error rendering metrics: {e}")
+            self.send_error(500, "Error rendering metrics")
+    
+    def send_version(self):
+        """Service worker version, so clients can check cheaply whether an update exists"""
+        current = sw_version.get() if sw_version is not None else None
+        if current is None:
+            self.send_error(404, "No service worker build in this tree")
+            return
+        body, etag = current
+        self.send_prebuilt(body, etag)
+    
+    def send_catalog(self):
+        """Catalog filtered for ?profile= (add strict=1 to apply age and difficulty too)"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        profile = query.get('profile', [DEFAULT_PROFILE])[0]
+        strict = query.get('strict', ['0'])[0] in ('1', 'true', 'yes')
+        response = catalog_index.get(profile, strict) if catalog_index is not None else None
+        if response is None:
+            self.send_error(404, f"Unknown profile: {profile}")
+            return
+        self.send_prebuilt(response.body, response.etag, response.gzip_body)
+    
+    def send_config_file(self, route):
+        """Serve data/games.json and config/*.json from the validated in-memory snapshot"""
+        snapshot = config_store.snapshot if config_store is not None else None
+        config_file = snapshot.files.get(route) if snapshot is not None else None
+        if config_file is None:
+            return False
+        self.send_prebuilt(config_file.body, config_file.etag, config_file.gzip_body)
+        return True
+    
+    def send_config_version(self):
+        """Config version; with ?since=<version> wait (long poll) until it differs"""
+        if config_store is None or config_store.version is None:
+            self.send_error(404, "No config loaded")
+            return
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        since = query.get('since', [None])[0]
+        version = config_store.version
+        if since == version and config_long_polls.try_enter():
+            waited = time.time()
+            try:
+                version = config_store.wait_for_change(since, CONFIG_LONG_POLL_SECONDS)
+            finally:
+                config_long_polls.leave()
+                self._long_poll_wait = time.time() - waited
+        body = json.dumps({'version': version}).encode('utf-8')
+        self.send_prebuilt(body, f'"{version}"')
+    
+    def send_prebuilt(self, body, etag, gzip_body=None):
+        """Send a JSON body built ahead of time, with its ETag and a 304 when it matches"""
+        self._cache_control = 'no-cache'
+        encoded = gzip_body is not None and \
+            parse_accept_encoding(self.headers.get('Accept-Encoding', '')).get('gzip', 0) > 0
+        if encoded:
+            # Each encoding is a different representation: give it its own strong ETag
+            body, etag = gzip_body, etag[:-1] + '-gzip"'
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            if encoded:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+        if gzip_body is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if self._status_code == 200:
+            self.wfile.write(body)
+            self._bytes_sent = len(body)
+    
+    def send_head(self):
+        """Serve regular files ourselves: asset cache, precompressed variants, ETags and 304s"""
+        entry = None
+        if path_index is not None and path_index.ready:
+            # Missing files, directories and index.html resolved from memory
+            resolved = path_index.resolve(self.path)
+            if resolved.kind == REDIRECT:
+                return self.redirect_to_directory()
+            if resolved.kind == LISTING:
+                return self.list_directory(resolved.directory)
+            if resolved.kind != FILE:
+                self.send_error(404, "File not found")
+                return None
+            entry = resolved.entry
+            path = entry.path
+        else:
+            path = self.translate_path(self.path)
+            if path.endswith('/'):
+                # Directory listings keep the stock behaviour
+                return super().send_head()
+        
+        self._range_plan = None
+        # Byte ranges always refer to the file as stored, so ranged requests skip
+        # the precompressed variants
+        variant = None if 'Range' in self.headers else self.negotiate_variant(path, entry)
+        body = self.open_body(variant[1], variant[3]) if variant else None
+        if body is None:
+            variant = None
+            body = self.open_body(path, self.current_stat(entry))
+            if body is None:
+                # Directory redirects, missing files and errors
+                return super().send_head()
+        source, size, mtime = body
+        
+        etag = etag_store.get(variant[1] if variant else path, size, mtime, source)
+        url = urllib.parse.urlsplit(self.path)
+        self._cache_control = cache_control_for(cache_profile, url.path, url.query)
+        
+        conditional = 'If-None-Match' in self.headers or 'If-Modified-Since' in self.headers
+        if conditional and self.is_not_modified(etag, mtime):
+            source.close()
+            perf_monitor.record_validation(304, conditional)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', self.date_time_string(mtime))
+            if is_compressible(path):
+                self.send_header('Vary', 'Accept-Encoding')
+            self.end_headers()
+            return None
+        
+        ctype = entry.ctype if entry is not None else self.guess_type(path)
+        ranges = None
+        if 'Range' in self.headers and self.if_range_matches(etag, mtime):
+            ranges = parse_range_header(self.headers['Range'], size)
+        if ranges == []:
+            source.close()
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{size}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        if ranges:
+            return self.send_partial(source, ranges, ctype, size, mtime, etag, conditional)
+        perf_monitor.record_validation(200, conditional)
+        
+        self.send_response(200)
+        self.send_header('Content-type', ctype)
+        self.send_header('Accept-Ranges', 'bytes')
+        if variant:
+            encoding, _, original_size, _ = variant
+            self.send_header('Content-Encoding', encoding)
+            if self.command == 'GET':
+                perf_monitor.record_compression(encoding, original_size, size)
+        if is_compressible(path):
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(size))
+        self.send_header('Last-Modified', self.date_time_string(mtime))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return source
+    
+    def negotiate_variant(self, path, entry):
+        """(encoding, variant path, original size, variant stat) of the precompressed sibling to send, or None"""
+        accept_encoding = self.headers.get('Accept-Encoding', '')
+        if entry is None:
+            variant = negotiate(accept_encoding, path)
+            return variant + (None,) if variant else None
+        variant = path_index.negotiate(accept_encoding, entry)
+        if variant is None:
+            return None
+        encoding, variant_entry = variant
+        return encoding, variant_entry.path, entry.stat.st_size, self.current_stat(variant_entry)
+    
+    @staticmethod
+    def current_stat(entry):
+        """The index's stat of entry when it is up to date (inotify); None makes the cache stat the file"""
+        if entry is None or not path_index.stats_current:
+            return None
+        return entry.stat
+    
+    def redirect_to_directory(self):
+        """301 to the URL with a trailing slash, as SimpleHTTPRequestHandler does for directories"""
+        parts = urllib.parse.urlsplit(self.path)
+        self.send_response(301)
+        self.send_header('Location', urllib.parse.urlunsplit(parts._replace(path=parts.path + '/')))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return None
+    
+    def list_directory(self, path):
+        if not self.directory_listing:
+            self.send_error(404, "File not found")
+            return None
+        return super().list_directory(path)
+    
+    def send_partial(self, source, ranges, ctype, size, mtime, etag, conditional):
+        """Send 206 headers for one range or a multipart/byteranges body"""
+        perf_monitor.record_validation(206, conditional)
+        self.send_response(206)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self._range_plan = ranges[0]
+            self.send_header('Content-type', ctype)
+            self.send_header('Content-Range', content_range(start, end, size))
+            self.send_header('Content-Length', str(end - start + 1))
+        else:
+            self._range_plan = MultipartRanges(ranges, ctype, size)
+            self.send_header('Content-type', self._range_plan.content_type)
+            self.send_header('Content-Length', str(self._range_plan.content_length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Last-Modified', self.date_time_string(mtime))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return source
+    
+    def if_range_matches(self, etag, mtime):
+        """If-Range: honour the Range only if the client's copy is still current"""
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # Strong comparison: weak validators never match
+            return if_range == etag
+        return if_range == self.date_time_string(mtime)
+    
+    def is_not_modified(self, etag, mtime):
+        """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        return not_modified_since(self.headers.get('If-Modified-Since'), mtime)
+    
+    def open_body(self, path, st=None):
+        """Return (file object, size, mtime) for a regular file, or None.
+        
+        ``st`` is the file's stat from the path index: a cached file is then
+        served without touching the filesystem.
+        """
+        if asset_cache is not None:
+            asset = asset_cache.get(path, st)
+            if asset is not None:
+                return io.BytesIO(asset.data), asset.size, asset.mtime
+        
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            fs = os.fstat(f.fileno())
+        except OSError:
+            f.close()
+            return None
+        if not stat.S_ISREG(fs.st_mode):
+            f.close()
+            return None
+        return f, fs.st_size, fs.st_mtime
+    
     def log_message(self, format, *args):
         """Override to reduce console spam and use our logger"""
         # Ignore flutter_service_worker.js 404s (browser auto-requests this for PWAs)
         if 'flutter_service_worker.js' in str(args[0]):
             return
         
+        # Idle keep-alive connections timing out are expected, not errors
+        if len(args) < 2:
+            if not format.startswith('Request timed out'):
+                perf_monitor.perf_logger.warning(format % args)
+            return
+        
         # Only log errors to console, everything else goes to file
         if "40" in str(args[1]) or "50" in str(args[1]):  # 4xx or 5xx status codes
             perf_monitor.perf_logger.warning(format % args)
@@ -223,10 +1196,23 @@ class KidsPlayHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         self.send_header('Cross-Origin-Embedder-Policy', 'cross-origin')
         self.send_header('Cross-Origin-Opener-Policy', 'same-origin')
-        # Force no cache for development - clear all browser cache
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        # Cache policy from the active profile (dev forces no cache at all)
+        cache_control = self._cache_control or cache_profile.default
+        self._cache_control = None
+        self.send_header('Cache-Control', cache_control)
+        if cache_profile.legacy_no_cache:
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Expires', '0')
+        
+        # Persistent connections: advertise the limits, or close at the last request
+        if self.protocol_version >= 'HTTP/1.1' and not self.close_connection:
+            remaining = self.max_requests_per_connection - self._connection_requests
+            if remaining <= 0 or self.server.draining:
+                self.send_header('Connection', 'close')
+            else:
+                if self.request_version == 'HTTP/1.0':
+                    self.send_header('Connection', 'keep-alive')
+                self.send_header('Keep-Alive', f"timeout={self.keep_alive_timeout:g}, max={remaining}")
         super().end_headers()
     
     def send_response(self, code, message=None):
@@ -235,96 +1221,456 @@ class KidsPlayHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         super().send_response(code, message)
     
     def copyfile(self, source, outputfile):
-        """Override copyfile to handle connection errors gracefully and monitor transfer speed"""
+        """Send the response body with sendfile where possible and check the transfer speed once"""
         start_time = time.time()
-        bytes_transferred = 0
+        range_plan, self._range_plan = self._range_plan, None
         
         try:
-            # Monitor file transfer in chunks
-            chunk_size = 8192
-            while True:
-                chunk = source.read(chunk_size)
-                if not chunk:
-                    break
-                outputfile.write(chunk)
-                bytes_transferred += len(chunk)
-                
-                # Check for slow transfers (< 100KB/s)
-                elapsed = time.time() - start_time
-                if elapsed > 1 and bytes_transferred / elapsed < 100000:  # Less than 100KB/s
-                    perf_monitor.perf_logger.warning(
-                        f"SLOW TRANSFER: {self.path} - {bytes_transferred/1024:.1f}KB in {elapsed:.1f}s "
-                        f"({bytes_transferred/elapsed/1024:.1f}KB/s)"
-                    )
-                    
+            if range_plan is None:
+                self._bytes_sent += send_body(source, self.connection, outputfile)
+            else:
+                self.copy_ranges(source, outputfile, range_plan)
         except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError) as e:
             # Client disconnected, log but don't crash
+            self._bytes_sent += getattr(e, 'bytes_sent', 0)
+            self.close_connection = True
             perf_monitor.perf_logger.info(f"Client disconnected during transfer of {self.path}: {e}")
         except Exception as e:
+            self._bytes_sent += getattr(e, 'bytes_sent', 0)
             perf_monitor.perf_logger.error(f"File transfer error for {self.path}: {e}")
             raise
+        finally:
+            # Check for slow transfers (< 100KB/s)
+            elapsed = time.time() - start_time
+            if elapsed > 1 and self._bytes_sent / elapsed < 100000:
+                perf_monitor.perf_logger.warning(
+                    f"SLOW TRANSFER: {self.path} - {self._bytes_sent/1024:.1f}KB in {elapsed:.1f}s "
+                    f"({self._bytes_sent/elapsed/1024:.1f}KB/s)"
+                )
+
+    def copy_ranges(self, source, outputfile, range_plan):
+        """Send a single (start, end) range or every part of a MultipartRanges body"""
+        if isinstance(range_plan, tuple):
+            parts, trailer = [(b'', range_plan[0], range_plan[1])], b''
+        else:
+            parts, trailer = range_plan.parts, range_plan.trailer
+        for header, start, end in parts:
+            if header:
+                outputfile.write(header)
+                self._bytes_sent += len(header)
+            source.seek(start)
+            self._bytes_sent += send_body(source, self.connection, outputfile, count=end - start + 1)
+        if trailer:
+            outputfile.write(trailer)
+            self._bytes_sent += len(trailer)
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="KidsPlay Web Arcade server")
+    parser.add_argument('--port', type=int, default=PORT, help="TCP port to listen on")
+    parser.add_argument('--mode', choices=SERVER_MODES, default=SERVER_MODE,
+                        help="serving engine: single (one request at a time), threads (bounded worker pool) "
+                             "or asyncio (event-loop accept with bounded executor)")
+    parser.add_argument('--root', default=FRONTEND_ROOT,
+                        help="directory to serve, e.g. dist/ from build_frontend.py (default: src/frontend)")
+    parser.add_argument('--config-dir', default=CONFIG_DIR,
+                        help="directory of profile JSON files overriding the served config/ by name")
+    parser.add_argument('--progress-db', default=PROGRESS_DB,
+                        help="SQLite file for users, scores and play time ('' disables /api/users and /api/progress)")
+    parser.add_argument('--progress-flush-seconds', type=float, default=PROGRESS_FLUSH_SECONDS,
+                        help="longest time a score update waits in memory before the batched commit")
+    parser.add_argument('--processes', type=int, default=PROCESSES,
+                        help="pre-fork this many worker processes sharing the port (SO_REUSEPORT, POSIX only)")
+    parser.add_argument('--fast-start', action=argparse.BooleanOptionalAction, default=FAST_START,
+                        help="serve first and initialize monitoring (resource sampling, asset cache warm-up, "
+                             "route scan) in the background; pre-fork mode always initializes before forking")
+    parser.add_argument('--drain-timeout', type=float, default=DRAIN_TIMEOUT,
+                        help="on SIGTERM/SIGINT, seconds to let requests in flight finish before exiting")
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS,
+                        help="worker threads handling requests concurrently")
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help="connections allowed to wait for a worker before new ones get 503")
+    parser.add_argument('--asset-cache-mb', type=float, default=ASSET_CACHE_MB,
+                        help="size of the in-memory static file cache in MB (0 disables it)")
+    parser.add_argument('--asset-cache-max-file-kb', type=int, default=ASSET_CACHE_MAX_FILE_KB,
+                        help="files bigger than this are always streamed from disk")
+    parser.add_argument('--path-index', action=argparse.BooleanOptionalAction, default=PATH_INDEX,
+                        help="keep an in-memory index of the served tree (kept in sync with inotify or polling): "
+                             "URLs, index.html and 404s resolved without filesystem calls")
+    parser.add_argument('--path-index-poll-seconds', type=float, default=PATH_INDEX_POLL_SECONDS,
+                        help="without inotify: how often the path index checks directories for changes")
+    parser.add_argument('--directory-listing', action=argparse.BooleanOptionalAction, default=DIRECTORY_LISTING,
+                        help="list the contents of directories without an index.html (off: 404)")
+    parser.add_argument('--keep-alive', action=argparse.BooleanOptionalAction, default=KEEP_ALIVE,
+                        help="speak HTTP/1.1 with persistent connections")
+    parser.add_argument('--keep-alive-timeout', type=float, default=KEEP_ALIVE_TIMEOUT,
+                        help="seconds an idle persistent connection is kept open")
+    parser.add_argument('--keep-alive-max-requests', type=int, default=KEEP_ALIVE_MAX_REQUESTS,
+                        help="requests served on one connection before it is closed")
+    parser.add_argument('--log-dir', default=LOG_DIR,
+                        help="directory of server_performance.log and its rotated files (default: logs/)")
+    parser.add_argument('--log-sample-rate', type=float, default=LOG_SAMPLE_RATE,
+                        help="fraction of normal requests written to the performance log "
+                             "(slow requests and errors are always logged)")
+    parser.add_argument('--log-max-mb', type=float, default=LOG_MAX_MB,
+                        help="rotate the performance log when it reaches this size (0 = no size limit)")
+    parser.add_argument('--log-rotate-when', choices=ROTATE_WHEN, default=LOG_ROTATE_WHEN,
+                        help="also rotate the performance log every hour or day")
+    parser.add_argument('--log-backup-count', type=int, default=LOG_BACKUP_COUNT,
+                        help="rotated log files to keep")
+    parser.add_argument('--log-compress', action=argparse.BooleanOptionalAction, default=LOG_COMPRESS,
+                        help="gzip rotated log files")
+    parser.add_argument('--rate-limit', type=float, default=RATE_LIMIT,
+                        help="requests per second allowed per client IP (default 0: no rate limiting)")
+    parser.add_argument('--rate-burst', type=int, default=RATE_BURST,
+                        help="requests a client may send in a burst before being limited")
+    parser.add_argument('--max-in-flight', type=int, default=MAX_IN_FLIGHT,
+                        help="requests processed at once before new ones get 503 (0 = no extra cap)")
+    parser.add_argument('--resource-sampling', action=argparse.BooleanOptionalAction, default=RESOURCE_SAMPLING,
+                        help="sample process/system resources in the background")
+    parser.add_argument('--resource-interval', type=float, default=RESOURCE_INTERVAL,
+                        help="seconds between resource samples while serving requests")
+    parser.add_argument('--resource-max-interval', type=float, default=RESOURCE_MAX_INTERVAL,
+                        help="longest interval the sampler backs off to while idle")
+    parser.add_argument('--cache-profile', choices=sorted(CACHE_PROFILES), default=CACHE_PROFILE,
+                        help="browser caching: dev (no-store everywhere) or production "
+                             "(ETag/304 revalidation, 1 year for versioned assets)")
+    return parser
 
-def start_server():
-    # Change to frontend directory to serve files from there
-    frontend_dir = os.path.join(os.path.dirname(__file__), '..', 'frontend')
+def guess_type(path):
+    """Content-Type the handler sends for path (extensions_map is a class attribute)"""
+    return KidsPlayHTTPRequestHandler.guess_type(KidsPlayHTTPRequestHandler, path)
+
+def start_path_index():
+    """Build the path index in the background: requests use the filesystem until it is ready"""
+    if path_index is not None:
+        path_index.start()
+
+def setup_asset_cache(options, root):
+    """Create the global asset cache and preload the files every game needs"""
+    global asset_cache
+    if options.asset_cache_mb <= 0:
+        asset_cache = None
+        return None
+    asset_cache = AssetCache(
+        max_bytes=int(options.asset_cache_mb * 1024 * 1024),
+        max_file_size=options.asset_cache_max_file_kb * 1024
+    )
+    loaded = asset_cache.warm(root)
+    perf_monitor.perf_logger.info(
+        f"Asset cache: {options.asset_cache_mb:g}MB, {loaded} files preloaded "
+        f"({asset_cache.current_bytes / 1024:.0f}KB)"
+    )
+    return asset_cache
+
+def configure_keep_alive(options):
+    """Switch the handler between HTTP/1.0 and persistent HTTP/1.1 connections"""
+    handler = KidsPlayHTTPRequestHandler
+    handler.protocol_version = 'HTTP/1.1' if options.keep_alive else 'HTTP/1.0'
+    handler.keep_alive_timeout = options.keep_alive_timeout
+    handler.max_requests_per_connection = max(1, options.keep_alive_max_requests)
+    if options.keep_alive:
+        perf_monitor.perf_logger.info(
+            f"Keep-alive: idle timeout {options.keep_alive_timeout:g}s, "
+            f"max {handler.max_requests_per_connection} requests per connection"
+        )
+
+def configure_admission(options):
+    """Per-client rate limiting and the global in-flight cap"""
+    global rate_limiter, in_flight
+    rate_limiter = ClientRateLimiter(rate=max(0.0, options.rate_limit), burst=max(1, options.rate_burst),
+                                     max_clients=RATE_LIMIT_CLIENTS)
+    in_flight = InFlightLimiter(max(0, options.max_in_flight))
+    if rate_limiter.enabled:
+        perf_monitor.perf_logger.info(
+            f"Rate limit: {rate_limiter.rate:g} req/s per client (burst {rate_limiter.burst:g})"
+        )
+    if in_flight.limit:
+        perf_monitor.perf_logger.info(f"Max requests in flight: {in_flight.limit}")
+
+def start_server(options=None):
+    global cache_profile, sw_version, catalog_index, config_store, path_index
+    if options is None:
+        options = build_arg_parser().parse_args([])
+    
+    prefork = options.processes > 1 and prefork_supported()
+    
+    perf_monitor.setup_logging(
+        sample_rate=options.log_sample_rate,
+        max_bytes=int(options.log_max_mb * 1024 * 1024),
+        rotate_when=options.log_rotate_when,
+        backup_count=options.log_backup_count,
+        compress=options.log_compress,
+        shared=prefork,
+        log_dir=os.path.abspath(options.log_dir)
+    )
+    
+    config_dir = os.path.abspath(options.config_dir) if options.config_dir else None
+    if options.progress_db:
+        options.progress_db = os.path.abspath(options.progress_db)
+    # Change to frontend directory (or a production build of it) to serve files from there
+    frontend_dir = os.path.abspath(options.root) if options.root else \
+        os.path.join(os.path.dirname(__file__), '..', 'frontend')
     os.chdir(frontend_dir)
     
     # Log server startup
     perf_monitor.perf_logger.info("KidsPlay server starting up...")
     perf_monitor.perf_logger.info(f"Serving from: {os.getcwd()}")
-    perf_monitor.perf_logger.info(f"System RAM: {psutil.virtual_memory().total / (1024**3):.1f}GB")
-    perf_monitor.perf_logger.info(f"CPU cores: {psutil.cpu_count()}")
+    sw_version = VersionInfo(os.getcwd())
+    config_store = ConfigStore(os.getcwd(), profile_dir=config_dir, logger=perf_monitor.perf_logger)
+    catalog_index = CatalogIndex(config_store)
+    path_index = PathIndex(os.getcwd(), guess_type, poll_interval=max(0.5, options.path_index_poll_seconds),
+                           logger=perf_monitor.perf_logger) if options.path_index else None
+    KidsPlayHTTPRequestHandler.directory_listing = options.directory_listing
+    if not options.directory_listing:
+        perf_monitor.perf_logger.info("Directory listings disabled")
+    cache_profile = CACHE_PROFILES[options.cache_profile]
+    perf_monitor.perf_logger.info(f"Cache profile: {cache_profile.name}")
+    configure_keep_alive(options)
+    configure_admission(options)
+    perf_monitor.perf_logger.info(
+        f"Server mode: {options.mode} (workers: {options.max_workers}, queue depth: {options.queue_depth})"
+    )
+    if options.processes > 1 and not prefork:
+        perf_monitor.perf_logger.warning("Pre-fork mode needs os.fork and SO_REUSEPORT: running a single process")
+    # Pre-fork workers inherit the warm asset cache, so it is filled before forking
+    fast_start = options.fast_start and not prefork
+    if not fast_start:
+        initialize_monitoring(options, sample_resources=not prefork)
     
-    with socketserver.TCPServer(("", PORT), KidsPlayHTTPRequestHandler) as httpd:
-        print(f"🎮 KidsPlay server running at http://localhost:{PORT}")
-        print("📱 Access via mobile: http://[your-ip]:" + str(PORT))
-        print("🔧 For gamepad testing, use Chrome or Edge")
-        print("📊 Performance stats: http://localhost:" + str(PORT) + "/debug/performance")
-        print("📋 Performance logs: logs/server_performance.log")
-        print("⏹️  Press Ctrl+C to stop server")
-        
-        # Start periodic stats reporting
-        def report_stats():
-            while True:
-                time.sleep(300)  # Report every 5 minutes
-                try:
-                    stats = perf_monitor.get_stats()
-                    perf_monitor.perf_logger.info(
-                        f"STATS - Uptime: {stats['uptime_seconds']/3600:.1f}h | "
-                        f"Requests: {stats['total_requests']} | "
-                        f"Avg Response: {stats['avg_response_time_ms']:.1f}ms | "
-                        f"CPU: {stats['current_cpu_percent']:.1f}% | "
-                        f"RAM: {stats['current_memory_percent']:.1f}% | "
-                        f"Slow requests: {stats['slow_requests_count']}"
-                    )
-                except Exception as e:
-                    perf_monitor.perf_logger.error(f"Stats reporting error: {e}")
-        
-        threading.Thread(target=report_stats, daemon=True).start()
+    # Listening socket from systemd socket activation or from the server being replaced
+    listener, listener_source = inherited_listener()
+    if listener is not None:
+        options.port = listener.getsockname()[1]
+        perf_monitor.perf_logger.info(f"Listening socket inherited ({listener_source}), port {options.port}")
+    
+    if prefork:
+        serve_prefork(options, listener)
+        return
+    
+    port = options.port
+    with create_server(options.mode, ("", port), KidsPlayHTTPRequestHandler,
+                       options.max_workers, options.queue_depth, listener=listener) as httpd:
+        print_banner(options)
+        start_stats_reporter()
         
         # Note: Browser opening is handled by the launcher script
         # If running server directly, uncomment the lines below:
         # def open_browser():
         #     time.sleep(1)
-        #     webbrowser.open(f'http://localhost:{PORT}')
+        #     import webbrowser
+        #     webbrowser.open(f'http://localhost:{port}')
         # threading.Thread(target=open_browser).start()
         
+        lifecycle = GracefulShutdown(httpd, options.drain_timeout, close_idle=release_idle_clients,
+                                     on_reload=lambda: spawn_successor(httpd.socket),
+                                     on_abort=abort_serving, logger=perf_monitor.perf_logger).install()
+        config_store.start()
+        start_path_index()
+        open_progress_store(options)
+        perf_monitor.perf_logger.info("Server started successfully")
+        notify_ready()
+        if fast_start:
+            threading.Thread(target=initialize_monitoring, args=(options,), name='kidsplay-init',
+                             daemon=True).start()
+        httpd.serve_forever()
+        
+        print(f"\n🛑 Server stopping ({lifecycle.stop_signal}), finishing requests in flight...")
+        drained = finish_serving(lifecycle)
+    if drained is None:
+        # Stuck requests must not keep the process alive (executor threads are joined at exit)
+        os._exit(1)
+
+def initialize_monitoring(options, sample_resources=True):
+    """Everything a first request can do without: resource sampling, system info,
+    asset cache warm-up and the route scan (until then routes fold into generic templates)"""
+    started = time.perf_counter()
+    # The pre-fork supervisor leaves sampling to the workers: it must not run threads
+    if sample_resources:
+        perf_monitor.setup_resources(
+            enabled=options.resource_sampling,
+            interval=options.resource_interval,
+            max_interval=options.resource_max_interval
+        )
+    import psutil
+    perf_monitor.perf_logger.info(f"System RAM: {psutil.virtual_memory().total / (1024**3):.1f}GB")
+    perf_monitor.perf_logger.info(f"CPU cores: {psutil.cpu_count()}")
+    setup_asset_cache(options, os.getcwd())
+    perf_monitor.route_normalizer = RouteNormalizer(os.getcwd())
+    perf_monitor.perf_logger.info(f"Monitoring initialized in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+def abort_serving():
+    """Drain deadline passed with the accept loop still inside a request: keep the logs, then exit"""
+    perf_monitor.perf_logger.warning("DRAIN TIMEOUT: server still busy with a request, exiting anyway")
+    close_progress_store()
+    perf_monitor.shutdown_logging()
+
+def finish_serving(lifecycle):
+    """After serve_forever returned: drain, then flush the stores and the logs"""
+    perf_monitor.perf_logger.info(f"Server shutdown requested ({lifecycle.stop_signal}), draining")
+    drained = lifecycle.drain()
+    if drained is None:
+        perf_monitor.perf_logger.warning(
+            f"DRAIN TIMEOUT: requests still in flight after {lifecycle.drain_timeout:g}s, exiting anyway"
+        )
+    else:
+        perf_monitor.perf_logger.info(f"Drained in {drained:.2f}s")
+    log_final_stats()
+    config_store.stop()
+    if path_index is not None:
+        path_index.stop()
+    close_progress_store()
+    
+    # Write out whatever the log pipeline still has queued
+    if perf_monitor.resources is not None:
+        perf_monitor.resources.stop()
+    perf_monitor.shutdown_logging()
+    return drained
+
+def open_progress_store(options):
+    """Open the progress database in the serving process (after fork: SQLite handles must not be inherited)"""
+    global progress_store
+    if not options.progress_db:
+        return
+    try:
+        progress_store = ProgressStore(options.progress_db, flush_interval=options.progress_flush_seconds,
+                                       logger=perf_monitor.perf_logger)
+    except (OSError, sqlite3.Error) as e:
+        perf_monitor.perf_logger.error(f"Progress API disabled, cannot open {options.progress_db}: {e}")
+        return
+    perf_monitor.perf_logger.info(f"Progress database: {options.progress_db} (WAL)")
+
+def close_progress_store():
+    """Commit pending score updates and close the database"""
+    global progress_store
+    store, progress_store = progress_store, None
+    if store is not None:
+        store.close()
+
+def serve_prefork(options, listener=None):
+    """Supervisor side of pre-fork mode: fork the workers, restart them, report cluster stats"""
+    shared = SharedStats(options.processes)
+    perf_monitor.cluster = shared
+    
+    def run_worker(slot):
+        perf_monitor.attach_worker(slot)
+        perf_monitor.setup_resources(
+            enabled=options.resource_sampling,
+            interval=options.resource_interval,
+            max_interval=options.resource_max_interval
+        )
         try:
-            perf_monitor.perf_logger.info("Server started successfully")
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\n🛑 Server stopped by user")
-            perf_monitor.perf_logger.info("Server shutdown requested by user")
-            
-            # Log final stats
-            final_stats = perf_monitor.get_stats()
-            perf_monitor.perf_logger.info(
-                f"FINAL STATS - Runtime: {final_stats['uptime_seconds']/3600:.1f}h | "
-                f"Total requests: {final_stats['total_requests']} | "
-                f"Slow requests: {final_stats['slow_requests_count']}"
-            )
-            
-            httpd.shutdown()
+            # An inherited socket is shared by all workers; otherwise each binds its own
+            with create_server(options.mode, ("", options.port), KidsPlayHTTPRequestHandler,
+                               options.max_workers, options.queue_depth, reuse_port=listener is None,
+                               listener=listener) as httpd:
+                lifecycle = GracefulShutdown(httpd, options.drain_timeout, close_idle=release_idle_clients)
+                lifecycle.install(signals=(signal.SIGTERM,))
+                config_store.start()
+                start_path_index()
+                open_progress_store(options)
+                if slot.index == 0:
+                    notify_ready(main_pid=os.getppid())
+                httpd.serve_forever()
+                if lifecycle.drain() is None:
+                    perf_monitor.perf_logger.warning(
+                        f"DRAIN TIMEOUT: worker {slot.index} exits with requests in flight"
+                    )
+        finally:
+            config_store.stop()
+            if path_index is not None:
+                path_index.stop()
+            close_progress_store()
+            if perf_monitor.resources is not None:
+                perf_monitor.resources.stop()
+            perf_monitor.detach_worker()
+    
+    # Everything the supervisor does between forks runs on its main loop: a thread
+    # (log writer, stats reporter, resource sampler) could hold a lock at fork time
+    # and leave it held forever in the child
+    writer = perf_monitor.log_writer
+    next_flush = next_report = time.monotonic()
+    
+    def supervisor_tick():
+        nonlocal next_flush, next_report
+        now = time.monotonic()
+        if now >= next_flush:
+            writer.write_pending()
+            next_flush = now + writer.flush_interval
+        if now >= next_report + STATS_REPORT_SECONDS:
+            next_report = now
+            log_stats()
+    
+    print_banner(options)
+    perf_monitor.perf_logger.info(f"Pre-fork mode: {options.processes} worker processes "
+                                  f"({'shared inherited socket' if listener else 'SO_REUSEPORT'})")
+    supervisor = Supervisor(options.processes, run_worker, shared, perf_monitor.perf_logger,
+                            stop_timeout=options.drain_timeout + 5,
+                            on_reload=lambda: spawn_successor(listener),
+                            # Workers restarted later must not signal the replaced server again
+                            on_started=forget_parent, on_tick=supervisor_tick)
+    supervisor.run()
+    
+    print("\n🛑 Server stopped")
+    perf_monitor.perf_logger.info("Server shutdown requested")
+    log_final_stats()
+    if perf_monitor.resources is not None:
+        perf_monitor.resources.stop()
+    perf_monitor.shutdown_logging()
+
+def print_banner(options):
+    port = options.port
+    print(f"🎮 KidsPlay server running at http://localhost:{port}")
+    print("📱 Access via mobile: http://[your-ip]:" + str(port))
+    print("🔧 For gamepad testing, use Chrome or Edge")
+    if options.processes > 1:
+        print(f"⚙️  Server mode: {options.mode} ({options.processes} processes x {options.max_workers} workers)")
+    else:
+        print(f"⚙️  Server mode: {options.mode} ({options.max_workers} workers)")
+    print("📊 Performance stats: http://localhost:" + str(port) + "/debug/performance")
+    print("📋 Performance logs: logs/server_performance.log")
+    print("⏹️  Press Ctrl+C to stop server")
+    if hasattr(signal, 'SIGHUP'):
+        print(f"🔄 Reload without downtime: kill -HUP {os.getpid()}")
+
+def log_stats():
+    """Log one STATS line"""
+    try:
+        stats = perf_monitor.get_stats()
+        perf_monitor.perf_logger.info(
+            f"STATS - Uptime: {stats['uptime_seconds']/3600:.1f}h | "
+            f"Requests: {stats['total_requests']} | "
+            f"Avg Response: {stats['avg_response_time_ms']:.1f}ms | "
+            f"CPU: {stats['current_cpu_percent']:.1f}% | "
+            f"RAM: {stats['current_memory_percent']:.1f}% | "
+            f"Slow requests: {stats['slow_requests_count']}"
+        )
+    except Exception as e:
+        perf_monitor.perf_logger.error(f"Stats reporting error: {e}")
+
+def start_stats_reporter():
+    """Log a STATS line every 5 minutes"""
+    def report_stats():
+        while True:
+            time.sleep(STATS_REPORT_SECONDS)
+            log_stats()
+    
+    threading.Thread(target=report_stats, daemon=True).start()
+
+def log_final_stats():
+    final_stats = perf_monitor.get_stats()
+    perf_monitor.perf_logger.info(
+        f"FINAL STATS - Runtime: {final_stats['uptime_seconds']/3600:.1f}h | "
+        f"Total requests: {final_stats['total_requests']} | "
+        f"Slow requests: {final_stats['slow_requests_count']}"
+    )
+
+def fix_console_encoding():
+    """Fix Unicode encoding issues on Windows"""
+    if sys.platform == 'win32':
+        import codecs
+        sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
+        sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
 
 if __name__ == "__main__":
-    start_server()
+    fix_console_encoding()
+    start_server(build_arg_parser().parse_args())
@@ -0,0 +1,334 @@
+"""
+service_worker.py - Versioned precache service worker for the KidsPlay frontend.
+
+Reads dist/build-manifest.json (or, for a plain tree, hashes the files
+itself) plus data/games.json and writes:
+
+  sw.js            the service worker, with the app shell list and one file
+                   list per game, every entry tagged with its content hash
+  sw-version.json  {"version": ...} served by the server at /api/version
+
+The app shell is cached at install, a game's files the first time it is
+opened; from then on both start from the cache with the Wi-Fi off. A new
+version downloads only entries whose content hash changed.
+
+    python src/backend/service_worker.py               # dist/ (build_frontend.py runs it too)
+    python src/backend/service_worker.py /srv/kidsplay # any served tree, hashed file by file
+
+Not meant for src/frontend: there sw.js is the kill switch that clears the
+caches of old service workers during development.
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import threading
+import time
+
+import precompress
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.normpath(os.path.join(BACKEND_DIR, '..', '..', 'dist'))
+
+SW_FILE = 'sw.js'
+VERSION_FILE = 'sw-version.json'
+BUILD_MANIFEST = 'build-manifest.json'
+
+# Never precached: the worker itself, build metadata, the debug dashboard
+EXCLUDED = {SW_FILE, VERSION_FILE, BUILD_MANIFEST, '.build-cache.json'}
+EXCLUDED_DIRS = ('debug/',)
+NOT_SHIPPED_EXTENSIONS = {'.md', '.py', '.tmp'}
+
+SW_TEMPLATE = r"""// KidsPlay precache Service Worker - generated by src/backend/service_worker.py, do not edit.
+// Version __VERSION__ (__BUILT_AT__)
+const VERSION = '__VERSION__';
+const FILES_CACHE = 'kidsplay-files';
+const META_CACHE = 'kidsplay-meta';
+const INSTALLED_KEY = '/__sw/installed-games';
+// Hot-reloaded by the server: network first, the cached copy only offline
+const NETWORK_FIRST = ['/config/', '/data/'];
+
+// [url, content hash]
+const SHELL = __SHELL__;
+// game id -> {page, files: [[url, content hash], ...]}
+const GAMES = __GAMES__;
+
+const REVISIONS = new Map();
+SHELL.forEach(([url, rev]) => REVISIONS.set(url, rev));
+Object.values(GAMES).forEach((game) => game.files.forEach(([url, rev]) => REVISIONS.set(url, rev)));
+const GAME_BY_PAGE = new Map(Object.entries(GAMES).map(([id, game]) => [game.page, id]));
+
+const cacheKey = (url, rev) => `${url}?__rev=${rev}`;
+
+async function installedGames() {
+    const meta = await caches.open(META_CACHE);
+    const response = await meta.match(INSTALLED_KEY);
+    return response ? response.json() : [];
+}
+
+async function rememberGame(id) {
+    const games = await installedGames();
+    if (!games.includes(id)) {
+        games.push(id);
+        const meta = await caches.open(META_CACHE);
+        await meta.put(INSTALLED_KEY, new Response(JSON.stringify(games)));
+    }
+}
+
+// Download only the entries whose content hash is not cached yet
+async function precache(entries) {
+    const cache = await caches.open(FILES_CACHE);
+    await Promise.all(entries.map(async ([url, rev]) => {
+        const key = cacheKey(url, rev);
+        if (await cache.match(key)) {
+            return;
+        }
+        const response = await fetch(url, { cache: 'reload' });
+        if (!response.ok) {
+            throw new Error(`${url}: ${response.status}`);
+        }
+        await cache.put(key, response);
+    }));
+}
+
+function wantedEntries(games) {
+    const entries = [...SHELL];
+    games.filter((id) => GAMES[id]).forEach((id) => entries.push(...GAMES[id].files));
+    return entries;
+}
+
+async function installGame(id) {
+    await precache(GAMES[id].files);
+    await rememberGame(id);
+}
+
+self.addEventListener('install', (event) => {
+    event.waitUntil((async () => {
+        await precache(wantedEntries(await installedGames()));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        // Drop caches of older service workers and entries this version no longer lists
+        const names = await caches.keys();
+        await Promise.all(names.filter((name) => name !== FILES_CACHE && name !== META_CACHE)
+            .map((name) => caches.delete(name)));
+        const wanted = new Set(wantedEntries(await installedGames())
+            .map(([url, rev]) => new URL(cacheKey(url, rev), self.location).href));
+        const cache = await caches.open(FILES_CACHE);
+        const keys = await cache.keys();
+        await Promise.all(keys.filter((request) => !wanted.has(request.url))
+            .map((request) => cache.delete(request)));
+        await self.clients.claim();
+    })());
+});
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    const path = url.pathname === '/' ? '/index.html' : url.pathname;
+    const rev = REVISIONS.get(path);
+    if (!rev) {
+        return;
+    }
+    const gameId = GAME_BY_PAGE.get(path);
+    if (gameId) {
+        // First launch of a game: cache all of its files for the next (offline) one
+        event.waitUntil(installGame(gameId).catch(() => {}));
+    }
+    if (NETWORK_FIRST.some((prefix) => path.startsWith(prefix))) {
+        event.respondWith((async () => {
+            const cache = await caches.open(FILES_CACHE);
+            try {
+                const response = await fetch(request);
+                if (response.ok) {
+                    await cache.put(cacheKey(path, rev), response.clone());
+                }
+                return response;
+            } catch (error) {
+                return (await cache.match(cacheKey(path, rev))) || Response.error();
+            }
+        })());
+        return;
+    }
+    event.respondWith((async () => {
+        const cache = await caches.open(FILES_CACHE);
+        const cached = await cache.match(cacheKey(path, rev));
+        if (cached) {
+            return cached;
+        }
+        const response = await fetch(request);
+        if (response.ok && !url.search) {
+            await cache.put(cacheKey(path, rev), response.clone());
+        }
+        return response;
+    })());
+});
+
+self.addEventListener('message', (event) => {
+    if (event.data && event.data.type === 'version') {
+        event.source.postMessage({ type: 'version', version: VERSION });
+    }
+});
+"""
+
+
+def url_for(rel):
+    return '/' + rel
+
+
+def shippable(rel):
+    name = posixpath.basename(rel)
+    return (rel not in EXCLUDED and not rel.startswith(EXCLUDED_DIRS) and not name.startswith('.')
+            and posixpath.splitext(name)[1].lower() not in NOT_SHIPPED_EXTENSIONS
+            and not name.endswith(precompress.VARIANT_SUFFIXES))
+
+
+def file_hashes(root):
+    """{relative output path: content hash}, from the build manifest when there is one"""
+    manifest_path = os.path.join(root, BUILD_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {entry['output']: entry['hash'] for entry in manifest['files'].values() if shippable(entry['output'])}
+
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, '/')
+            if not shippable(rel) or os.path.getsize(path) == 0:
+                continue
+            with open(path, 'rb') as f:
+                hashes[rel] = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    return hashes
+
+
+def precache_lists(root):
+    """(shell entries, {game id: {'page', 'files'}}) with entries as [url, short hash]"""
+    hashes = file_hashes(root)
+    with open(os.path.join(root, 'data', 'games.json'), encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    games = {}
+    in_games = set()
+    for game in catalog.get('games', []):
+        prefix = f"games/{game.get('category')}/{game.get('id')}/"
+        files = sorted(rel for rel in hashes if rel.startswith(prefix))
+        if prefix + 'index.html' not in hashes:
+            continue
+        in_games.update(files)
+        games[game['id']] = {
+            'page': url_for(prefix + 'index.html'),
+            'files': [[url_for(rel), hashes[rel][:12]] for rel in files],
+        }
+    # Files of games not in the catalog are not precached at all
+    shell = [[url_for(rel), hashes[rel][:12]] for rel in sorted(hashes)
+             if rel not in in_games and not rel.startswith('games/')]
+    return shell, games
+
+
+def generate(root):
+    """Write sw.js and sw-version.json into root; returns the version info"""
+    shell, games = precache_lists(root)
+    version = hashlib.blake2b(json.dumps([shell, games], sort_keys=True).encode(), digest_size=8).hexdigest()
+    info = {
+        'version': version,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'shell_files': len(shell),
+        'games': {game_id: len(game['files']) for game_id, game in games.items()},
+    }
+    script = (SW_TEMPLATE
+              .replace('__VERSION__', version)
+              .replace('__BUILT_AT__', info['built_at'])
+              .replace('__SHELL__', json.dumps(shell, separators=(',', ':')))
+              .replace('__GAMES__', json.dumps(games, separators=(',', ':'))))
+
+    # Leave both files untouched when nothing changed, so browsers see no update
+    version_path = os.path.join(root, VERSION_FILE)
+    try:
+        with open(version_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = None
+    if previous and previous.get('version') == version and os.path.exists(os.path.join(root, SW_FILE)):
+        with open(os.path.join(root, SW_FILE), encoding='utf-8') as f:
+            if f"// Version {version} " in f.read(200):
+                return previous
+
+    for name, content in ((SW_FILE, script), (VERSION_FILE, json.dumps(info, indent=1) + '\n')):
+        path = os.path.join(root, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+    return info
+
+
+class VersionInfo:
+    """sw-version.json of the served tree, as the small body served at /api/version.
+
+    The file is re-checked at most every ``check_interval`` seconds, so a
+    redeploy is picked up without a restart and polling clients cost a dict
+    lookup. ``get()`` returns (body, etag) or None when there is no file.
+    """
+
+    def __init__(self, root, check_interval=1.0):
+        self.path = os.path.join(root, VERSION_FILE)
+        self.check_interval = check_interval
+        self._checked = 0.0
+        self._mtime = None
+        self._current = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked >= self.check_interval:
+                self._checked = now
+                self._reload()
+            return self._current
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._mtime = self._current = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._mtime = mtime
+        body = json.dumps({'version': info['version'], 'built_at': info.get('built_at')}).encode('utf-8')
+        self._current = (body, f'"{info["version"]}"')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', nargs='?', default=DEFAULT_ROOT, help="served directory (default: dist/)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(os.path.join(args.root, 'data', 'games.json')):
+        print(f"❌ {args.root} has no data/games.json (run build_frontend.py first?)")
+        return 1
+    info = generate(args.root)
+    print(f"🧰 Service worker {info['version']}: {info['shell_files']} shell files, "
+          f"{len(info['games'])} games ({sum(info['games'].values())} files cached on first play)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+# Server engines for KidsPlay: single-threaded, bounded thread pool and asyncio.
+# Every engine drives the same BaseHTTPRequestHandler subclass, so the handler
+# and PerformanceMonitor do not need to know which engine is running.
+
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_MODES = ('single', 'threads', 'asyncio')
+
+# Minimal response used when the accept backlog is full. It is written straight
+# to the socket so rejecting a client never occupies a worker.
+OVERLOAD_RESPONSE = (
+    b"HTTP/1.0 503 Service Unavailable\r\n"
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Content-Length: 20\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"Server is busy (503)"
+)
+
+
+def listen_backlog(max_workers, queue_depth):
+    """listen() backlog large enough for every connection the engine can admit or reject itself"""
+    return max(socketserver.TCPServer.request_queue_size, max_workers + queue_depth)
+
+
+class SingleThreadHTTPServer(socketserver.TCPServer):
+    """The original engine: one request at a time"""
+    allow_reuse_address = True
+    mode = 'single'
+    # Set before shutdown(): handlers stop keeping connections alive
+    draining = False
+
+    def drain(self, timeout):
+        # serve_forever only returns between requests: nothing is left in flight
+        return True
+
+    def get_stats(self):
+        return {'mode': self.mode, 'max_workers': 1}
+
+
+class ThreadPoolHTTPServer(socketserver.TCPServer):
+    """Accepts on the main thread and hands connections to a fixed worker pool.
+
+    Connections wait in a queue of at most ``queue_depth`` entries; when that
+    is full the client gets an immediate 503 instead of piling up threads.
+    """
+    allow_reuse_address = True
+    mode = 'threads'
+    draining = False
+
+    def __init__(self, server_address, handler_class, max_workers=8, queue_depth=64,
+                 bind_and_activate=True):
+        self.max_workers = max(1, int(max_workers))
+        self.queue_depth = max(1, int(queue_depth))
+        # Kernel accept backlog (socketserver's default is 5): connections beyond
+        # it lose their SYN and stall in TCP retransmits instead of getting a 503
+        self.request_queue_size = listen_backlog(self.max_workers, self.queue_depth)
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self._queue = queue.Queue(maxsize=self.queue_depth)
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self._handled = 0
+        self._rejected = 0
+        self._workers = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"kidsplay-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            self.reject_request(request)
+
+    def reject_request(self, request):
+        with self._stats_lock:
+            self._rejected += 1
+        try:
+            request.sendall(OVERLOAD_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            request, client_address = item
+            with self._stats_lock:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._handled += 1
+                self._queue.task_done()
+
+    def drain(self, timeout):
+        """After shutdown(): wait up to ``timeout`` seconds for queued and running requests"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Counts connections from put() to the end of their handling, with no gap in between
+            if self._queue.unfinished_tasks == 0:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def server_close(self):
+        super().server_close()
+        # Workers still busy after a drain deadline are abandoned (they are daemon threads)
+        idle = self._queue.unfinished_tasks == 0
+        for _ in self._workers:
+            self._queue.put(None)
+        deadline = time.monotonic() + 5
+        for worker in self._workers if idle else ():
+            worker.join(timeout=max(0, deadline - time.monotonic()))
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                'mode': self.mode,
+                'max_workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'queued': self._queue.qsize(),
+                'busy_workers': self._busy,
+                'handled': self._handled,
+                'rejected': self._rejected,
+            }
+
+
+class AsyncioHTTPServer(socketserver.TCPServer):
+    """Accepts connections on an asyncio event loop.
+
+    The HTTP handler itself is blocking, so each accepted connection runs in a
+    bounded executor; a semaphore caps connections in flight (workers plus
+    queue) and anything beyond that is answered with 503 from the loop.
+    """
+    allow_reuse_address = True
+    mode = 'asyncio'
+    draining = False
+    # Longest shutdown() waits for connections in flight (None = until they finish)
+    drain_timeout = None
+
+    def __init__(self, server_address, handler_class, max_workers=8, queue_depth=64,
+                 bind_and_activate=True):
+        self.max_workers = max(1, int(max_workers))
+        self.queue_depth = max(1, int(queue_depth))
+        # Kernel accept backlog (socketserver's default is 5): connections beyond
+        # it lose their SYN and stall in TCP retransmits instead of getting a 503
+        self.request_queue_size = listen_backlog(self.max_workers, self.queue_depth)
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='kidsplay-async')
+        self._loop = None
+        self._stop = None
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._handled = 0
+        self._rejected = 0
+
+    def serve_forever(self, poll_interval=0.5):
+        # Imported here: asyncio costs ~30ms of startup and only this engine uses it
+        import asyncio
+        self._stopped.clear()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._stopped.set()
+
+    def shutdown(self):
+        loop, stop = self._loop, self._stop
+        if loop is not None and stop is not None:
+            loop.call_soon_threadsafe(stop.set)
+        self._stopped.wait()
+
+    async def _serve(self):
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self.socket.setblocking(False)
+        limit = self.max_workers + self.queue_depth
+        pending = set()
+        stop_task = asyncio.ensure_future(self._stop.wait())
+        try:
+            while not self._stop.is_set():
+                accept_task = asyncio.ensure_future(self._loop.sock_accept(self.socket))
+                done, _ = await asyncio.wait({accept_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                if accept_task not in done:
+                    accept_task.cancel()
+                    break
+                try:
+                    request, client_address = accept_task.result()
+                except OSError:
+                    continue
+                with self._stats_lock:
+                    if self._in_flight >= limit:
+                        self._rejected += 1
+                        overloaded = True
+                    else:
+                        self._in_flight += 1
+                        overloaded = False
+                if overloaded:
+                    # Answered right here: the accept loop never waits for a rejected client
+                    self._reject(request)
+                    continue
+                request.setblocking(True)
+                future = self._loop.run_in_executor(self._executor, self._handle, request, client_address)
+                pending.add(future)
+                future.add_done_callback(pending.discard)
+        finally:
+            stop_task.cancel()
+            if pending:
+                await asyncio.wait(pending, timeout=self.drain_timeout)
+            self._loop = None
+
+    def drain(self, timeout):
+        """After shutdown(): wait up to ``timeout`` seconds for connections in flight"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._stats_lock:
+                if self._in_flight == 0:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _reject(self, request):
+        """503 on the still non-blocking socket: a new connection's send buffer takes it in one send()"""
+        try:
+            request.send(OVERLOAD_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._stats_lock:
+                self._in_flight -= 1
+                self._handled += 1
+
+    def server_close(self):
+        super().server_close()
+        # Connections still running after a drain deadline are abandoned
+        self._executor.shutdown(wait=self._in_flight == 0, cancel_futures=True)
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                'mode': self.mode,
+                'max_workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'in_flight': self._in_flight,
+                'handled': self._handled,
+                'rejected': self._rejected,
+            }
+
+
+def create_server(mode, server_address, handler_class, max_workers=8, queue_depth=64, reuse_port=False,
+                  listener=None):
+    """Build the server engine selected at startup.
+
+    With ``reuse_port`` the socket is bound with SO_REUSEPORT, so several
+    worker processes can listen on the same port (pre-fork mode). A
+    ``listener`` that is already bound and listening (systemd socket
+    activation, or handed over by the process being replaced) is used as is.
+    """
+    if mode == 'single':
+        server = SingleThreadHTTPServer(server_address, handler_class, bind_and_activate=False)
+    elif mode == 'threads':
+        server = ThreadPoolHTTPServer(server_address, handler_class, max_workers, queue_depth,
+                                      bind_and_activate=False)
+    elif mode == 'asyncio':
+        server = AsyncioHTTPServer(server_address, handler_class, max_workers, queue_depth,
+                                   bind_and_activate=False)
+    else:
+        raise ValueError(f"Unknown server mode: {mode!r} (expected one of {', '.join(SERVER_MODES)})")
+    if listener is not None:
+        server.socket.close()
+        server.socket = listener
+        server.server_address = listener.getsockname()
+        # Other processes accept on it too: losing a race must not block in accept()
+        listener.setblocking(False)
+        return server
+    try:
+        if reuse_port:
+            server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server.server_bind()
+        server.server_activate()
+    except BaseException:
+        server.server_close()
+        raise
+    return server
@@ -0,0 +1,59 @@
+# Response body transfer for KidsPlay.
+# Real files go through socket.sendfile (os.sendfile on Linux, so the kernel
+# copies straight from the page cache to the socket); in-memory bodies are
+# written with a single sendall and anything else falls back to a big-buffer
+# loop. Callers get the byte count back instead of checking every chunk.
+
+import io
+
+FALLBACK_BUFFER_SIZE = 256 * 1024
+
+
+def _is_real_file(source):
+    try:
+        source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+    return True
+
+
+def send_body(source, connection, outputfile, buffer_size=FALLBACK_BUFFER_SIZE, count=None):
+    """Copy source to the client and return the number of body bytes sent.
+
+    ``count`` limits the transfer to that many bytes from the current position
+    of source. If the client goes away mid-transfer the exception propagates
+    with ``bytes_sent`` set on it, so partial transfers can still be recorded.
+    """
+    if hasattr(outputfile, 'flush'):
+        outputfile.flush()
+
+    start = source.tell() if hasattr(source, 'tell') else 0
+    try:
+        if isinstance(source, io.BytesIO):
+            with source.getbuffer() as buffer:
+                end = len(buffer) if count is None else min(len(buffer), start + count)
+                with buffer[start:end] as view:
+                    outputfile.write(view)
+            source.seek(end)
+            return end - start
+
+        if connection is not None and _is_real_file(source) and connection.gettimeout() != 0:
+            # socket.sendfile leaves the file positioned after the last byte
+            # sent, even when it fails half-way
+            return connection.sendfile(source, start, count)
+
+        sent = 0
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while count is None or sent < count:
+            want = buffer_size if count is None else min(buffer_size, count - sent)
+            n = source.readinto(view[:want])
+            if not n:
+                break
+            outputfile.write(view[:n])
+            sent += n
+        return sent
+    except OSError as e:
+        position = source.tell() if hasattr(source, 'tell') else start
+        e.bytes_sent = max(0, position - start)
+        raise
@@ -0,0 +1,81 @@
+# Sliding-window throughput counters for KidsPlay's PerformanceMonitor.
+# A ring of per-second buckets plus a running sum per window: recording and
+# reading rates are O(1) (amortised over the seconds that pass), and memory is
+# fixed by the longest window.
+
+import time
+
+METRICS = ('requests', 'bytes', 'errors', 'slow')
+WINDOWS = (('1m', 60), ('5m', 300), ('15m', 900))
+
+
+class SlidingWindowCounters:
+    """Per-second counts of requests, bytes, errors and slow requests.
+
+    Not thread-safe on its own: PerformanceMonitor calls it under its lock.
+    """
+
+    def __init__(self, windows=WINDOWS, metrics=METRICS, clock=time.monotonic):
+        self.windows = windows
+        self.metrics = metrics
+        self.clock = clock
+        self.size = max(seconds for _, seconds in windows)
+        self.buckets = {metric: [0] * self.size for metric in metrics}
+        self.sums = {name: dict.fromkeys(metrics, 0) for name, _ in windows}
+        self.started = int(clock())
+        self.current = self.started
+
+    def _advance(self, now):
+        """Move the ring forward to second ``now``, expiring old buckets"""
+        if now <= self.current:
+            return
+        if now - self.current >= self.size:
+            # Idle for longer than the biggest window: everything expired
+            for metric in self.metrics:
+                self.buckets[metric] = [0] * self.size
+            for sums in self.sums.values():
+                for metric in self.metrics:
+                    sums[metric] = 0
+            self.current = now
+            return
+        for second in range(self.current + 1, now + 1):
+            for name, seconds in self.windows:
+                leaving = second - seconds
+                if leaving < self.started:
+                    continue
+                slot = leaving % self.size
+                sums = self.sums[name]
+                for metric in self.metrics:
+                    sums[metric] -= self.buckets[metric][slot]
+            slot = second % self.size
+            for metric in self.metrics:
+                self.buckets[metric][slot] = 0
+        self.current = now
+
+    def add(self, **values):
+        now = int(self.clock())
+        self._advance(now)
+        slot = now % self.size
+        for metric, value in values.items():
+            if value:
+                self.buckets[metric][slot] += value
+                for sums in self.sums.values():
+                    sums[metric] += value
+
+    def count(self, window, metric):
+        """Total of metric over a named window ('1m', '5m', '15m')"""
+        self._advance(int(self.clock()))
+        return self.sums[window][metric]
+
+    def rates(self):
+        """Per-second rates for every window, averaged over the elapsed part of it"""
+        now = int(self.clock())
+        self._advance(now)
+        elapsed = now - self.started + 1
+        result = {}
+        for name, seconds in self.windows:
+            span = min(seconds, elapsed)
+            sums = self.sums[name]
+            result[name] = {f"{metric}_per_sec": sums[metric] / span for metric in self.metrics}
+            result[name]['requests'] = sums['requests']
+        return result
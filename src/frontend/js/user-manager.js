@@ -8,6 +8,8 @@ class UserManager {
         this.currentUser = null;
         this.storageKey = 'kidsplay_current_user';
         this.usersKey = 'kidsplay_users';
+        this.progressQueueKey = 'kidsplay_progress_queue';
+        this.pageStartedAt = Date.now();
         
         // Global gamepad management
         this.gamepad = {
@@ -18,6 +20,80 @@ class UserManager {
         
         this.loadCurrentUser();
         this.initializeGlobalGamepad();
+        this.initializeProgressSync();
+    }
+    
+    // Sincronizzazione con il server (/api/progress): punteggi e tempo di gioco
+    // condivisi tra i tablet. Gli aggiornamenti restano in coda nel localStorage
+    // finche' il server non li accetta, cosi' niente si perde offline.
+    initializeProgressSync() {
+        window.addEventListener('online', () => this.flushProgress());
+        this.flushProgress();
+        
+        // Tempo passato su una pagina di gioco, inviato quando la si lascia
+        window.addEventListener('pagehide', () => {
+            const gameId = this.currentGameId();
+            const seconds = Math.round((Date.now() - this.pageStartedAt) / 1000);
+            if (!this.currentUser || !gameId || seconds < 5) return;
+            const update = { username: this.currentUser.username, game_id: gameId, played: 0, seconds: seconds };
+            const sent = navigator.sendBeacon && navigator.sendBeacon('/api/progress', JSON.stringify(update));
+            if (!sent) {
+                this.queueProgress(update, false);
+            }
+        });
+    }
+    
+    // Id del gioco dalla URL: /games/<categoria>/<id>/...
+    currentGameId() {
+        const match = window.location.pathname.match(/\/games\/[^/]+\/([^/]+)\//);
+        return match ? match[1] : null;
+    }
+    
+    queueProgress(update, flush = true) {
+        let queue = [];
+        try {
+            queue = JSON.parse(localStorage.getItem(this.progressQueueKey)) || [];
+        } catch (e) {
+            queue = [];
+        }
+        queue.push(update);
+        localStorage.setItem(this.progressQueueKey, JSON.stringify(queue.slice(-200)));
+        if (flush) {
+            this.flushProgress();
+        }
+    }
+    
+    async flushProgress() {
+        let queue;
+        try {
+            queue = JSON.parse(localStorage.getItem(this.progressQueueKey)) || [];
+        } catch (e) {
+            queue = [];
+        }
+        if (queue.length === 0 || this.flushingProgress) return;
+        this.flushingProgress = true;
+        try {
+            const response = await fetch('/api/progress', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ updates: queue })
+            });
+            if (response.ok || response.status === 400) {
+                // 202: quelli validi sono registrati, quelli in 'rejected' non lo saranno mai;
+                // 400: richiesta non valida, inutile riprovare
+                if (response.ok) {
+                    const result = await response.json().catch(() => ({}));
+                    (result.rejected || []).forEach(r =>
+                        console.warn('Aggiornamento progressi scartato:', queue[r.index], r.error));
+                }
+                const current = JSON.parse(localStorage.getItem(this.progressQueueKey)) || [];
+                localStorage.setItem(this.progressQueueKey, JSON.stringify(current.slice(queue.length)));
+            }
+        } catch (e) {
+            // Offline: si riprova al prossimo evento 'online' o caricamento pagina
+        } finally {
+            this.flushingProgress = false;
+        }
     }
     
     // Initialize global gamepad management
@@ -211,6 +287,13 @@ class UserManager {
         this.currentUser = user;
         this.saveCurrentUser();
         
+        // Registra l'utente anche sul server (in background)
+        fetch('/api/users', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ username: user.username })
+        }).catch(() => {});
+        
         return { success: true, user: user };
     }
 
@@ -237,8 +320,17 @@ class UserManager {
     }
 
     // Aggiorna statistiche utente
-    updateUserStats(gamesPlayed = 0, scoreToAdd = 0) {
+    updateUserStats(gamesPlayed = 0, scoreToAdd = 0, gameId = this.currentGameId()) {
         if (!this.currentUser) return;
+        
+        if (gameId) {
+            this.queueProgress({
+                username: this.currentUser.username,
+                game_id: gameId,
+                score: scoreToAdd,
+                played: gamesPlayed
+            });
+        }
 
         const users = this.getAllUsers();
         const userIndex = users.findIndex(u => u.username === this.currentUser.username);
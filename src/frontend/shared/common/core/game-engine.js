@@ -19,15 +19,25 @@ class KidsPlayEngine {
         this.inputManager = new UniversalInputManager();
         this.audioManager = new AudioManager();
         
-        // Load configuration
-        await this.loadConfiguration();
-        
-        // Load games catalog
-        await this.loadGamesCatalog();
+        // Catalog already filtered for the profile by the server; the static
+        // files are the fallback (offline from the service worker cache)
+        const fromServer = await this.loadProfileCatalog();
+        if (!fromServer) {
+            // Load configuration
+            await this.loadConfiguration();
+            
+            // Load games catalog
+            await this.loadGamesCatalog();
+        }
         
         // Setup UI
         this.setupUI();
         
+        // Re-render when a profile or the catalog changes on the server
+        if (fromServer) {
+            this.watchConfigVersion();
+        }
+        
         console.log('✅ KidsPlay Engine ready!');
     }
     
@@ -43,6 +53,48 @@ class KidsPlayEngine {
         return 'default';
     }
     
+    async loadProfileCatalog() {
+        try {
+            const response = await fetch(`/api/catalog?profile=${encodeURIComponent(this.currentProfile)}`);
+            if (!response.ok) {
+                return false;
+            }
+            const catalog = await response.json();
+            this.config = catalog.config;
+            this.gamesList = catalog.games;
+            console.log(`📋 Profile ${this.currentProfile}: ${this.gamesList.length} games from /api/catalog`);
+            return true;
+        } catch (error) {
+            return false;
+        }
+    }
+    
+    async watchConfigVersion() {
+        const pause = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+        let version = null;
+        while (true) {
+            try {
+                // Long poll: the server answers when the version moves (or after ~25s)
+                const query = version ? `?since=${encodeURIComponent(version)}` : '';
+                const response = await fetch(`/api/config/version${query}`, { cache: 'no-store' });
+                if (!response.ok) {
+                    return;
+                }
+                const current = (await response.json()).version;
+                if (version && current !== version) {
+                    if (await this.loadProfileCatalog()) {
+                        this.renderGamesCatalog();
+                    }
+                } else if (version) {
+                    await pause(5000);
+                }
+                version = current;
+            } catch (error) {
+                await pause(30000);
+            }
+        }
+    }
+    
     async loadConfiguration() {
         try {
             const response = await fetch(`config/${this.currentProfile}.json`);
@@ -152,7 +204,7 @@ class KidsPlayEngine {
         const baseUrl = `games/${game.category}/${game.id}/index.html`;
         const params = new URLSearchParams({
             profile: this.currentProfile,
-            difficulty: this.config.difficulty_level,
+            difficulty: game.difficulty || this.config.difficulty_level,
             language: this.config.language || 'it',
             audio: this.config.audio_enabled ? 'on' : 'off'
         });
@@ -0,0 +1,56 @@
+import logging
+import os
+import queue
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+from access_log import NEVER_DROP, BatchLogWriter, DroppingQueueHandler, WriterHandler  # noqa: E402
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers[:] = [handler]
+    return logger
+
+
+def test_writer_without_thread_keeps_records_in_order(tmp_path):
+    path = str(tmp_path / 'server_performance.log')
+    log_queue = queue.Queue()
+    writer = BatchLogWriter(log_queue, path, logging.Formatter('%(message)s'), rotate_when='never', batch_size=2)
+    worker = make_logger('test-worker', DroppingQueueHandler(log_queue))
+    supervisor = make_logger('test-supervisor', WriterHandler(writer))
+
+    for i in range(3):
+        worker.info(f"request {i}")
+    supervisor.warning("worker exited")
+    worker.info("request 3")
+    assert writer.write_pending() == 1
+    worker.info("request 4")
+    writer.stop()
+
+    with open(path, encoding='utf-8') as f:
+        assert f.read().splitlines() == [
+            'request 0', 'request 1', 'request 2', 'worker exited', 'request 3', 'request 4'
+        ]
+    assert not writer.is_alive()
+    assert writer.written == 6
+
+
+def test_full_queue_drops_info_but_keeps_never_drop_records():
+    log_queue = queue.Queue(maxsize=1)
+    handler = DroppingQueueHandler(log_queue)
+    logger = make_logger('test-full-queue', handler)
+
+    logger.info("GET / - 200")
+    logger.info("GET /games/ - 200")
+    assert handler.dropped == 1
+
+    # Still full: the error line waits for the writer to make room
+    threading.Timer(0.1, log_queue.get_nowait).start()
+    logger.info("GET /missing.js - 404", extra=NEVER_DROP)
+    assert log_queue.get_nowait().getMessage() == "GET /missing.js - 404"
+    assert handler.dropped == 1
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+from cluster import SharedStats  # noqa: E402
+from metrics import MetricsRegistry, duration_bucket_counts  # noqa: E402
+
+
+def test_cluster_totals_come_from_every_worker_slot():
+    shared = SharedStats(2)
+    shared.slots[0].record(0.002, 100, False)
+    shared.slots[1].record(0.3, 50, True)
+    shared.slots[1].record(0.004, 50, False)
+    registry = MetricsRegistry(const_labels={'worker': 1})
+    registry.record_request('GET', '/index.html', 200, 0.004, 50)
+    latency = shared.aggregate()['latency']
+
+    text = registry.render(
+        [('uptime_seconds', "Uptime.", 'seconds', 1.0)],
+        [('cluster_http_requests', "Requests.", '', [({'worker': slot.index}, slot['requests'])
+                                                     for slot in shared.slots])],
+        [('cluster_http_request_duration_seconds', "Latency.", 'seconds',
+          duration_bucket_counts(latency), latency.count, latency.total)],
+    ).decode('utf-8')
+
+    assert 'kidsplay_http_requests_total{worker="1",method="GET",route="/index.html",status="200"} 1' in text
+    assert 'kidsplay_uptime_seconds{worker="1"} 1.0' in text
+    assert 'kidsplay_cluster_http_requests_total{worker="0"} 1' in text
+    assert 'kidsplay_cluster_http_requests_total{worker="1"} 2' in text
+    assert 'kidsplay_cluster_http_request_duration_seconds_bucket{le="0.0025"} 1' in text
+    assert 'kidsplay_cluster_http_request_duration_seconds_bucket{le="0.25"} 2' in text
+    assert 'kidsplay_cluster_http_request_duration_seconds_bucket{le="+Inf"} 3' in text
+    assert text.endswith('# EOF\n')
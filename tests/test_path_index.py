@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+import path_index  # noqa: E402
+from path_index import FILE, MISSING, PathIndex  # noqa: E402
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_polling_rescans_only_when_a_directory_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr(path_index.InotifyWatcher, 'available', staticmethod(lambda: False))
+    (tmp_path / 'games').mkdir()
+    (tmp_path / 'games' / 'index.html').write_text('<h1>games</h1>')
+    # Directories changed right before a scan are rescanned once more: age them
+    old = time.time() - 60
+    for directory in (tmp_path, tmp_path / 'games'):
+        os.utime(directory, (old, old))
+    index = PathIndex(str(tmp_path), lambda path: 'text/html', poll_interval=0.02)
+    index.start()
+    try:
+        assert wait_for(lambda: index.ready)
+        assert index.watch_mode == 'polling' and not index.stats_current
+        assert wait_for(lambda: index.polls >= 5)
+        assert index.scans == 1
+
+        (tmp_path / 'games' / 'snake.js').write_text('// snake')
+        assert wait_for(lambda: index.resolve('/games/snake.js').kind == FILE)
+
+        (tmp_path / 'games' / 'snake.js').unlink()
+        assert wait_for(lambda: index.resolve('/games/snake.js').kind == MISSING)
+    finally:
+        index.stop()
+
+
+def test_polling_never_serves_a_variant_older_than_a_file_rewritten_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(path_index.InotifyWatcher, 'available', staticmethod(lambda: False))
+    source = tmp_path / 'app.js'
+    source.write_text('// v1')
+    (tmp_path / 'app.js.gz').write_bytes(b'gzip of v1')
+    old = time.time() - 60
+    for path in (source, tmp_path / 'app.js.gz', tmp_path):
+        os.utime(path, (old, old))
+    index = PathIndex(str(tmp_path), lambda path: 'text/javascript', poll_interval=60)
+    index.start()
+    try:
+        assert wait_for(lambda: index.ready)
+        entry = index.resolve('/app.js').entry
+        assert index.negotiate('gzip', entry)[0] == 'gzip'
+
+        # Rewritten in place: the directory mtime (and so the index) does not change
+        source.write_text('// v2')
+        assert index.resolve('/app.js').entry.stat.st_mtime_ns == entry.stat.st_mtime_ns
+        assert index.negotiate('gzip', entry) is None
+    finally:
+        index.stop()
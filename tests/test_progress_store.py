@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+from progress_store import ProgressStore  # noqa: E402
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def committed_score(path, username):
+    with sqlite3.connect(path) as db:
+        row = db.execute('SELECT total_score FROM users WHERE username = ?', (username,)).fetchone()
+    return row[0] if row else None
+
+
+def test_flusher_survives_a_locked_database(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    store = ProgressStore(path, flush_interval=0.05)
+    store._db.execute('PRAGMA busy_timeout=0')
+    blocker = sqlite3.connect(path, isolation_level=None)
+    try:
+        blocker.execute('BEGIN IMMEDIATE')
+        store.record('mia', 'snake', score=5)
+        assert wait_for(lambda: store.errors > 0)
+        assert store._thread.is_alive()
+        blocker.execute('ROLLBACK')
+
+        store.record('mia', 'snake', score=7)
+        assert wait_for(lambda: committed_score(path, 'mia') == 12)
+        assert store._thread.is_alive()
+        assert store.get_stats()['pending_keys'] == 0
+    finally:
+        blocker.close()
+        store.close()
+
+
+def test_reads_see_what_another_worker_committed(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    first = ProgressStore(path, flush_interval=60)
+    second = ProgressStore(path, flush_interval=60)
+    try:
+        first.record('leo', 'math-easy', score=3)
+        first.flush()
+        assert second.get_user('leo')['total_score'] == 3
+
+        first.record('leo', 'math-easy', score=4)
+        first.flush()
+        user = second.get_user('leo', with_scores=True)
+        assert user['total_score'] == 7
+        assert user['scores']['math-easy']['plays'] == 2
+    finally:
+        first.close()
+        second.close()
+
+
+def test_an_invalid_update_does_not_lose_the_rest_of_the_batch(tmp_path):
+    store = ProgressStore(str(tmp_path / 'progress.db'), flush_interval=60)
+    try:
+        accepted, rejected = store.record_many([
+            {'username': 'mia', 'game_id': 'snake', 'score': 5},
+            {'username': 'mia', 'game_id': 'snake', 'score': -3},
+            'not an update',
+            {'username': 'mia', 'game_id': 'memory', 'score': 2},
+        ])
+        assert accepted == 2
+        assert [index for index, _ in rejected] == [1, 2]
+        store.flush()
+        assert committed_score(store.path, 'mia') == 7
+    finally:
+        store.close()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+from ranges import MAX_RANGES, parse_range_header  # noqa: E402
+
+
+def test_repeated_ranges_send_the_file_once():
+    header = 'bytes=' + ','.join(['0-'] * MAX_RANGES)
+    assert parse_range_header(header, 1000) == [(0, 999)]
+
+
+def test_overlapping_and_adjacent_ranges_are_merged():
+    assert parse_range_header('bytes=500-599,0-99,50-149,150-199', 1000) == [(0, 199), (500, 599)]
+    assert parse_range_header('bytes=-100,850-', 1000) == [(850, 999)]
+
+
+def test_disjoint_ranges_are_kept():
+    assert parse_range_header('bytes=0-9,20-29', 100) == [(0, 9), (20, 29)]
+
+
+def test_too_many_ranges_fall_back_to_200():
+    header = 'bytes=' + ','.join(f'{i * 10}-{i * 10 + 1}' for i in range(MAX_RANGES + 1))
+    assert parse_range_header(header, 1000) is None
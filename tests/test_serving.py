@@ -0,0 +1,18 @@
+import http.server
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'backend'))
+
+from serving import create_server  # noqa: E402
+
+
+@pytest.mark.parametrize('mode', ['threads', 'asyncio'])
+def test_listen_backlog_covers_workers_and_queue(mode):
+    server = create_server(mode, ('127.0.0.1', 0), http.server.BaseHTTPRequestHandler, max_workers=8, queue_depth=64)
+    try:
+        assert server.request_queue_size >= 8 + 64
+    finally:
+        server.server_close()
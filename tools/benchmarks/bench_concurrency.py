@@ -0,0 +1,129 @@
+"""
+bench_concurrency.py - Throughput of the KidsPlay server engines vs. parallel clients.
+
+Starts src/backend/server.py in-process on a free port for each serving mode and
+hammers it with N client threads (keep-alive off, one request per connection,
+like the game pages do today). Optionally adds "slow tablets" that read their
+response a few bytes at a time, to show whether they block everybody else.
+
+    python tools/benchmarks/bench_concurrency.py
+    python tools/benchmarks/bench_concurrency.py --modes threads asyncio --clients 1 4 16 --slow-clients 2
+"""
+import argparse
+import functools
+import http.client
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'backend'))
+
+import server  # noqa: E402
+from serving import SERVER_MODES, create_server  # noqa: E402
+
+FRONTEND_DIR = os.path.join(ROOT, 'src', 'frontend')
+PATHS = [
+    '/index.html',
+    '/shared/common/core/game-engine.js',
+    '/shared/common/core/audio-manager.js',
+    '/games/educational/snake/index.html',
+    '/data/games.json',
+]
+
+
+def start(mode, max_workers, queue_depth):
+    # Every benchmark client comes from 127.0.0.1: per-client limits would only measure the limiter
+    server.configure_admission(server.build_arg_parser().parse_args(['--rate-limit', '0']))
+    handler = functools.partial(server.KidsPlayHTTPRequestHandler, directory=FRONTEND_DIR)
+    httpd = create_server(mode, ('127.0.0.1', 0), handler, max_workers, queue_depth)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def client_loop(port, deadline, results):
+    done = errors = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status == 200:
+                done += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+    results.append((done, errors))
+
+
+def slow_client_loop(port, stop):
+    """Request the biggest game page and read it at ~16 KB/s"""
+    while not stop.is_set():
+        try:
+            sock = socket.create_connection(('127.0.0.1', port), timeout=30)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.sendall(b"GET /games/adventure/speedy-adventures/index.html HTTP/1.0\r\n\r\n")
+            while not stop.is_set():
+                if not sock.recv(1024):
+                    break
+                time.sleep(0.06)
+            sock.close()
+        except OSError:
+            time.sleep(0.1)
+
+
+def run(mode, clients, duration, max_workers, queue_depth, slow_clients):
+    httpd = start(mode, max_workers, queue_depth)
+    port = httpd.server_address[1]
+    stop = threading.Event()
+    slow = [threading.Thread(target=slow_client_loop, args=(port, stop), daemon=True) for _ in range(slow_clients)]
+    for t in slow:
+        t.start()
+    time.sleep(0.2)
+
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client_loop, args=(port, deadline, results)) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    httpd.shutdown()
+    httpd.server_close()
+    done = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    return done / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=SERVER_MODES, default=list(SERVER_MODES))
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--duration', type=float, default=3.0, help="seconds per measurement")
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--queue-depth', type=int, default=64)
+    parser.add_argument('--slow-clients', type=int, default=0,
+                        help="background clients that download a big page very slowly")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'clients':>8}{'req/s':>12}{'errors':>8}")
+    for mode in args.modes:
+        for clients in args.clients:
+            rps, errors = run(mode, clients, args.duration, args.max_workers, args.queue_depth, args.slow_clients)
+            print(f"{mode:<10}{clients:>8}{rps:>12.1f}{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
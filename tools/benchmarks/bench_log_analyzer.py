@@ -0,0 +1,129 @@
+"""
+bench_log_analyzer.py - Throughput of src/backend/log_analyzer.py on synthetic logs.
+
+Writes a multi-GB set of rotated server_performance.log files in the format
+PerformanceMonitor produces (request lines, SLOW REQUEST/SLOW TRANSFER
+warnings, periodic STATS lines; the oldest rotations gzipped), then times the
+analyzer with one process and with one process per core. Peak RSS of the
+analysis is reported to show memory does not grow with log size.
+
+    python tools/benchmarks/bench_log_analyzer.py                  # 2 GB in 8 files
+    python tools/benchmarks/bench_log_analyzer.py --size-mb 256 --files 4 --keep /tmp/kidsplay-logs
+"""
+import argparse
+import gzip
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'backend'))
+
+import log_analyzer  # noqa: E402
+
+PATHS = [
+    ('/index.html', 16853), ('/games/adventure/speedy-adventures/index.html', 123429),
+    ('/games/adventure/digital-subbuteo/index.html', 71000), ('/games/educational/snake/index.html', 16658),
+    ('/games/educational/math-easy/index.html', 40000), ('/shared/common/core/game-engine.js', 9000),
+    ('/shared/common/core/audio-manager.js', 7000), ('/shared/common/styles/base.css', 5000),
+    ('/data/games.json', 3500), ('/config/figlio1.json', 700), ('/manifest.json', 900),
+    ('/debug/performance', 1200), ('/flutter_service_worker.js', 0), ('/index.html?v=42', 16853),
+]
+
+
+def write_log(path, size_bytes, start):
+    """Write about size_bytes of log lines starting at datetime start; returns the end time"""
+    rnd = random.Random(path)
+    now = start
+    written = 0
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        while written < size_bytes:
+            lines = []
+            for _ in range(2000):
+                now += timedelta(milliseconds=rnd.randint(5, 400))
+                ts = now.strftime('%Y-%m-%d %H:%M:%S') + f",{now.microsecond // 1000:03d}"
+                url, size = rnd.choice(PATHS)
+                status = 404 if url.startswith('/flutter') else (304 if rnd.random() < 0.1 else 200)
+                duration = rnd.lognormvariate(-6, 1.2)
+                lines.append(f"{ts} - INFO - GET {url} - {duration:.3f}s - {status} - {size if status == 200 else 0}B\n")
+                if duration > 0.5:
+                    lines.append(f"{ts} - WARNING - SLOW REQUEST: GET {url} took {duration:.3f}s (size: {size} bytes)\n")
+                if rnd.random() < 0.001:
+                    lines.append(f"{ts} - WARNING - SLOW TRANSFER: {url} - {size / 1024:.1f}KB in 1.4s "
+                                 f"({size / 1024 / 1.4:.1f}KB/s)\n")
+                if rnd.random() < 0.0005:
+                    lines.append(f"{ts} - INFO - STATS - Uptime: 1.0h | Requests: 1000 | Avg Response: 3.0ms | "
+                                 f"CPU: {rnd.uniform(1, 90):.1f}% | RAM: {rnd.uniform(20, 60):.1f}% | Slow requests: 3\n")
+            chunk = ''.join(lines)
+            f.write(chunk)
+            written += len(chunk)
+    return now
+
+
+def generate(directory, size_mb, files, gzipped):
+    start = datetime(2026, 9, 1)
+    per_file = size_mb * 1024 * 1024 // files
+    paths = []
+    # Oldest rotation has the highest number, like BatchLogWriter produces
+    for i in range(files - 1, -1, -1):
+        name = 'server_performance.log' + (f'.{i}' if i else '')
+        if i and i > files - 1 - gzipped:
+            name += '.gz'
+        path = os.path.join(directory, name)
+        start = write_log(path, per_file, start)
+        paths.append(path)
+    return paths
+
+
+def timed(paths, jobs):
+    started = time.perf_counter()
+    summary = log_analyzer.analyze(paths, jobs)
+    elapsed = time.perf_counter() - started
+    return summary, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=2048, help="total uncompressed log size")
+    parser.add_argument('--files', type=int, default=8, help="number of rotated files")
+    parser.add_argument('--gzipped', type=int, default=2, help="how many of the oldest rotations are gzipped")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="processes for the parallel run")
+    parser.add_argument('--keep', help="generate into (or reuse) this directory instead of a temp dir")
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp(prefix='kidsplay-logs-')
+    os.makedirs(directory, exist_ok=True)
+    try:
+        paths = log_analyzer.find_logs([directory])
+        if not paths:
+            print(f"📝 Generating {args.size_mb}MB of synthetic logs in {directory} ...")
+            started = time.perf_counter()
+            paths = generate(directory, args.size_mb, args.files, args.gzipped)
+            print(f"   done in {time.perf_counter() - started:.1f}s")
+        on_disk = sum(os.path.getsize(p) for p in paths)
+        print(f"📂 {len(paths)} files, {on_disk / 1048576:.0f}MB on disk")
+
+        for jobs in sorted({1, args.jobs}):
+            summary, elapsed = timed(paths, jobs)
+            print(f"⏱️  jobs={jobs:<3} {elapsed:7.1f}s  {summary.lines / elapsed:>12,.0f} lines/s  "
+                  f"({summary.lines:,} lines, {len(summary.routes)} routes)")
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"🧠 Peak RSS of the benchmark process: {peak:.0f}MB")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+bench_path_index.py - Static file resolution with and without the in-memory path index.
+
+Starts src/backend/server.py in-process on a free port and lets N keep-alive
+clients request one kind of URL at a time: cached files, 404 probes (the
+flutter_service_worker.js / favicon requests browsers keep sending) and
+directory URLs answered with their index.html. Each mix runs once with the
+path index and once going to the filesystem (translate_path, isdir, stat,
+open), and reports requests/s and latency.
+
+    python tools/benchmarks/bench_path_index.py
+    python tools/benchmarks/bench_path_index.py --clients 1 8 --duration 5 --root dist
+"""
+import argparse
+import functools
+import http.client
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'backend'))
+
+import server  # noqa: E402
+from asset_cache import AssetCache  # noqa: E402
+from histograms import LatencyHistogram  # noqa: E402
+from path_index import PathIndex  # noqa: E402
+from serving import create_server  # noqa: E402
+
+MIXES = {
+    'files': [
+        '/index.html',
+        '/shared/common/core/game-engine.js',
+        '/shared/common/core/audio-manager.js',
+        '/games/educational/snake/index.html',
+        '/data/games.json',
+    ],
+    '404': [
+        '/flutter_service_worker.js',
+        '/favicon.ico',
+        '/games/educational/snake/missing.js',
+        '/apple-touch-icon.png',
+    ],
+    'directories': [
+        '/',
+        '/games/educational/snake/',
+    ],
+}
+
+
+def start(root, mode, max_workers, indexed):
+    parser = server.build_arg_parser()
+    # Every client comes from 127.0.0.1: per-client limits would only measure the limiter
+    server.configure_admission(parser.parse_args(['--rate-limit', '0']))
+    server.configure_keep_alive(parser.parse_args(['--keep-alive', '--keep-alive-max-requests', '1000000']))
+    server.asset_cache = AssetCache()
+    server.path_index = None
+    if indexed:
+        server.path_index = PathIndex(root, server.guess_type)
+        server.path_index.rescan()
+    handler = functools.partial(server.KidsPlayHTTPRequestHandler, directory=root)
+    httpd = create_server(mode, ('127.0.0.1', 0), handler, max_workers, 64)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def client_loop(port, paths, deadline, results):
+    latency = LatencyHistogram()
+    done = errors = 0
+    i = 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            latency.record(time.perf_counter() - started)
+            done += 1
+            if response.will_close:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.close()
+    results.append((done, errors, latency))
+
+
+def run(root, paths, clients, indexed, args):
+    httpd = start(root, args.mode, max(args.max_workers, clients), indexed)
+    port = httpd.server_address[1]
+    try:
+        results = []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client_loop, args=(port, paths, deadline, results))
+                   for _ in range(clients)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    latency = LatencyHistogram()
+    for _, _, hist in results:
+        latency.merge(hist)
+    return {
+        'requests_per_second': sum(r[0] for r in results) / elapsed,
+        'errors': sum(r[1] for r in results),
+        'p50_ms': latency.quantile(0.5) * 1000,
+        'p99_ms': latency.quantile(0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default=os.path.join('src', 'frontend'), help="tree to serve")
+    parser.add_argument('--mixes', nargs='+', choices=sorted(MIXES), default=list(MIXES))
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 8])
+    parser.add_argument('--duration', type=float, default=3.0, help="seconds per measurement")
+    parser.add_argument('--mode', default='threads', choices=['threads', 'asyncio'])
+    parser.add_argument('--max-workers', type=int, default=8)
+    args = parser.parse_args()
+    root = os.path.abspath(os.path.join(ROOT, args.root))
+    # Every 404 probe would print a warning
+    server.perf_monitor.perf_logger.disabled = True
+
+    print(f"{'mix':<13}{'clients':>8}{'index':>7}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for mix in args.mixes:
+        for clients in args.clients:
+            for indexed in (False, True):
+                r = run(root, MIXES[mix], clients, indexed, args)
+                print(f"{mix:<13}{clients:>8}{'on' if indexed else 'off':>7}{r['requests_per_second']:>10.0f}"
+                      f"{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
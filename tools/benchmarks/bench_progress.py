@@ -0,0 +1,173 @@
+"""
+bench_progress.py - Sustained score/play-time writes to the progress API.
+
+Starts src/backend/server.py in-process on a free port with a throwaway SQLite
+database and lets N simulated tablets post small /api/progress updates over
+keep-alive connections (each device plays as its own child and switches game
+now and then), while one reader polls /api/users/<name>. Reports accepted
+updates/s, POST latency, and how many rows the coalescing flusher actually
+wrote. --flush-size 1 commits every update on its own, for comparison.
+
+    python tools/benchmarks/bench_progress.py
+    python tools/benchmarks/bench_progress.py --devices 2 8 32 --duration 10
+    python tools/benchmarks/bench_progress.py --devices 8 --flush-size 1
+"""
+import argparse
+import functools
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'backend'))
+
+import server  # noqa: E402
+from histograms import LatencyHistogram  # noqa: E402
+from progress_store import ProgressStore  # noqa: E402
+from serving import create_server  # noqa: E402
+
+FRONTEND_DIR = os.path.join(ROOT, 'src', 'frontend')
+GAMES = ['memory-letters', 'letter-hunt', 'math-easy', 'snake', 'blockworld', 'speedy-adventures']
+
+
+def start(mode, max_workers, db_path, flush_interval, flush_size):
+    parser = server.build_arg_parser()
+    # Every simulated device comes from 127.0.0.1: per-client limits would only measure the limiter
+    server.configure_admission(parser.parse_args(['--rate-limit', '0']))
+    server.configure_keep_alive(parser.parse_args(['--keep-alive', '--keep-alive-max-requests', '100000']))
+    server.progress_store = ProgressStore(db_path, flush_interval=flush_interval, flush_size=flush_size)
+    handler = functools.partial(server.KidsPlayHTTPRequestHandler, directory=FRONTEND_DIR)
+    httpd = create_server(mode, ('127.0.0.1', 0), handler, max_workers, 64)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def device_loop(port, device, deadline, think_time, results):
+    rnd = random.Random(device)
+    username = f"bimbo-{device:03d}"
+    game = rnd.choice(GAMES)
+    latency = LatencyHistogram()
+    accepted = errors = 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    while time.perf_counter() < deadline:
+        if rnd.random() < 0.05:
+            game = rnd.choice(GAMES)
+        update = {'username': username, 'game_id': game, 'score': rnd.randint(0, 50),
+                  'played': 1 if rnd.random() < 0.2 else 0, 'seconds': rnd.randint(1, 5)}
+        body = json.dumps(update)
+        started = time.perf_counter()
+        try:
+            conn.request('POST', '/api/progress', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            latency.record(time.perf_counter() - started)
+            if response.status == 202:
+                accepted += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        if think_time:
+            time.sleep(rnd.uniform(0, 2 * think_time))
+    conn.close()
+    results.append((accepted, errors, latency))
+
+
+def reader_loop(port, devices, stop, counts):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    i = 0
+    while not stop.is_set():
+        try:
+            conn.request('GET', f"/api/users/bimbo-{i % devices:03d}")
+            conn.getresponse().read()
+            counts[0] += 1
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        i += 1
+        time.sleep(0.01)
+    conn.close()
+
+
+def run(devices, args):
+    workdir = tempfile.mkdtemp(prefix='kidsplay-progress-')
+    db_path = os.path.join(workdir, 'progress.db')
+    # A keep-alive connection holds a worker thread: one per device plus the reader
+    workers = max(args.max_workers, devices + 1)
+    httpd = start(args.mode, workers, db_path, args.flush_interval, args.flush_size)
+    port = httpd.server_address[1]
+    try:
+        stop = threading.Event()
+        reads = [0]
+        reader = threading.Thread(target=reader_loop, args=(port, devices, stop, reads), daemon=True)
+        reader.start()
+        results = []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=device_loop, args=(port, d, deadline, args.think_time, results))
+                   for d in range(devices)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        reader.join()
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        store, server.progress_store = server.progress_store, None
+        store.close()
+
+    stats = store.get_stats()
+    latency = LatencyHistogram()
+    for _, _, hist in results:
+        latency.merge(hist)
+    db_size = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'updates_per_second': sum(r[0] for r in results) / elapsed,
+        'errors': sum(r[1] for r in results),
+        'p50_ms': latency.quantile(0.5) * 1000,
+        'p99_ms': latency.quantile(0.99) * 1000,
+        'reads_per_second': reads[0] / elapsed,
+        'flushes': stats['flushes'],
+        'rows_written': stats['rows_written'],
+        'coalescing': stats['coalescing_ratio'] or 0,
+        'avg_flush_ms': stats['avg_flush_ms'],
+        'db_kb': db_size / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per measurement")
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help="mean pause between a device's updates, seconds (0 = flat out)")
+    parser.add_argument('--mode', default='threads', choices=['threads', 'asyncio'])
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--flush-size', type=int, default=256,
+                        help="pending keys that trigger an early flush (1 = a transaction per update)")
+    args = parser.parse_args()
+
+    print(f"{'devices':>8}{'upd/s':>10}{'errors':>8}{'p50 ms':>9}{'p99 ms':>9}{'reads/s':>9}"
+          f"{'flushes':>9}{'rows':>8}{'upd/row':>9}{'flush ms':>10}{'db KB':>8}")
+    for devices in args.devices:
+        r = run(devices, args)
+        print(f"{devices:>8}{r['updates_per_second']:>10.0f}{r['errors']:>8}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['reads_per_second']:>9.0f}{r['flushes']:>9}{r['rows_written']:>8}{r['coalescing']:>9.1f}"
+              f"{r['avg_flush_ms']:>10.2f}{r['db_kb']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
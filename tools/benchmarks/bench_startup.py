@@ -0,0 +1,118 @@
+"""
+bench_startup.py - Time from process start to the first byte served.
+
+Launches src/backend/server.py as a fresh process (as the launcher, systemd or
+a container restart would), connects as soon as the port accepts and sends
+GET / : the time is measured from just before the process is spawned to the
+first byte of the response. Each run uses a throwaway progress database and
+is stopped with SIGTERM. Also reports what a bare `import server` costs and
+whether it left any thread running.
+
+    python tools/benchmarks/bench_startup.py
+    python tools/benchmarks/bench_startup.py --runs 20 --variant=--no-fast-start --variant="--mode asyncio"
+    python tools/benchmarks/bench_startup.py --variant="--root dist --processes 4"
+"""
+import argparse
+import os
+import shlex
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BACKEND_DIR = os.path.join(ROOT, 'src', 'backend')
+SERVER = os.path.join(BACKEND_DIR, 'server.py')
+
+IMPORT_PROBE = (
+    "import sys, threading, time\n"
+    "sys.path.insert(0, sys.argv[1])\n"
+    "started = time.perf_counter()\n"
+    "import server\n"
+    "print(time.perf_counter() - started, threading.active_count())\n"
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def first_byte(port, deadline):
+    """Poll until the server answers GET /; returns the time the first byte arrived"""
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+                sock.sendall(request)
+                if sock.recv(1):
+                    return time.perf_counter()
+        except OSError:
+            time.sleep(0.002)
+    return None
+
+
+def run_once(server_args, timeout):
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix='kidsplay-startup-') as workdir:
+        args = [sys.executable, SERVER, '--port', str(port), '--progress-db', os.path.join(workdir, 'progress.db')]
+        started = time.perf_counter()
+        process = subprocess.Popen(args + server_args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            answered = first_byte(port, started + timeout)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    return None if answered is None else answered - started
+
+
+def import_cost(runs):
+    times = []
+    threads = None
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE, BACKEND_DIR], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        threads = int(out[1])
+    return statistics.median(times), threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help="server starts per variant")
+    parser.add_argument('--variant', action='append', dest='variants',
+                        help="server arguments of one variant to compare, e.g. --variant=--no-fast-start "
+                             "(repeatable; default: --fast-start and --no-fast-start)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for the first byte")
+    args = parser.parse_args()
+    variants = args.variants or ['--fast-start', '--no-fast-start']
+
+    seconds, threads = import_cost(args.runs)
+    print(f"import server: {seconds * 1000:.1f} ms (median), {threads} thread(s) running afterwards\n")
+    # Variants take turns, so a busy moment on the machine hits all of them alike
+    results = {variant: [] for variant in variants}
+    for _ in range(args.runs):
+        for variant in variants:
+            results[variant].append(run_once(shlex.split(variant), args.timeout))
+
+    print(f"{'variant':<32}{'runs':>6}{'min ms':>9}{'p50 ms':>9}{'max ms':>9}{'failed':>8}")
+    for variant in variants:
+        ok = [r * 1000 for r in results[variant] if r is not None]
+        label = variant or '(defaults)'
+        if not ok:
+            print(f"{label:<32}{args.runs:>6}{'-':>9}{'-':>9}{'-':>9}{args.runs:>8}")
+            continue
+        print(f"{label:<32}{args.runs:>6}{min(ok):>9.1f}{statistics.median(ok):>9.1f}{max(ok):>9.1f}"
+              f"{args.runs - len(ok):>8}")
+
+
+if __name__ == '__main__':
+    main()
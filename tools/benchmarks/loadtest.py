@@ -0,0 +1,336 @@
+"""
+loadtest.py - asyncio load generator and macro benchmark for the KidsPlay server.
+
+Starts src/backend/server.py on a free local port (or targets --url), then
+replays a realistic traffic mix over many concurrent connections: virtual
+tablets open the arcade (index.html, data/games.json, a profile), then launch
+games from data/games.json with the shared core JS/CSS and images they use,
+while a few debug dashboards poll /debug/performance. Reports throughput,
+p50/p95/p99 latency and errors, and can save or compare a JSON baseline.
+
+    python tools/benchmarks/loadtest.py                                   # 20s, 64 connections
+    python tools/benchmarks/loadtest.py --save-baseline                   # refresh the stored baseline
+    python tools/benchmarks/loadtest.py --compare                         # exit 1 on regression
+    python tools/benchmarks/loadtest.py --server-args="--mode asyncio --keep-alive" --keep-alive
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import random
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+FRONTEND = os.path.join(ROOT, 'src', 'frontend')
+SERVER = os.path.join(ROOT, 'src', 'backend', 'server.py')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'loadtest.json')
+
+
+def url_path(path):
+    return '/' + os.path.relpath(path, FRONTEND).replace(os.sep, '/')
+
+
+def build_traffic_mix(rnd):
+    """Weighted request groups built from data/games.json and the real frontend files"""
+    with open(os.path.join(FRONTEND, 'data', 'games.json'), encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    game_pages = []
+    for game in catalog.get('games', []):
+        for page in glob.glob(os.path.join(FRONTEND, 'games', '*', game['id'], 'index.html')):
+            game_pages.append(url_path(page))
+    if not game_pages:
+        raise SystemExit("No game pages found under src/frontend/games")
+
+    shared = [url_path(p) for p in sorted(glob.glob(os.path.join(FRONTEND, 'shared', 'common', '*', '*')))]
+    images = [url_path(p) for pattern in ('**/*.png', '**/*.ico', '**/*.svg', '**/*.jpg')
+              for p in glob.glob(os.path.join(FRONTEND, pattern), recursive=True)]
+    profiles = [url_path(p) for p in sorted(glob.glob(os.path.join(FRONTEND, 'config', '*.json')))]
+
+    def arcade_visit():
+        return ['/index.html', '/data/games.json', rnd.choice(profiles) if profiles else '/manifest.json',
+                '/manifest.json']
+
+    def game_launch():
+        requests = [rnd.choice(game_pages)]
+        requests += rnd.sample(shared, min(len(shared), 3))
+        if images:
+            requests += rnd.sample(images, min(len(images), 2))
+        return requests
+
+    return [(arcade_visit, 3), (game_launch, 7)], {
+        'game_pages': len(game_pages), 'shared_files': len(shared), 'images': len(images)
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status = {}
+        self.bytes = 0
+
+    def record(self, status, latency, size):
+        self.latencies.append(latency)
+        self.status[status] = self.status.get(status, 0) + 1
+        self.bytes += size
+        if status >= 400 or status == 0:
+            self.errors += 1
+
+
+class Connection:
+    """One client connection speaking HTTP/1.1, reconnecting when the server closes"""
+
+    def __init__(self, host, port, keep_alive):
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        connection = 'keep-alive' if self.keep_alive else 'close'
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept-Encoding: gzip, br\r\n"
+            f"Connection: {connection}\r\n\r\n".encode('latin-1')
+        )
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get('content-length')
+        if length is not None:
+            body = await self.reader.readexactly(int(length))
+        else:
+            body = await self.reader.read()
+        if (not self.keep_alive or version == b'HTTP/1.0' or headers.get('connection', '').lower() == 'close'
+                or length is None):
+            await self.close()
+        return int(status), len(body)
+
+
+async def tablet(host, port, mix, deadline, stats, keep_alive, rnd, think_time):
+    """A virtual device: pick a visit from the mix, fetch its files, repeat"""
+    groups, weights = zip(*mix)
+    conn = Connection(host, port, keep_alive)
+    while time.perf_counter() < deadline:
+        for path in rnd.choices(groups, weights)[0]():
+            if time.perf_counter() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                status, size = await conn.get(path)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                status, size = 0, 0
+                await conn.close()
+            stats.record(status, time.perf_counter() - started, size)
+        if think_time:
+            await asyncio.sleep(rnd.uniform(0, think_time))
+    await conn.close()
+
+
+async def dashboard(host, port, deadline, stats, interval):
+    """debug/performance.html polling the stats endpoint"""
+    conn = Connection(host, port, keep_alive=False)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status, size = await conn.get('/debug/performance')
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            status, size = 0, 0
+        stats.record(status, time.perf_counter() - started, size)
+        await asyncio.sleep(interval)
+
+
+async def run_load(host, port, args):
+    rnd = random.Random(args.seed)
+    mix, mix_info = build_traffic_mix(rnd)
+    stats = Stats()
+
+    if args.warmup:
+        warm_deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(tablet(host, port, mix, warm_deadline, Stats(), args.keep_alive,
+                                      random.Random(rnd.random()), args.think_time)
+                               for _ in range(min(8, args.connections))))
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    tasks = [tablet(host, port, mix, deadline, stats, args.keep_alive, random.Random(rnd.random()), args.think_time)
+             for _ in range(args.connections)]
+    tasks += [dashboard(host, port, deadline, stats, args.poll_interval) for _ in range(args.dashboards)]
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return stats, elapsed, mix_info
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(stats, elapsed):
+    latencies = sorted(stats.latencies)
+    requests = len(latencies)
+    return {
+        'requests': requests,
+        'errors': stats.errors,
+        'error_rate': stats.errors / requests if requests else 0,
+        'throughput_rps': requests / elapsed if elapsed else 0,
+        'throughput_mbps': stats.bytes * 8 / elapsed / 1e6 if elapsed else 0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+        'status_codes': {str(k): v for k, v in sorted(stats.status.items())},
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, server_args, workdir):
+    # All virtual tablets share 127.0.0.1, so per-client rate limiting is off unless server_args re-enable it.
+    # Logs go to a throwaway directory and the progress API is off: the working copy stays untouched.
+    cmd = [sys.executable, SERVER, '--port', str(port), '--rate-limit', '0', '--progress-db', '',
+           '--log-dir', os.path.join(workdir, 'logs')] + shlex.split(server_args)
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited early with code {process.returncode}: {' '.join(cmd)}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/debug/performance", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Server did not start within 30s")
+
+
+def compare(result, baseline, tolerance):
+    """Return a list of regressions of result against a saved baseline"""
+    base = baseline['results']
+    regressions = []
+    if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_rps']:.0f} req/s < baseline {base['throughput_rps']:.0f}")
+    for key in ('p95_ms', 'p99_ms'):
+        if result[key] > base[key] * (1 + tolerance) and result[key] - base[key] > 1.0:
+            regressions.append(f"{key} {result[key]:.1f}ms > baseline {base[key]:.1f}ms")
+    if result['error_rate'] > base['error_rate'] + 0.01:
+        regressions.append(f"error rate {result['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="target an already running server instead of starting one")
+    parser.add_argument('--server-args', default='', help="extra arguments for src/backend/server.py")
+    parser.add_argument('--duration', type=float, default=20.0, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=2.0, help="unmeasured warm-up seconds")
+    parser.add_argument('--connections', type=int, default=64, help="concurrent virtual tablets")
+    parser.add_argument('--dashboards', type=int, default=2, help="clients polling /debug/performance")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="seconds between dashboard polls")
+    parser.add_argument('--think-time', type=float, default=0.0, help="max pause between visits per tablet")
+    parser.add_argument('--keep-alive', action='store_true', help="reuse connections (server needs --keep-alive)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help="write the result as baseline")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, help="compare with a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    process = None
+    workdir = None
+    if args.url:
+        target = urllib.parse.urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        workdir = tempfile.mkdtemp(prefix='kidsplay-loadtest-')
+        try:
+            process = start_server(port, args.server_args, workdir)
+        except BaseException:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+    try:
+        stats, elapsed, mix_info = asyncio.run(run_load(host, port, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    result = summarize(stats, elapsed)
+    print(f"🚀 {result['requests']:,} requests in {elapsed:.1f}s over {args.connections} connections "
+          f"(+{args.dashboards} dashboards)")
+    print(f"   throughput {result['throughput_rps']:.0f} req/s, {result['throughput_mbps']:.1f} Mbit/s")
+    print(f"   latency p50 {result['p50_ms']:.1f}ms | p95 {result['p95_ms']:.1f}ms | "
+          f"p99 {result['p99_ms']:.1f}ms | max {result['max_ms']:.1f}ms")
+    print(f"   errors {result['errors']} ({result['error_rate']:.2%}), status codes {result['status_codes']}")
+
+    record = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'config': {'server_args': args.server_args, 'duration': args.duration, 'connections': args.connections,
+                   'dashboards': args.dashboards, 'keep_alive': args.keep_alive, 'think_time': args.think_time,
+                   'seed': args.seed, 'traffic_mix': mix_info},
+        'results': result,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressions against " + os.path.relpath(args.compare, ROOT) + ":")
+            for line in regressions:
+                print("   - " + line)
+            exit_code = 1
+        else:
+            print(f"✅ Within {args.tolerance:.0%} of baseline {os.path.relpath(args.compare, ROOT)}")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline), exist_ok=True)
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+            f.write('\n')
+        print(f"💾 Baseline saved to {os.path.relpath(args.save_baseline, ROOT)}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())